@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import argparse
+import time
+
+import autopath
+
+from alex.applications.PublicTransportInfoCS.preprocessing import PTICSSLUPreprocessing
+from alex.components.asr.utterance import Utterance
+from alex.components.slu.base import CategoryLabelDatabase
+from alex.corpustools.wavaskey import load_wavaskey
+
+
+def find_forms_nested_loops(cldb, utterance):
+    """
+    The original surface form search: all substrings of the utterance starting at a given position are tested
+    against ``cldb.form2value2cl`` from the longest to the shortest.
+
+    :param cldb: a CategoryLabelDatabase instance
+    :param utterance: an Utterance instance
+    :return: a list of (start, end, form) tuples
+    """
+    forms = []
+
+    start = 0
+    while start < len(utterance):
+        end = len(utterance)
+        while end > start:
+            f = tuple(utterance[start:end])
+
+            if f in cldb.form2value2cl:
+                forms.append((start, end, f))
+
+                # skip all substring for this form
+                start = end
+                break
+            end -= 1
+        else:
+            start += 1
+
+    return forms
+
+
+def find_forms_trie(cldb, utterance):
+    return list(cldb.find_forms(utterance))
+
+
+def benchmark(cldb, utterances, find, repeat):
+    t = time.time()
+    for i in range(repeat):
+        for utt in utterances:
+            find(cldb, utt)
+    return time.time() - t
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="""
+    Compares the speed of the surface form search in the category label database implemented using the nested loops
+    over all substrings of an utterance and using the token trie of the CategoryLabelDatabase.
+
+    The utterances are read from a file with the following structure:
+      text_name    => text_content
+      ----------------------------------------
+      0000001.wav => kdy mi jede další tramvaj ze Anděla
+      """)
+
+    parser.add_argument('--cldb', default='../data/database.py', help='the category label database')
+    parser.add_argument('--utterances', default='./bootstrap.trn', help='the utterances to be searched')
+    parser.add_argument('--limit', type=int, default=100000, help='the maximal number of utterances')
+    parser.add_argument('--repeat', type=int, default=5, help='how many times to process all utterances')
+    args = parser.parse_args()
+
+    t = time.time()
+    cldb = CategoryLabelDatabase(args.cldb)
+    print "Loading the CLDB with {n} surface forms took {t:.2f} s".format(n=len(cldb.form2value2cl),
+                                                                         t=time.time() - t)
+
+    preprocessing = PTICSSLUPreprocessing(cldb)
+    utterances = load_wavaskey(args.utterances, Utterance, limit=args.limit)
+    utterances = [preprocessing.normalise_utterance(utterances[k]) for k in sorted(utterances)]
+    n_words = sum(len(utt) for utt in utterances)
+
+    # Both implementations must find the same surface forms.
+    for utt in utterances:
+        if find_forms_nested_loops(cldb, utt) != find_forms_trie(cldb, utt):
+            print "Mismatch in:", unicode(utt)
+
+    print "Utterances: {n}, words: {w}, repetitions: {r}".format(n=len(utterances), w=n_words, r=args.repeat)
+    print "-" * 80
+    t_loops = benchmark(cldb, utterances, find_forms_nested_loops, args.repeat)
+    print "Nested loops: {t:8.3f} s".format(t=t_loops)
+    t_trie = benchmark(cldb, utterances, find_forms_trie, args.repeat)
+    print "Token trie:   {t:8.3f} s".format(t=t_trie)
+    print "Speed-up:     {s:8.1f} x".format(s=t_loops / t_trie if t_trie else float('inf'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import argparse
+import os.path
+import time
+
+import autopath
+
+from alex.components.slu.base import CategoryLabelDatabase
+from alex.components.slu.dailrclassifier import DAILogRegClassifier
+
+
+def load_time(fn_model, repeat):
+    """
+    Measures how long it takes to load the model into a fresh DAILogRegClassifier.
+
+    :param fn_model: the model file name
+    :param repeat: how many times the model is loaded
+    :return: the average load time in seconds
+    """
+    t = time.time()
+    for i in range(repeat):
+        slu = DAILogRegClassifier(CategoryLabelDatabase(None), None)
+        slu.load_model(fn_model)
+    return (time.time() - t) / repeat
+
+
+def convert(fn_model, fn_compiled):
+    """
+    Converts a pickled DAILogRegClassifier model into the compiled binary format.
+
+    :param fn_model: the pickled model, possibly gzipped
+    :param fn_compiled: the compiled model
+    """
+    slu = DAILogRegClassifier(CategoryLabelDatabase(None), None)
+    slu.load_model(fn_model)
+    slu.save_compiled_model(fn_compiled)
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="""
+    Converts pickled DAILogRegClassifier models (e.g. dailogreg.nbl.model.all or *.pickle.gz) into the compact binary
+    format with memory mapped weights. The compiled models are saved with the .bin suffix and they can be used
+    instead of the pickled models in the configuration.
+
+    With --benchmark, the load times of the original and the compiled models are compared.
+      """)
+
+    parser.add_argument('models', nargs='+', help='the pickled models to be converted')
+    parser.add_argument('--benchmark', action='store_true', help='compare the load times')
+    parser.add_argument('--repeat', type=int, default=3, help='how many times to load each model when benchmarking')
+    args = parser.parse_args()
+
+    for fn_model in args.models:
+        fn_compiled = fn_model + '.bin'
+
+        print "Converting {m} -> {c}".format(m=fn_model, c=fn_compiled)
+        convert(fn_model, fn_compiled)
+
+        if args.benchmark:
+            t_pickle = load_time(fn_model, args.repeat)
+            t_compiled = load_time(fn_compiled, args.repeat)
+
+            print "  Size:      {p:10d} B  -> {c:10d} B".format(p=os.path.getsize(fn_model),
+                                                               c=os.path.getsize(fn_compiled))
+            print "  Load time: {p:10.3f} s  -> {c:10.3f} s".format(p=t_pickle, c=t_compiled)
+
+
+if __name__ == '__main__':
+    main()
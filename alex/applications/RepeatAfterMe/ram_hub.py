@@ -16,8 +16,10 @@ import autopath
 from alex.components.hub.vio import VoipIO
 from alex.components.hub.vad import VAD
 from alex.components.hub.tts import TTS
+from alex.components.hub.audiochannel import AudioPipe
 from alex.components.hub.messages import Command
 from alex.utils.config import Config
+from alex.utils.mproc import CloseEvent
 
 
 def load_sentences(file_name):
@@ -125,11 +127,11 @@ if __name__ == '__main__':
     sample_sentences = load_sentences(cfg['RepeatAfterMe']['sentences_file'])
 
     vio_commands, vio_child_commands = multiprocessing.Pipe()  # used to send commands to VoipIO
-    vio_record, vio_child_record = multiprocessing.Pipe()      # I read from this connection recorded audio
-    vio_play, vio_child_play = multiprocessing.Pipe()          # I write in audio to be played
+    vio_record, vio_child_record = AudioPipe()                 # I read from this connection recorded audio
+    vio_play, vio_child_play = AudioPipe()                     # I write in audio to be played
 
     vad_commands, vad_child_commands = multiprocessing.Pipe()   # used to send commands to VAD
-    vad_audio_out, vad_child_audio_out = multiprocessing.Pipe() # used to read output audio from VAD
+    vad_audio_out, vad_child_audio_out = AudioPipe()            # used to read output audio from VAD
 
     tts_commands, tts_child_commands = multiprocessing.Pipe()   # used to send commands to TTS
     tts_text_in, tts_child_text_in = multiprocessing.Pipe()     # used to send TTS text
@@ -141,18 +143,20 @@ if __name__ == '__main__':
                                vad_audio_out, vad_child_audio_out,
                                tts_text_in, tts_child_text_in]
 
-    close_event = multiprocessing.Event()
+    close_event = CloseEvent()
 
     vio = VoipIO(cfg, vio_child_commands, vio_child_record, vio_child_play, close_event)
     vad = VAD(cfg, vad_child_commands, vio_record, vad_child_audio_out, close_event)
     tts = TTS(cfg, tts_child_commands, tts_child_text_in, vio_play, close_event)
 
+    # the components write the recordings, so the session logger must be configured before they start
+    cfg['Logging']['session_logger'].set_close_event(self.close_event)
+    cfg['Logging']['session_logger'].set_cfg(cfg)
+
     vio.start()
     vad.start()
     tts.start()
 
-    cfg['Logging']['session_logger'].set_close_event(self.close_event)
-    cfg['Logging']['session_logger'].set_cfg(cfg)
     cfg['Logging']['session_logger'].start()
 
     # init the system
@@ -14,8 +14,10 @@ import autopath
 from alex.components.hub.vio import VoipIO
 from alex.components.hub.vad import VAD
 from alex.components.hub.tts import TTS
+from alex.components.hub.audiochannel import AudioPipe
 from alex.components.hub.messages import Command, Frame
 from alex.utils.config import Config
+from alex.utils.mproc import CloseEvent
 
 
 def load_database(file_name):
@@ -71,23 +73,23 @@ def run(cfg1, cfg2):
         cfg1['Logging']['system_logger'].info("Switchboard system\n" + "=" * 120)
 
         vio1_commands, vio1_child_commands = multiprocessing.Pipe()  # used to send commands to VoipIO
-        vio1_record, vio1_child_record = multiprocessing.Pipe()      # I read from this connection recorded audio
-        vio1_play, vio1_child_play = multiprocessing.Pipe()          # I write in audio to be played
+        vio1_record, vio1_child_record = AudioPipe()                 # I read from this connection recorded audio
+        vio1_play, vio1_child_play = AudioPipe()                     # I write in audio to be played
 
         vad1_commands, vad1_child_commands = multiprocessing.Pipe()   # used to send commands to VAD
-        vad1_audio_in, vad1_child_audio_in = multiprocessing.Pipe() # used to read output audio from VAD
-        vad1_audio_out, vad1_child_audio_out = multiprocessing.Pipe() # used to read output audio from VAD
+        vad1_audio_in, vad1_child_audio_in = AudioPipe()            # used to read output audio from VAD
+        vad1_audio_out, vad1_child_audio_out = AudioPipe()            # used to read output audio from VAD
 
         tts1_commands, tts1_child_commands = multiprocessing.Pipe()   # used to send commands to TTS
         tts1_text_in, tts1_child_text_in = multiprocessing.Pipe()     # used to send TTS text
 
         vio2_commands, vio2_child_commands = multiprocessing.Pipe()  # used to send commands to VoipIO
-        vio2_record, vio2_child_record = multiprocessing.Pipe()      # I read from this connection recorded audio
-        vio2_play, vio2_child_play = multiprocessing.Pipe()          # I write in audio to be played
+        vio2_record, vio2_child_record = AudioPipe()                 # I read from this connection recorded audio
+        vio2_play, vio2_child_play = AudioPipe()                     # I write in audio to be played
 
         vad2_commands, vad2_child_commands = multiprocessing.Pipe()   # used to send commands to VAD
-        vad2_audio_in, vad2_child_audio_in = multiprocessing.Pipe() # used to read output audio from VAD
-        vad2_audio_out, vad2_child_audio_out = multiprocessing.Pipe() # used to read output audio from VAD
+        vad2_audio_in, vad2_child_audio_in = AudioPipe()            # used to read output audio from VAD
+        vad2_audio_out, vad2_child_audio_out = AudioPipe()            # used to read output audio from VAD
 
         tts2_commands, tts2_child_commands = multiprocessing.Pipe()   # used to send commands to TTS
         tts2_text_in, tts2_child_text_in = multiprocessing.Pipe()     # used to send TTS text
@@ -105,7 +107,7 @@ def run(cfg1, cfg2):
                                    vad2_audio_out, vad2_child_audio_out,
                                    tts2_text_in, tts2_child_text_in]
 
-        close_event = multiprocessing.Event()
+        close_event = CloseEvent()
 
         vio1 = VoipIO(cfg1, vio1_child_commands, vio1_child_record, vio1_child_play, close_event)
         vad1 = VAD(cfg1, vad1_child_commands, vad1_child_audio_in, vad1_child_audio_out, close_event)
@@ -115,6 +117,12 @@ def run(cfg1, cfg2):
         tts2 = TTS(cfg2, tts2_child_commands, tts2_child_text_in, vio2_play, close_event)
 
 
+        # the components write the recordings, so the session logger must be configured before they start
+        cfg1['Logging']['session_logger'].set_close_event(close_event)
+        cfg1['Logging']['session_logger'].set_cfg(cfg1)
+        cfg2['Logging']['session_logger'].set_close_event(close_event)
+        cfg2['Logging']['session_logger'].set_cfg(cfg2)
+
         vio1.start()
         vad1.start()
         tts1.start()
@@ -123,13 +131,9 @@ def run(cfg1, cfg2):
         vad2.start()
         tts2.start()
 
-        cfg1['Logging']['session_logger'].set_close_event(close_event)
-        cfg1['Logging']['session_logger'].set_cfg(cfg1)
         cfg1['Logging']['session_logger'].start()
         cfg1['Logging']['session_logger'].cancel_join_thread()
 
-        cfg2['Logging']['session_logger'].set_close_event(close_event)
-        cfg2['Logging']['session_logger'].set_cfg(cfg2)
         cfg2['Logging']['session_logger'].start()
         cfg2['Logging']['session_logger'].cancel_join_thread()
 
@@ -15,8 +15,10 @@ from alex.components.hub.slu import SLU
 from alex.components.hub.dm import DM
 from alex.components.hub.nlg import NLG
 from alex.components.hub.tts import TTS
+from alex.components.hub.audiochannel import AudioPipe
 from alex.components.hub.messages import Command
 from alex.utils.config import Config
+from alex.utils.mproc import CloseEvent
 
 class AudioHub(Hub):
     def __init__(self, cfg):
@@ -28,15 +30,15 @@ class AudioHub(Hub):
             # used to send commands to VoipIO
             aio_commands, aio_child_commands = multiprocessing.Pipe()
             # I read from this connection recorded audio
-            aio_record, aio_child_record = multiprocessing.Pipe()
+            aio_record, aio_child_record = AudioPipe()
             # I write in audio to be played
-            aio_play, aio_child_play = multiprocessing.Pipe()
+            aio_play, aio_child_play = AudioPipe()
 
             # VAD pipes
             # used to send commands to VAD
             vad_commands, vad_child_commands = multiprocessing.Pipe()
             # used to read output audio from VAD
-            vad_audio_out, vad_child_audio_out = multiprocessing.Pipe()
+            vad_audio_out, vad_child_audio_out = AudioPipe()
 
             # ASR pipes
             # used to send commands to ASR
@@ -79,7 +81,7 @@ class AudioHub(Hub):
                                        dm_actions_out, dm_child_actions,
                                        nlg_text_out, nlg_child_text]
 
-            close_event = multiprocessing.Event()
+            close_event = CloseEvent()
 
             # create the hub components
             aio = AudioIO(self.cfg, aio_child_commands, aio_child_record, aio_child_play, close_event)
@@ -91,6 +93,10 @@ class AudioHub(Hub):
             tts = TTS(self.cfg, tts_child_commands, nlg_text_out, aio_play, close_event)
 
             # start the hub components
+            # the components write the recordings, so the session logger must be configured before they start
+            self.cfg['Logging']['session_logger'].set_close_event(self.close_event)
+            self.cfg['Logging']['session_logger'].set_cfg(self.cfg)
+
             aio.start()
             vad.start()
             asr.start()
@@ -99,8 +105,6 @@ class AudioHub(Hub):
             nlg.start()
             tts.start()
 
-            self.cfg['Logging']['session_logger'].set_close_event(self.close_event)
-            self.cfg['Logging']['session_logger'].set_cfg(self.cfg)
             self.cfg['Logging']['session_logger'].start()
 
             # init the system
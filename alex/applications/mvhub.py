@@ -0,0 +1,546 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import autopath
+
+import multiprocessing
+import time
+import argparse
+import os
+
+from alex.components.hub import Hub
+from alex.components.hub.vad import VAD
+from alex.components.hub.asr import ASR
+from alex.components.hub.slu import SLU
+from alex.components.hub.dm import DM
+from alex.components.hub.nlg import NLG
+from alex.components.hub.tts import TTS
+from alex.components.hub.audiochannel import AudioPipe, send_frames
+from alex.components.hub.messages import Command, SLUHyp, DMDA, TTSText
+from alex.components.hub.multiplex import SessionID, WorkerPool, session_config
+from alex.components.hub.calldb import call_db_factory
+from alex.components.hub.trace import get_tracer
+from alex.utils.config import Config
+from alex.utils.exceptions import ConfigException
+from alex.utils.mproc import CloseEvent, wait
+from alex.utils.sessionlogger import SessionLogger
+
+
+def voipio_factory(cfg, slot, commands, audio_record, audio_play, close_event):
+    """Creates the VoipIO of the call slot.
+
+    Every slot registers its own SIP account; cfg['MultiVoipHub']['accounts'][slot] overrides the VoipIO section.
+    The slots cannot share an account, so there must be an account for every slot.
+    """
+    accounts = cfg['MultiVoipHub']['accounts']
+    if slot >= len(accounts):
+        raise ConfigException('MultiVoipHub has %d call slots but only %d SIP accounts in '
+                              "cfg['MultiVoipHub']['accounts']." % (cfg['MultiVoipHub']['max_calls'], len(accounts)))
+
+    from alex.components.hub.vio import VoipIO
+
+    cfg['VoipIO'] = dict(cfg['VoipIO'], **accounts[slot])
+
+    return VoipIO(cfg, commands, audio_record, audio_play, close_event)
+
+
+class CallSlot(object):
+    """
+    The connections and the dialogue state of one call slot.
+
+    A slot handles one call at a time and it is reused by the consecutive calls. It has its own audio IO, VAD, ASR
+    and DM processes and its own session logger.
+    """
+
+    def __init__(self, index, cfg):
+        self.index = index
+        self.cfg = cfg
+        self.session_logger = cfg['Logging']['session_logger']
+
+        self.serial = 0
+        self.session_id = None
+        self.remote_uri = None
+
+        self.reset()
+
+    def reset(self):
+        self.call_connected = False
+        self.call_start = 0
+        self.number_of_turns = -1
+
+        self.s_voice_activity = False
+        self.s_last_voice_activity_time = 0
+        self.u_voice_activity = False
+        self.u_last_voice_activity_time = 0
+        self.s_last_dm_activity_time = 0
+        self.u_last_input_timeout = 0
+
+        self.hangup = False
+        self.outstanding_nlg_da = None
+        self.outstanding_nlg_trace_id = None
+        # whether the disconnected call is being flushed
+        self.closing = False
+
+        self.u_speech_end_time = None
+        self.response_times = []
+
+    def start_session(self, remote_uri):
+        self.serial += 1
+        self.session_id = SessionID(self.index, self.serial, 0)
+        self.remote_uri = remote_uri
+        self.reset()
+
+    def new_generation(self):
+        """Drops all output of the shared components which is being produced for the call."""
+        if self.session_id is not None:
+            self.session_id = self.session_id._replace(generation=self.session_id.generation + 1)
+
+    def is_current(self, session_id):
+        return session_id is not None and session_id == self.session_id
+
+
+class MultiVoipHub(Hub):
+    """
+    MultiVoipHub handles several concurrent calls.
+
+    Every call slot has its own audio IO, VAD, ASR and DM processes, i.e. the components with a per-call state.
+    The stateless components (SLU, NLG, TTS) are pools of workers shared by all calls. The hub routes the messages
+    between the components of a slot and the shared workers by the session ID of the call, see
+    alex.components.hub.multiplex.
+
+    By default, the audio IO of every slot is a VoipIO registered with its own SIP account, so the config must list
+    an account for every slot; any other component with the same interface can be created by the io_factory (e.g.
+    ReplayIO to generate load).
+    """
+
+    # how often the timeouts of the calls are checked, in seconds
+    timer_period = 0.1
+
+    def __init__(self, cfg, io_factory=voipio_factory, call_stats=None):
+        """
+        :param io_factory: a function returning the audio IO process of a slot, see voipio_factory
+        :param call_stats: a queue to which a dictionary with statistics is put after every call, None to disable it
+        """
+        super(MultiVoipHub, self).__init__(cfg)
+        self.close_event = CloseEvent()
+        self.io_factory = io_factory
+        self.call_stats = call_stats
+
+        self.system_logger = self.cfg['Logging']['system_logger']
+        self.tracer = get_tracer(self.cfg)
+        self.slots = []
+        self.processes = []
+        self.handlers = {}
+        self.call_db = None
+
+        self.slu = WorkerPool('SLU', 'slu_parsed')
+        self.nlg = WorkerPool('NLG', 'nlg_text_generated')
+        self.tts = WorkerPool('TTS', 'tts_end')
+
+    def write_pid_file(self):
+        f = open(self.cfg['MultiVoipHub']['pid_file'], "w+")
+
+        f.write("mvhub: %d\n" % os.getpid())
+        for p in self.processes:
+            f.write("%s: %d\n" % (p.name, p.pid))
+        f.close()
+
+    def add_handler(self, connection, handler, *args):
+        self.handlers[connection] = (handler, args)
+
+    def create_slot(self, index, session_logger):
+        cfg = session_config(self.cfg, session_logger)
+        slot = CallSlot(index, cfg)
+
+        slot.io_commands, io_child_commands = multiprocessing.Pipe()
+        io_record, io_child_record = AudioPipe()
+        slot.io_play, io_child_play = AudioPipe()
+
+        slot.vad_commands, vad_child_commands = multiprocessing.Pipe()
+        vad_audio_out, vad_child_audio_out = AudioPipe()
+
+        slot.asr_commands, asr_child_commands = multiprocessing.Pipe()
+        slot.asr_hypotheses_out, asr_child_hypotheses = multiprocessing.Pipe()
+
+        slot.dm_commands, dm_child_commands = multiprocessing.Pipe()
+        slot.dm_hypotheses_in, dm_child_hypotheses = multiprocessing.Pipe()
+        dm_actions_out, dm_child_actions = multiprocessing.Pipe()
+
+        io = self.io_factory(cfg, index, io_child_commands, io_child_record, io_child_play, self.close_event)
+        vad = VAD(cfg, vad_child_commands, io_record, vad_child_audio_out, self.close_event)
+        asr = ASR(cfg, asr_child_commands, vad_audio_out, asr_child_hypotheses, self.close_event)
+        dm = DM(cfg, dm_child_commands, dm_child_hypotheses, dm_child_actions, self.close_event)
+
+        for name, p in [('io', io), ('vad', vad), ('asr', asr), ('dm', dm)]:
+            p.name = '%s-%d' % (name, index)
+            self.processes.append(p)
+
+        self.add_handler(slot.io_commands, self.on_io_command, slot)
+        self.add_handler(slot.vad_commands, self.on_vad_command, slot)
+        self.add_handler(slot.asr_commands, self.on_asr_command, slot)
+        self.add_handler(slot.asr_hypotheses_out, self.on_asr_hypothesis, slot)
+        self.add_handler(slot.dm_commands, self.on_dm_command, slot)
+
+        slot.commands = [slot.io_commands, slot.vad_commands, slot.asr_commands, slot.dm_commands]
+
+        return slot
+
+    def create_workers(self, pool, component_class, n_workers, session_loggers):
+        for i in range(n_workers):
+            worker = pool.create(component_class, self.cfg, session_loggers, self.close_event)
+            worker.name = '%s-%d' % (pool.name.lower(), i)
+            self.processes.append(worker)
+
+            self.add_handler(pool.commands[i], self.on_worker_command, pool)
+            self.add_handler(pool.outputs[i], self.on_worker_output, pool)
+
+    def send_to_nlg(self, slot, da, trace_id=None):
+        self.nlg.send(slot.session_id, DMDA(da, 'HUB', 'NLG', trace_id))
+
+    def flush_shared_output(self, slot):
+        """Drops the output of the shared components which is being produced for the call and cancels its prompts in
+        the TTS, so that they do not hold up the prompts of the other calls."""
+        if slot.session_id is not None:
+            self.tts.cancel(slot.session_id, Command('flush_session()', 'HUB', 'TTS'))
+        slot.new_generation()
+
+    def barge_in(self, slot):
+        """Stops the output of the system, the audio of the call is flushed by its IO."""
+        slot.session_logger.barge_in("system")
+
+        self.flush_shared_output(slot)
+        slot.io_commands.send(Command('flush_out()', 'HUB', 'VoipIO'))
+        slot.s_voice_activity = False
+        slot.s_last_voice_activity_time = time.time()
+
+    def end_call(self, slot):
+        """Reports the statistics of the finished call and frees the slot."""
+        duration = time.time() - slot.call_start if slot.call_start else 0.0
+        stats = {
+            'slot': slot.index,
+            'remote_uri': slot.remote_uri,
+            'duration': duration,
+            'turns': max(0, slot.number_of_turns),
+            'response_times': slot.response_times,
+        }
+
+        self.system_logger.info('Call from %s in slot %d finished: %0.1f s, %d turns' %
+                                (slot.remote_uri, slot.index, duration, stats['turns']))
+        if self.tracer.enabled:
+            self.tracer.collect()
+            stats['trace_report'] = self.tracer.report()
+            self.system_logger.info(stats['trace_report'])
+        if self.call_stats is not None:
+            self.call_stats.put(stats)
+
+        slot.session_id = None
+        slot.remote_uri = None
+        slot.closing = False
+
+    def on_io_command(self, slot, command):
+        self.system_logger.info(command)
+
+        if not isinstance(command, Command):
+            return
+
+        if command.parsed['__name__'] == "incoming_call":
+            slot.start_session(command.parsed['remote_uri'])
+
+            session_dir = os.path.join(self.system_logger.output_dir,
+                                       self.system_logger.get_time_str() + '-' + command.parsed['remote_uri'])
+            os.makedirs(session_dir)
+
+            slot.session_logger.session_start(session_dir)
+            slot.session_logger.config('config = ' + unicode(self.cfg))
+            slot.session_logger.header(self.cfg['Logging']["system_name"], self.cfg['Logging']["version"])
+            slot.session_logger.input_source("voip")
+
+        if command.parsed['__name__'] == "call_confirmed":
+            remote_uri = command.parsed['remote_uri']
+            num_all_calls, total_time, last_period_num_calls, last_period_total_time, last_period_num_short_calls = \
+                self.call_db.get_uri_stats(remote_uri)
+
+            slot.call_connected = True
+            slot.call_start = time.time()
+            slot.number_of_turns = 0
+            slot.u_last_voice_activity_time = time.time()
+            slot.u_last_input_timeout = time.time()
+
+            if last_period_num_calls > self.cfg['VoipHub']['last_period_max_num_calls'] or \
+                    last_period_total_time > self.cfg['VoipHub']['last_period_max_total_time'] or \
+                    last_period_num_short_calls > self.cfg['VoipHub']['last_period_max_num_short_calls']:
+                # prepare for ending the call
+                slot.s_voice_activity = True
+                slot.s_last_voice_activity_time = time.time()
+                slot.hangup = True
+
+                slot.session_logger.turn("system")
+                self.tts.send(slot.session_id,
+                              Command('synthesize(text="%s",log="true")' % self.cfg['VoipHub']['limit_reached_message'],
+                                      'HUB', 'TTS'),
+                              command=True)
+                slot.io_commands.send(Command('black_list(remote_uri="%s",expire="%d")' %
+                                              (remote_uri, time.time() + self.cfg['VoipHub']['blacklist_for']),
+                                              'HUB', 'VoipIO'))
+                self.system_logger.info('Call from %s in slot %d: CALL REJECTED' % (remote_uri, slot.index))
+            else:
+                slot.dm_commands.send(Command('new_dialogue()', 'HUB', 'DM'))
+                self.system_logger.info('Call from %s in slot %d: CALL ACCEPTED' % (remote_uri, slot.index))
+
+            self.call_db.track_confirmed_call(remote_uri)
+
+        if command.parsed['__name__'] == "call_disconnected":
+            # flush the slot from the IO to the DM, the shared components are flushed by dropping their output and
+            # by cancelling the prompts of the call in the TTS
+            self.flush_shared_output(slot)
+            slot.io_commands.send(Command('flush()', 'HUB', 'VoipIO'))
+
+            slot.session_logger.session_end()
+            self.call_db.track_disconnected_call(command.parsed['remote_uri'])
+
+            slot.call_connected = False
+
+        if command.parsed['__name__'] == "play_utterance_start":
+            slot.s_voice_activity = True
+            slot.s_last_voice_activity_time = time.time()
+
+            if slot.u_speech_end_time is not None:
+                slot.response_times.append(time.time() - slot.u_speech_end_time)
+                slot.u_speech_end_time = None
+
+        if command.parsed['__name__'] == "play_utterance_end":
+            slot.s_voice_activity = False
+            slot.s_last_voice_activity_time = time.time()
+
+        if command.parsed['__name__'] == "flushed":
+            slot.vad_commands.send(Command('flush()', 'HUB', 'VAD'))
+
+        if command.parsed['__name__'] == "flushed_out":
+            if slot.call_connected:
+                # process the outstanding DA if necessary
+                if slot.outstanding_nlg_da:
+                    self.send_to_nlg(slot, slot.outstanding_nlg_da, slot.outstanding_nlg_trace_id)
+                    slot.outstanding_nlg_da = None
+                    slot.outstanding_nlg_trace_id = None
+            elif slot.closing:
+                # the last step of flushing a disconnected call
+                self.end_call(slot)
+
+    def on_vad_command(self, slot, command):
+        self.system_logger.info(command)
+
+        if not isinstance(command, Command):
+            return
+
+        if command.parsed['__name__'] == "speech_start":
+            slot.u_voice_activity = True
+
+            if slot.s_voice_activity and slot.s_last_voice_activity_time + 0.02 < time.time():
+                # interrupt the talking system
+                self.barge_in(slot)
+
+        if command.parsed['__name__'] == "speech_end":
+            slot.u_voice_activity = False
+            slot.u_last_voice_activity_time = time.time()
+            slot.u_speech_end_time = time.time()
+
+        if command.parsed['__name__'] == "flushed":
+            slot.asr_commands.send(Command('flush()', 'HUB', 'ASR'))
+
+    def on_asr_command(self, slot, command):
+        self.system_logger.info(command)
+
+        if isinstance(command, Command) and command.parsed['__name__'] == "flushed":
+            # SLU is shared, so continue with DM
+            slot.dm_commands.send(Command('flush()', 'HUB', 'DM'))
+            slot.dm_commands.send(Command('end_dialogue()', 'HUB', 'DM'))
+
+    def on_asr_hypothesis(self, slot, hyp):
+        if slot.session_id is not None and slot.call_connected:
+            self.slu.send(slot.session_id, hyp)
+
+    def on_dm_command(self, slot, command):
+        self.system_logger.info(command)
+
+        if isinstance(command, Command):
+            if command.parsed['__name__'] == "hangup":
+                # prepare for ending the call
+                slot.hangup = True
+
+            if command.parsed['__name__'] == "flushed":
+                # NLG and TTS are shared, so continue with the output of the IO
+                slot.closing = True
+                self.flush_shared_output(slot)
+                slot.io_commands.send(Command('flush_out()', 'HUB', 'VoipIO'))
+
+        elif isinstance(command, DMDA) and slot.call_connected:
+            # record the time of the last system generated dialogue act
+            slot.s_last_dm_activity_time = time.time()
+            slot.number_of_turns += 1
+
+            if command.da != "silence()":
+                if slot.s_voice_activity and slot.s_last_voice_activity_time + 0.02 < time.time():
+                    # if the system is still talking then flush the output
+                    self.barge_in(slot)
+
+                    # the DA will be send when the output of the call is flushed
+                    slot.outstanding_nlg_da = command.da
+                    slot.outstanding_nlg_trace_id = command.trace_id
+                else:
+                    self.send_to_nlg(slot, command.da, command.trace_id)
+
+    def on_worker_command(self, pool, message):
+        if isinstance(message.message, Command) and message.message.parsed['__name__'] == pool.done_command:
+            pool.done(message.session_id)
+
+    def on_worker_output(self, pool, message):
+        if message.session_id is None:
+            return
+
+        slot = self.slots[message.session_id.slot]
+        if not slot.is_current(message.session_id):
+            # the output of a flushed or finished call
+            return
+
+        output = message.message
+        if isinstance(output, SLUHyp):
+            slot.dm_hypotheses_in.send(output)
+        elif isinstance(output, TTSText):
+            self.tts.send(slot.session_id, output)
+        elif isinstance(output, Command):
+            slot.io_play.send(output)
+        elif isinstance(output, list):
+            send_frames(slot.io_play, output)
+
+    def check_timeouts(self, slot):
+        current_time = time.time()
+
+        s_diff = current_time - slot.s_last_voice_activity_time
+        u_diff = current_time - slot.u_last_voice_activity_time
+
+        if slot.call_connected and \
+            not slot.s_voice_activity and not slot.u_voice_activity and \
+            s_diff > self.cfg['DM']['input_timeout'] and \
+            u_diff > self.cfg['DM']['input_timeout'] and \
+            current_time - slot.u_last_input_timeout > self.cfg['DM']['input_timeout']:
+
+            slot.u_last_input_timeout = time.time()
+            slot.dm_commands.send(Command('timeout(silence_time="%0.3f")' % min(s_diff, u_diff), 'HUB', 'DM'))
+
+        if slot.hangup and slot.s_last_dm_activity_time + 2.0 < current_time and \
+            slot.s_voice_activity == False and slot.s_last_voice_activity_time + 2.0 < current_time:
+            # we are ready to hangup only when all voice activity is finished
+            slot.hangup = False
+            slot.io_commands.send(Command('hangup()', 'HUB', 'VoipIO'))
+
+        if slot.number_of_turns != -1 and current_time - slot.call_start > self.cfg['VoipHub']['hard_time_limit'] or \
+            slot.number_of_turns > self.cfg['VoipHub']['hard_turn_limit']:
+            # hard hangup due to the hard limits
+            slot.call_start = 0
+            slot.number_of_turns = -1
+            slot.io_commands.send(Command('hangup()', 'HUB', 'VoipIO'))
+
+    def run(self):
+        try:
+            session_loggers = []
+            for i in range(self.cfg['MultiVoipHub']['max_calls']):
+                session_logger = SessionLogger()
+                session_logger.set_close_event(self.close_event)
+                session_logger.set_cfg(self.cfg)
+                # the components inherit the queues of all session loggers
+                session_logger.cancel_join_thread()
+                session_loggers.append(session_logger)
+
+            for i, session_logger in enumerate(session_loggers):
+                self.slots.append(self.create_slot(i, session_logger))
+
+            self.create_workers(self.slu, SLU, self.cfg['MultiVoipHub']['slu_workers'], session_loggers)
+            self.create_workers(self.nlg, NLG, self.cfg['MultiVoipHub']['nlg_workers'], session_loggers)
+            self.create_workers(self.tts, TTS, self.cfg['MultiVoipHub']['tts_workers'], session_loggers)
+
+            for p in self.processes:
+                p.start()
+
+            self.write_pid_file()
+
+            for session_logger in session_loggers:
+                session_logger.start()
+
+            self.call_db = call_db_factory(self.cfg, self.cfg['VoipHub']['call_db'], self.cfg['VoipHub']['period'])
+            self.call_db.log()
+
+            connections = list(self.handlers.keys())
+            last_timer_time = 0
+
+            while 1:
+                # Check the close event.
+                if self.close_event.is_set():
+                    print 'Received close event in: %s' % multiprocessing.current_process().name
+                    return
+
+                for connection in wait(connections + [self.close_event], self.timer_period):
+                    if connection is self.close_event:
+                        continue
+
+                    handler, args = self.handlers[connection]
+                    while connection.poll():
+                        handler(*(args + (connection.recv(), )))
+
+                if last_timer_time + self.timer_period < time.time():
+                    last_timer_time = time.time()
+                    self.tracer.collect()
+                    for slot in self.slots:
+                        self.check_timeouts(slot)
+
+        except KeyboardInterrupt:
+            print 'KeyboardInterrupt exception in: %s' % multiprocessing.current_process().name
+            self.close_event.set()
+            return
+        except:
+            self.system_logger.exception('Uncaught exception in MVHUB process.')
+            self.close_event.set()
+            raise
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stops all the components."""
+        for slot in self.slots:
+            for connection, name in zip(slot.commands, ['VoipIO', 'VAD', 'ASR', 'DM']):
+                connection.send(Command('stop()', 'HUB', name))
+
+        for pool in [self.slu, self.nlg, self.tts]:
+            pool.broadcast(Command('stop()', 'HUB', pool.name))
+
+#########################################################################
+#########################################################################
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""\
+        MultiVoipHub builds a VOIP telephone system which handles several
+        concurrent calls. Each call slot has its own VoipIO, VAD, ASR and DM
+        components, the SLU, NLG and TTS components are shared by all calls.
+
+        The number of call slots and the SIP accounts of the slots are set in
+        the MultiVoipHub section of the config.
+
+        The program reads the default config in the resources directory
+        ('../resources/default.cfg') config in the current directory.
+
+        In addition, it reads all config file passed as an argument of a '-c'.
+        The additional config files overwrites any default or previous values.
+
+      """)
+
+    parser.add_argument('-c', '--configs', nargs='+', help='additional configuration files')
+    args = parser.parse_args()
+
+    cfg = Config.load_configs(args.configs)
+
+    cfg['Logging']['system_logger'].info("Multi Voip Hub\n" + "=" * 120)
+
+    mvhub = MultiVoipHub(cfg)
+
+    mvhub.run()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import unittest
+import Queue
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.applications.mvhub import MultiVoipHub, CallSlot, voipio_factory
+from alex.components.hub.messages import Command, SLUHyp, TTSText
+from alex.components.hub.multiplex import SessionMessage, session_config
+from alex.utils.config import Config
+from alex.utils.exceptions import ConfigException
+
+
+class Logger(object):
+    """Records the names of the called logging methods."""
+
+    output_dir = '.'
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def log(*args, **kwargs):
+            self.calls.append(name)
+        return log
+
+
+class CallDB(object):
+    def track_disconnected_call(self, remote_uri):
+        pass
+
+
+class Component(object):
+    def __init__(self, cfg, commands, data_in, data_out, close_event):
+        self.commands = commands
+        self.data_in = data_in
+        self.data_out = data_out
+
+
+class TestMultiVoipHub(unittest.TestCase):
+    def setUp(self):
+        self.cfg = Config(config={
+            'Hub': {'history_file': None, 'history_length': 0},
+            'Logging': {'system_logger': Logger(), 'session_logger': None},
+            'MultiVoipHub': {'max_calls': 2, 'accounts': [{'user': 'slot0'}]},
+            'VoipIO': {'user': 'your_sip_user_name'},
+        })
+        self.call_stats = Queue.Queue()
+        self.hub = MultiVoipHub(self.cfg, io_factory=None, call_stats=self.call_stats)
+        self.hub.call_db = CallDB()
+
+        # the connections of the slot processes, the components are replaced by the other ends of the connections
+        self.components = []
+        for i in range(self.cfg['MultiVoipHub']['max_calls']):
+            slot = CallSlot(i, session_config(self.cfg, Logger()))
+            components = {}
+            for name in ['io_commands', 'io_play', 'vad_commands', 'asr_commands', 'dm_commands', 'dm_hypotheses_in']:
+                connection, components[name] = multiprocessing.Pipe()
+                setattr(slot, name, connection)
+            self.hub.slots.append(slot)
+            self.components.append(components)
+
+        for pool in [self.hub.slu, self.hub.nlg, self.hub.tts]:
+            pool.create(Component, self.cfg, [None, None], None)
+
+    def received(self, connection):
+        messages = []
+        while connection.poll():
+            message = connection.recv()
+            messages.append(message.command if isinstance(message, Command) else message)
+        return messages
+
+    def test_stale_output_dropped(self):
+        slot = self.hub.slots[0]
+        slot.start_session('sip:a')
+        session_id = slot.session_id
+
+        self.hub.on_worker_output(self.hub.tts, SessionMessage(session_id, Command('utterance_start()')))
+        self.assertEqual(self.received(self.components[0]['io_play']), ['utterance_start()'])
+
+        # the output of the shared components produced before the barge-in is dropped
+        self.hub.tts.send(session_id, 'request')
+        self.hub.barge_in(slot)
+        self.assertEqual(slot.session_id.generation, 1)
+        self.assertEqual(self.received(self.components[0]['io_commands']), ['flush_out()'])
+        self.assertEqual(self.hub.tts.workers[0].commands.recv().command, 'flush_session()')
+
+        self.hub.on_worker_output(self.hub.tts, SessionMessage(session_id, Command('utterance_start()')))
+        self.hub.on_worker_output(self.hub.slu, SessionMessage(session_id, SLUHyp('hyp')))
+        self.hub.on_worker_output(self.hub.nlg, SessionMessage(session_id, TTSText('text')))
+        self.assertEqual(self.received(self.components[0]['io_play']), [])
+        self.assertFalse(self.components[0]['dm_hypotheses_in'].poll())
+        self.assertEqual(self.hub.tts.workers[0].data_in.recv(), 'request')
+        self.assertFalse(self.hub.tts.workers[0].data_in.poll())
+
+        # the output of the current generation is routed to the slot
+        self.hub.on_worker_output(self.hub.nlg, SessionMessage(slot.session_id, TTSText('next')))
+        self.assertEqual(self.hub.tts.workers[0].data_in.recv().text, 'next')
+        self.assertEqual(self.hub.tts.workers[0].data_in.context.session_id, slot.session_id)
+        self.hub.on_worker_output(self.hub.tts, SessionMessage(slot.session_id, [b'\x01\x02']))
+        self.assertEqual(self.components[0]['io_play'].recv().payload, b'\x01\x02')
+
+        # the output of a previous call of the slot or of a call of another slot is not sent to the slot
+        previous = slot.session_id
+        slot.start_session('sip:b')
+        self.hub.on_worker_output(self.hub.tts, SessionMessage(previous, Command('utterance_start()')))
+        self.hub.on_worker_output(self.hub.tts, SessionMessage(previous._replace(slot=1), Command('utterance_start()')))
+        self.hub.on_worker_output(self.hub.tts, SessionMessage(None, Command('utterance_start()')))
+        self.assertEqual(self.received(self.components[0]['io_play']), [])
+        self.assertEqual(self.received(self.components[1]['io_play']), [])
+
+    def test_disconnected_call_flushed(self):
+        slot = self.hub.slots[0]
+        components = self.components[0]
+        slot.start_session('sip:a')
+        slot.call_connected = True
+        session_id = slot.session_id
+        self.hub.tts.send(session_id, 'request')
+
+        self.hub.on_io_command(slot, Command('call_disconnected(remote_uri="sip:a")', 'VoipIO', 'HUB'))
+        self.assertEqual(self.received(components['io_commands']), ['flush()'])
+        self.assertEqual(self.hub.tts.workers[0].commands.recv().command, 'flush_session()')
+        self.assertIn('session_end', slot.session_logger.calls)
+        self.assertFalse(slot.call_connected)
+
+        self.hub.on_io_command(slot, Command('flushed()', 'VoipIO', 'HUB'))
+        self.assertEqual(self.received(components['vad_commands']), ['flush()'])
+
+        self.hub.on_vad_command(slot, Command('flushed()', 'VAD', 'HUB'))
+        self.assertEqual(self.received(components['asr_commands']), ['flush()'])
+
+        self.hub.on_asr_command(slot, Command('flushed()', 'ASR', 'HUB'))
+        self.assertEqual(self.received(components['dm_commands']), ['flush()', 'end_dialogue()'])
+
+        self.hub.on_dm_command(slot, Command('flushed()', 'DM', 'HUB'))
+        self.assertTrue(slot.closing)
+        self.assertEqual(self.received(components['io_commands']), ['flush_out()'])
+        self.assertTrue(self.call_stats.empty())
+
+        self.hub.on_io_command(slot, Command('flushed_out()', 'VoipIO', 'HUB'))
+        stats = self.call_stats.get_nowait()
+        self.assertEqual((stats['slot'], stats['remote_uri']), (0, 'sip:a'))
+        self.assertIsNone(slot.session_id)
+        self.assertFalse(slot.closing)
+
+        # the late output of the finished call is dropped
+        self.hub.on_worker_output(self.hub.tts, SessionMessage(session_id, Command('utterance_end()')))
+        self.assertEqual(self.received(components['io_play']), [])
+
+    def test_missing_accounts(self):
+        # the slots cannot share a SIP account
+        self.assertRaises(ConfigException, voipio_factory, self.cfg, 1, None, None, None, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
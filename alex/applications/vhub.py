@@ -15,9 +15,13 @@ from alex.components.hub.slu import SLU
 from alex.components.hub.dm import DM
 from alex.components.hub.nlg import NLG
 from alex.components.hub.tts import TTS
+from alex.components.hub.audiochannel import AudioPipe
 from alex.components.hub.messages import Command, DMDA
-from alex.components.hub.calldb import CallDB
+from alex.components.hub.calldb import call_db_factory
+from alex.components.hub.trace import get_tracer
 from alex.utils.config import Config
+from alex.utils.mproc import CloseEvent
+from alex.utils.shmring import SharedRingBuffer
 
 
 class VoipHub(Hub):
@@ -30,7 +34,7 @@ class VoipHub(Hub):
 
     def __init__(self, cfg):
         super(VoipHub, self).__init__(cfg)
-        self.close_event = multiprocessing.Event()
+        self.close_event = CloseEvent()
 
     def write_pid_file(self, pids):
         f = open(self.cfg['VoipHub']['pid_file'], "w+")
@@ -43,11 +47,11 @@ class VoipHub(Hub):
     def run(self):
         try:
             vio_commands, vio_child_commands = multiprocessing.Pipe()  # used to send commands to VoipIO
-            vio_record, vio_child_record = multiprocessing.Pipe()      # I read from this connection recorded audio
-            vio_play, vio_child_play = multiprocessing.Pipe()          # I write in audio to be played
+            vio_record, vio_child_record = AudioPipe()                 # I read from this connection recorded audio
+            vio_play, vio_child_play = AudioPipe()                     # I write in audio to be played
 
             vad_commands, vad_child_commands = multiprocessing.Pipe()   # used to send commands to VAD
-            vad_audio_out, vad_child_audio_out = multiprocessing.Pipe() # used to read output audio from VAD
+            vad_audio_out, vad_child_audio_out = AudioPipe()            # used to read output audio from VAD
 
             asr_commands, asr_child_commands = multiprocessing.Pipe()          # used to send commands to ASR
             asr_hypotheses_out, asr_child_hypotheses = multiprocessing.Pipe()  # used to read ASR hypotheses
@@ -74,14 +78,33 @@ class VoipHub(Hub):
                                        dm_actions_out, dm_child_actions,
                                        nlg_text_out, nlg_child_text]
 
-            vio = VoipIO(self.cfg, vio_child_commands, vio_child_record, vio_child_play, self.close_event)
-            vad = VAD(self.cfg, vad_child_commands, vio_record, vad_child_audio_out, self.close_event)
-            asr = ASR(self.cfg, asr_child_commands, vad_audio_out, asr_child_hypotheses, self.close_event)
+            # the recorded audio is written by VoipIO and read by VAD and ASR, ASR reads only the audio processed by VAD
+            audio_ring = None
+            vad_audio_in_ring = None
+            asr_audio_in_ring = None
+            if self.cfg['Hub']['audio_ring_buffer_length']:
+                frame_size = 2 * self.cfg['Audio']['samples_per_frame']
+                n_frames = int(self.cfg['Hub']['audio_ring_buffer_length'] * self.cfg['Audio']['sample_rate'] /
+                               self.cfg['Audio']['samples_per_frame'])
+                audio_ring = SharedRingBuffer(n_frames * frame_size, n_consumers=2)
+                vad_audio_in_ring = audio_ring.reader(0)
+                asr_audio_in_ring = audio_ring.reader(1, limit=0)
+
+            vio = VoipIO(self.cfg, vio_child_commands, vio_child_record, vio_child_play, self.close_event,
+                         audio_record_ring=audio_ring)
+            vad = VAD(self.cfg, vad_child_commands, vio_record, vad_child_audio_out, self.close_event,
+                      audio_in_ring=vad_audio_in_ring)
+            asr = ASR(self.cfg, asr_child_commands, vad_audio_out, asr_child_hypotheses, self.close_event,
+                      audio_in_ring=asr_audio_in_ring)
             slu = SLU(self.cfg, slu_child_commands, asr_hypotheses_out, slu_child_hypotheses, self.close_event)
             dm  =  DM(self.cfg,  dm_child_commands, slu_hypotheses_out, dm_child_actions, self.close_event)
             nlg = NLG(self.cfg, nlg_child_commands, dm_actions_out, nlg_child_text, self.close_event)
             tts = TTS(self.cfg, tts_child_commands, nlg_text_out, vio_play, self.close_event)
 
+            # the components write the recordings, so the session logger must be configured before they start
+            cfg['Logging']['session_logger'].set_close_event(self.close_event)
+            cfg['Logging']['session_logger'].set_cfg(cfg)
+
             vio.start()
             vad.start()
             asr.start()
@@ -93,8 +116,6 @@ class VoipHub(Hub):
             self.write_pid_file([['vio', vio.pid], ['vad', vad.pid], ['asr', asr.pid],
                                  ['slu', slu.pid], ['dm', dm.pid], ['nlg', nlg.pid], ['tts', tts.pid]])
 
-            cfg['Logging']['session_logger'].set_close_event(self.close_event)
-            cfg['Logging']['session_logger'].set_cfg(cfg)
             cfg['Logging']['session_logger'].start()
             cfg['Logging']['session_logger'].cancel_join_thread()
 
@@ -117,8 +138,11 @@ class VoipHub(Hub):
             hangup = False
 
             outstanding_nlg_da = None
+            outstanding_nlg_trace_id = None
+
+            tracer = get_tracer(self.cfg)
 
-            call_db = CallDB(self.cfg, self.cfg['VoipHub']['call_db'], self.cfg['VoipHub']['period'])
+            call_db = call_db_factory(self.cfg, self.cfg['VoipHub']['call_db'], self.cfg['VoipHub']['period'])
             call_db.log()
 
             while 1:
@@ -129,6 +153,8 @@ class VoipHub(Hub):
 
                 time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
 
+                tracer.collect()
+
                 if call_back_time != -1 and call_back_time < time.time():
                     vio_commands.send(Command('make_call(destination="%s")' % call_back_uri, 'HUB', 'VoipIO'))
                     call_back_time = -1
@@ -255,6 +281,9 @@ class VoipHub(Hub):
 
                             call_connected = False
 
+                            if tracer.enabled:
+                                self.cfg['Logging']['system_logger'].info(tracer.report())
+
                             self.cfg['Analytics'].track_event('vhub', 'call_disconnected', command.parsed['remote_uri'])
 
                         if command.parsed['__name__'] == "play_utterance_start":
@@ -272,8 +301,9 @@ class VoipHub(Hub):
                         if command.parsed['__name__'] == "flushed_out":
                             # process the outstanding DA if necessary
                             if outstanding_nlg_da:
-                                nlg_commands.send(DMDA(outstanding_nlg_da, 'HUB', 'NLG'))
+                                nlg_commands.send(DMDA(outstanding_nlg_da, 'HUB', 'NLG', outstanding_nlg_trace_id))
                                 outstanding_nlg_da = None
+                                outstanding_nlg_trace_id = None
 
 
                 if vad_commands.poll():
@@ -358,9 +388,10 @@ class VoipHub(Hub):
 
                                 # the DA will be send when all the following components are flushed
                                 outstanding_nlg_da = command.da
+                                outstanding_nlg_trace_id = command.trace_id
 
                             else:
-                                nlg_commands.send(DMDA(command.da, "HUB", "NLG"))
+                                nlg_commands.send(DMDA(command.da, "HUB", "NLG", command.trace_id))
 
                 if nlg_commands.poll():
                     command = nlg_commands.recv()
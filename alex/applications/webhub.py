@@ -15,8 +15,10 @@ from alex.components.hub.slu import SLU
 from alex.components.hub.dm import DM
 from alex.components.hub.nlg import NLG
 from alex.components.hub.tts import TTS
+from alex.components.hub.audiochannel import AudioPipe
 from alex.components.hub.messages import Command
 from alex.utils.config import Config
+from alex.utils.mproc import CloseEvent
 
 
 class WebHub(Hub):
@@ -28,15 +30,15 @@ class WebHub(Hub):
         # used to send commands to VoipIO
         aio_commands, aio_child_commands = multiprocessing.Pipe()
         # I read from this connection recorded audio
-        aio_record, aio_child_record = multiprocessing.Pipe()
+        aio_record, aio_child_record = AudioPipe()
         # I write in audio to be played
-        aio_play, aio_child_play = multiprocessing.Pipe()
+        aio_play, aio_child_play = AudioPipe()
 
         # VAD pipes
         # used to send commands to VAD
         vad_commands, vad_child_commands = multiprocessing.Pipe()
         # used to read output audio from VAD
-        vad_audio_out, vad_child_audio_out = multiprocessing.Pipe()
+        vad_audio_out, vad_child_audio_out = AudioPipe()
 
         # ASR pipes
         # used to send commands to ASR
@@ -79,7 +81,7 @@ class WebHub(Hub):
                                    nlg_text_out, nlg_child_text]
 
         # create the hub components
-        close_event = multiprocessing.Event()
+        close_event = CloseEvent()
         aio = WebIO(self.cfg, aio_child_commands, aio_child_record, aio_child_play, close_event)
         vad = VAD(self.cfg, vad_child_commands, aio_record, vad_child_audio_out, close_event)
         asr = ASR(self.cfg, asr_child_commands, vad_audio_out, asr_child_hypotheses, close_event)
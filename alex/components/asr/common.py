@@ -29,6 +29,9 @@ def asr_factory(cfg, asr_type=None):
     elif t == 'Julius':
         from alex.components.asr.julius import JuliusASR
         asr = JuliusASR(cfg)
+    elif t == 'Stub':
+        from alex.components.asr.stub import StubASR
+        asr = StubASR(cfg)
     else:
         raise ASRException('Unsupported ASR decoder: %s' % asr_type)
 
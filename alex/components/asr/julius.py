@@ -8,6 +8,7 @@ from __future__ import unicode_literals
 if __name__ == "__main__":
     import autopath
 
+import collections
 import os
 import os.path
 import socket
@@ -20,6 +21,7 @@ from alex.components.asr.exceptions import JuliusASRException, \
     JuliusASRTimeoutException
 from alex.components.asr.utterance import UtteranceNBList, Utterance, \
     UtteranceConfusionNetwork
+from alex.utils.mproc import wait
 from alex.utils.various import get_text_from_xml_node
 
 
@@ -32,8 +34,14 @@ class JuliusASR(ASRInterface):
     and a confusion network.  The function for asynchronous output, `hyp_out`,
     returns just the confusion network.
 
+    The messages of the Julius module protocol are read from the server socket
+    in whole chunks and split into complete messages as they arrive.
+
     """
 
+    # The maximal number of bytes read from the server socket at once.
+    recv_size = 4096
+
     def __init__(self, cfg, popen_kwargs=dict()):
         super(JuliusASR, self).__init__()
         self.recognition_on = False
@@ -201,6 +209,11 @@ class JuliusASR(ASRInterface):
         self.s_socket.connect((self.hostname, self.serverport))
         self.s_socket.setblocking(0)
 
+        # the received data which do not form a complete message yet
+        self.s_buffer = b''
+        # the complete messages which have not been read yet
+        self.s_messages = collections.deque()
+
     def open_adinnet(self):
         """Open the audio connection for sending the incoming frames."""
 
@@ -234,54 +247,76 @@ class JuliusASR(ASRInterface):
         self.a_socket.setblocking(1)
         return cmd
 
-    def read_server_message(self, timeout=0.3):
+    def receive_server_data(self, timeout):
         """
-        Reads a complete message from the Julius ASR server.
+        Reads the data waiting in the server socket and splits them into
+        complete messages.
 
         A complete message is denoted by a period on a new line at the end of
         the string.
 
-        Timeout specifies how long it will wait for the end of message.
+        Timeout specifies how long it will wait for some data. Returns whether
+        any data were read.
         """
-        results = ""
-        time_slept = 0.0
-
-        # FIXME: Count real time elapsed.
-        while time_slept < timeout:
-            try:
-                if self.debug >= 2:
-                    print "receiving"
-                results += self.s_socket.recv(1)
-            except socket.error as e:
-                # errno = ex.errno
-                # FIXME: We would like to determine (by the errno) what
-                # happened.  If the server dies, there will be a deadlock.
-                # However, in the situations seen so far, errno on its own does
-                # not provide the necessary information.
-                if not results:
-                    if self.debug:
-                        print "ERROR: ", e
-                        print "results: ", results
-                    # There are no data waiting for us.
-                    return None
-
-            if results.endswith("\n.\n"):
-                if self.debug:
-                    print "***** results retrieved:", results
-                results = results[:-3].strip()
-                break
-            else:
-                # We already read some data but we did not receive the
-                # final period, so continue reading.
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
-                time_slept += self.cfg['Hub']['main_loop_sleep_time']
-                if self.debug >= 2:
-                    print "rm.time_slept:", time_slept
-        else:
+        if not wait([self.s_socket], max(timeout, 0.0)):
+            return False
+
+        try:
+            data = self.s_socket.recv(self.recv_size)
+        except socket.error as e:
+            # The socket was reported readable but there are no data after all.
             if self.debug:
-                print "**** results so far: ", results
-            raise JuliusASRTimeoutException(
-                "Timeout when waiting for the Julius server message.")
+                print "ERROR: ", e
+            return False
+
+        if not data:
+            raise JuliusASRException(
+                "The Julius server closed the connection.")
+
+        if self.debug >= 2:
+            print "received:", data
+
+        self.s_buffer += data
+        while True:
+            end = self.s_buffer.find(b"\n.\n")
+            if end < 0:
+                break
+
+            self.s_messages.append(self.s_buffer[:end].strip())
+            self.s_buffer = self.s_buffer[end + 3:]
+
+        return True
+
+    def read_server_message(self, timeout=None):
+        """
+        Reads a complete message from the Julius ASR server.
+
+        Returns None if there are no data waiting for us. Timeout specifies
+        how long it will wait for the end of a message which has already
+        started, it defaults to the msg_timeout from the config.
+        """
+        if timeout is None:
+            timeout = self.msg_timeout
+
+        if not self.s_messages:
+            self.receive_server_data(0.0)
+
+            if not self.s_messages and not self.s_buffer.strip():
+                return None
+
+        # The deadlines use the wall clock, as there is no monotonic clock in
+        # Python 2. A change of the system time can therefore stretch or cut
+        # the timeout.
+        deadline = time.time() + timeout
+        while not self.s_messages:
+            if not self.receive_server_data(deadline - time.time()) \
+                    and time.time() >= deadline:
+                if self.debug:
+                    print "**** results so far: ", self.s_buffer
+                raise JuliusASRTimeoutException(
+                    "Timeout when waiting for the Julius server message.")
+
+        results = self.s_messages.popleft()
 
         if self.debug:
             print "rm.return:", results
@@ -295,29 +330,22 @@ class JuliusASR(ASRInterface):
         """
         msg = ""
 
-        # Get results from the server.
-        time_slept = 0.0
-        while time_slept < timeout:
-            msg_part = self.read_server_message(self.msg_timeout)
-            if not msg_part:
-                # Wait and check whether there is a message.
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
-                time_slept += self.cfg['Hub']['main_loop_sleep_time']
-                if self.debug >= 2:
-                    print "gr.time_slept:", time_slept
+        # Get results from the server as soon as they arrive. Like in
+        # read_server_message, the deadline uses the wall clock.
+        deadline = time.time() + timeout
+        while '<CONFNET>' not in msg:
+            if not self.s_messages:
+                if not self.receive_server_data(deadline - time.time()) \
+                        and time.time() >= deadline:
+                    raise JuliusASRTimeoutException(
+                        "Timeout when waiting for the Julius server results.")
                 continue
 
-            msg += msg_part + '\n'
+            msg += self.s_messages.popleft() + '\n'
 
             if self.debug:
                 print msg
 
-            if '<CONFNET>' in msg:
-                break
-        else:
-            raise JuliusASRTimeoutException(
-                "Timeout when waiting for the Julius server results.")
-
         # Process the results.
         """ Typical result returned by the Julius ASR.
 
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# This code is PEP8-compliant. See http://www.python.org/dev/peps/pep-0008.
+from __future__ import unicode_literals
+
+import itertools
+import time
+
+from alex.components.asr.base import ASRInterface
+from alex.components.asr.utterance import Utterance, UtteranceNBList
+
+
+class StubASR(ASRInterface):
+
+    """ Replaces a network ASR service (e.g. Google ASR) in benchmarks, so that they do not depend on the network.
+
+    The recognition takes as long as a request to the service, i.e. the latency plus the real time ratio times the
+    duration of the audio. The audio is discarded and the recognized hypotheses are the configured utterances: either
+    a list of utterances recognized in turn, or a dictionary of the utterances of the user turns by the replayed
+    calls. In the latter case, cfg['ASR']['Stub']['replayed_call'] is a multiprocessing.Array of chars set to the
+    replayed call by its ReplayIO (see alex.components.hub.replayio) and the utterances of the call are recognized in
+    turn; '_other_' is recognized when they run out.
+
+    """
+
+    def __init__(self, cfg):
+        super(StubASR, self).__init__(cfg)
+        self.latency = self.cfg['ASR']['Stub']['latency']
+        self.rt_ratio = self.cfg['ASR']['Stub']['rt_ratio']
+        self.replayed_call = self.cfg['ASR']['Stub']['replayed_call']
+        if self.replayed_call is None:
+            self.utterances = itertools.cycle(self.cfg['ASR']['Stub']['utterances'] or ['_other_'])
+        else:
+            self.call = None
+            self.utterances = iter([])
+        self.n_samples = 0
+
+    def next_utterance(self):
+        if self.replayed_call is not None and self.replayed_call.value != self.call:
+            # a new call is replayed
+            self.call = self.replayed_call.value
+            self.utterances = iter(self.cfg['ASR']['Stub']['utterances'].get(self.call, []))
+
+        return next(self.utterances, '_other_')
+
+    def flush(self):
+        self.n_samples = 0
+
+    def rec_in(self, frame):
+        self.n_samples += len(frame.payload) / 2
+
+    def hyp_out(self):
+        duration = float(self.n_samples) / self.cfg['Audio']['sample_rate']
+        self.n_samples = 0
+
+        time.sleep(self.latency + self.rt_ratio * duration)
+
+        nblist = UtteranceNBList()
+        nblist.add(1.0, Utterance(self.next_utterance()))
+        nblist.merge()
+        nblist.add_other()
+
+        return nblist
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import collections
+import socket
+import threading
+import time
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.components.asr.exceptions import JuliusASRException, JuliusASRTimeoutException
+from alex.components.asr.julius import JuliusASR
+
+
+class SocketJuliusASR(JuliusASR):
+    """Reads the server messages from a given socket instead of a running Julius server."""
+
+    def __init__(self, s_socket, recv_size=JuliusASR.recv_size):
+        self.debug = False
+        self.msg_timeout = 0.1
+        self.recv_size = recv_size
+
+        self.s_socket = s_socket
+        self.s_socket.setblocking(0)
+        self.s_buffer = b''
+        self.s_messages = collections.deque()
+
+    def __del__(self):
+        pass
+
+
+class TestJuliusASR(unittest.TestCase):
+    def setUp(self):
+        self.s_socket, self.server = socket.socketpair()
+
+    def tearDown(self):
+        self.s_socket.close()
+        self.server.close()
+
+    def test_message_split_across_chunks(self):
+        asr = SocketJuliusASR(self.s_socket, recv_size=4)
+        self.server.sendall(b'<STARTRECOG/>\n.\n')
+        self.assertEqual(asr.read_server_message(), b'<STARTRECOG/>')
+        self.assertEqual(asr.s_buffer, b'')
+
+        # the end of the message arrives later
+        self.server.sendall(b'<ENDRECOG/>\n')
+        timer = threading.Timer(0.02, self.server.sendall, [b'.\n'])
+        timer.start()
+        self.assertEqual(asr.read_server_message(1.0), b'<ENDRECOG/>')
+        timer.join()
+
+    def test_several_messages_in_one_chunk(self):
+        asr = SocketJuliusASR(self.s_socket)
+        self.server.sendall(b'<STARTPROC/>\n.\n<STARTRECOG/>\n.\n<ENDRECOG/>\n.\n<INPUT')
+
+        self.assertEqual(asr.read_server_message(), b'<STARTPROC/>')
+        self.assertEqual(list(asr.s_messages), [b'<STARTRECOG/>', b'<ENDRECOG/>'])
+        self.assertEqual(asr.s_buffer, b'<INPUT')
+        self.assertEqual(asr.read_server_message(), b'<STARTRECOG/>')
+        self.assertEqual(asr.read_server_message(), b'<ENDRECOG/>')
+
+    def test_timeout(self):
+        asr = SocketJuliusASR(self.s_socket)
+        # no message has started
+        self.assertIsNone(asr.read_server_message(1.0))
+
+        # the started message does not end in time
+        self.server.sendall(b'<INPUT STATUS="LISTEN"/>\n')
+        start = time.time()
+        self.assertRaises(JuliusASRTimeoutException, asr.read_server_message, 0.05)
+        self.assertGreaterEqual(time.time() - start, 0.05)
+
+        # the message is read once it is complete
+        self.server.sendall(b'.\n')
+        self.assertEqual(asr.read_server_message(), b'<INPUT STATUS="LISTEN"/>')
+
+    def test_closed_connection(self):
+        asr = SocketJuliusASR(self.s_socket)
+        self.server.sendall(b'<STARTPROC/>\n')
+        self.server.close()
+
+        self.assertRaises(JuliusASRException, asr.read_server_message)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.components.asr.stub import StubASR
+from alex.components.hub.messages import Frame
+
+
+class TestStubASR(unittest.TestCase):
+    def create_asr(self, utterances, replayed_call=None):
+        return StubASR({
+            'Audio': {'sample_rate': 16000},
+            'Logging': {'system_logger': None},
+            'ASR': {'Stub': {'latency': 0.0, 'rt_ratio': 0.0, 'utterances': utterances,
+                             'replayed_call': replayed_call}},
+        })
+
+    def recognize(self, asr):
+        asr.rec_in(Frame(b'\x00\x00' * 160))
+        return unicode(asr.hyp_out().get_best())
+
+    def test_utterances_in_turn(self):
+        asr = self.create_asr(['hello', 'bye'])
+        self.assertEqual([self.recognize(asr) for i in range(3)], ['hello', 'bye', 'hello'])
+
+        asr = self.create_asr([])
+        self.assertEqual(self.recognize(asr), '_other_')
+
+    def test_utterances_of_replayed_call(self):
+        replayed_call = multiprocessing.Array('c', 256)
+        asr = self.create_asr({'a/session.xml': ['hello', 'bye'], 'b/session.xml': ['yes']}, replayed_call)
+
+        replayed_call.value = 'a/session.xml'
+        self.assertEqual([self.recognize(asr) for i in range(3)], ['hello', 'bye', '_other_'])
+
+        # the turns of the next call are recognized from its first turn
+        replayed_call.value = 'b/session.xml'
+        self.assertEqual(self.recognize(asr), 'yes')
+        replayed_call.value = 'a/session.xml'
+        self.assertEqual(self.recognize(asr), 'hello')
+
+        replayed_call.value = 'recorded.wav'
+        self.assertEqual(self.recognize(asr), '_other_')
+
+
+if __name__ == '__main__':
+    unittest.main()
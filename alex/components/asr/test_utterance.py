@@ -4,6 +4,7 @@
 from __future__ import unicode_literals
 
 import unittest
+from itertools import product
 
 import __init__
 
@@ -92,6 +93,8 @@ class TestUtteranceConfusionNetwork(unittest.TestCase):
         correct_nblist.add(A1*B1*C3, Utterance("A1 B1 C3"))
         correct_nblist.add(A1*B3*C2, Utterance("A1 B3 C2"))
         correct_nblist.add(A1*B2*C3, Utterance("A1 B2 C3"))
+        correct_nblist.add(A3*B1*C1, Utterance("A3 B1 C1"))
+        correct_nblist.add(A2*B1*C1, Utterance("A2 B1 C1"))
         correct_nblist.merge()
         correct_nblist.add_other()
 
@@ -118,6 +121,26 @@ class TestUtteranceConfusionNetwork(unittest.TestCase):
 
         self.assertEqual(unicode(gen_nblist), unicode(correct_nblist))
 
+    def test_iter_utterance_hyps(self):
+        confnet = UtteranceConfusionNetwork()
+        confnet.add([[0.7, 'A1'], [0.2, 'A2'], [0.1, 'A3'], ])
+        confnet.add([[0.5, 'B1'], [0.5, 'B2'], ])
+        confnet.add([[1.0, 'C1'], [0.0, 'C2'], ])
+        confnet.add([[0.8, 'D1'], [0.2, 'D2'], ])
+
+        # enumerate all hypotheses and sort them by their probability
+        all_probs = []
+        for a, b, c, d in product(confnet.cn[0], confnet.cn[1], confnet.cn[2], confnet.cn[3]):
+            all_probs.append(a[0] * b[0] * c[0] * d[0])
+        all_probs.sort(reverse=True)
+
+        generated = list(confnet.iter_utterance_hyps())
+        self.assertEqual(len(generated), len(all_probs))
+        self.assertEqual(len(set(unicode(utt) for prob, utt in generated)), len(all_probs))
+        for (prob, utt), correct_prob in zip(generated, all_probs):
+            self.assertAlmostEqual(prob, correct_prob)
+        self.assertEqual(generated[0][1], Utterance("A1 B1 C1 D1"))
+
     def test_repr_basic(self):
         A1, A2, A3 = 0.90, 0.05, 0.05
         B1, B2, B3 = 0.50, 0.35, 0.15
@@ -6,9 +6,11 @@
 from __future__ import unicode_literals
 
 import copy
+import heapq
 import re
 from collections import namedtuple
-from itertools import izip, product
+from itertools import islice, izip, product
+from math import log
 from operator import add, itemgetter, mul
 
 from alex.components.slu.exceptions import SLUException
@@ -626,6 +628,12 @@ class UtteranceNBList(ASRHypothesis, NBList):
         for p, u in rep:
             self.add(p, Utterance(u))
 
+    def hyp_key(self, utterance):
+        # Utterances are compared by their words.
+        if isinstance(utterance, basestring):
+            return tuple(utterance.split())
+        return tuple(utterance)
+
     def get_best_utterance(self):
         """Returns the most probable utterance.
 
@@ -1487,58 +1495,74 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
         return Utterance(' '.join(s))
 
     # FIXME Make this method aware of _long_links.
-    def get_utterance_nblist(self, n=10, prune_prob=0.005):
-        """Parses the confusion network and generates n best hypotheses.
+    def iter_utterance_hyps(self):
+        """Generates the hypotheses of the confusion network lazily in the
+        order of decreasing probability.
 
-        The result is a list of utterance hypotheses each with a with assigned
-        probability.  The list also includes the utterance "_other_" for not
-        having the correct utterance in the list.
+        This is a best-first search over the hypothesis indices.  A hypothesis
+        is expanded by replacing the alternative for one word with the next
+        worse alternative.  To generate every hypothesis only once, only the
+        words at or after the last replaced word are replaced.  The
+        log-probabilities of the expanded hypotheses are updated incrementally
+        and they only order the search; the probability of a generated
+        hypothesis is computed exactly by get_prob.  It assumes that the
+        confusion network is sorted.
 
-        Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
+        Yields (probability, utterance) tuples.
 
         """
+        inf = float('inf')
+        logprobs = [[log(prob) if prob > 0. else -inf for prob, word in alts]
+                    for alts in self._cn]
 
-        open_hyp = []
-        closed_hyp = {}
-
-        # create index for the best hypothesis
+        # The heap items are (-log-probability, hypothesis index, the index of
+        # the last replaced word).
         best_hyp = tuple([0] * len(self._cn))
-        best_prob = self.get_prob(best_hyp)
-        open_hyp.append((best_prob, best_hyp))
-
-        i = 0
-        while open_hyp and i < n:
-            i += 1
-
-            current_prob, current_hyp_index = open_hyp.pop(0)
-
-            if current_hyp_index not in closed_hyp:
-                # process only those hypotheses which were not processed so far
+        open_hyp = [(-sum(alt_logprobs[0] for alt_logprobs in logprobs),
+                     best_hyp, 0)]
+
+        while open_hyp:
+            neg_logprob, hyp_index, last = heapq.heappop(open_hyp)
+            yield (self.get_prob(hyp_index),
+                   self.get_hyp_index_utterance(hyp_index))
+
+            for word_idx in xrange(last, len(hyp_index)):
+                alt_idx = hyp_index[word_idx] + 1
+                if alt_idx >= len(logprobs[word_idx]):
+                    # this would generate an inadmissible word hypothesis
+                    continue
 
-                closed_hyp[current_hyp_index] = current_prob
+                if neg_logprob == inf:
+                    worse_neg_logprob = inf
+                else:
+                    worse_neg_logprob = (neg_logprob
+                                         + logprobs[word_idx][alt_idx - 1]
+                                         - logprobs[word_idx][alt_idx])
+                worse_hyp = (hyp_index[:word_idx] + (alt_idx,)
+                             + hyp_index[word_idx + 1:])
+                heapq.heappush(open_hyp,
+                               (worse_neg_logprob, worse_hyp, word_idx))
 
-                # print "current_prob, current_hyp_index:", current_prob,
-                # current_hyp_index
+    # FIXME Make this method aware of _long_links.
+    def get_utterance_nblist(self, n=10, prune_prob=0.005):
+        """Parses the confusion network and generates n best hypotheses.
 
-                for hyp_index in self.get_next_worse_candidates(current_hyp_index):
-                    prob = self.get_prob(hyp_index)
-                    open_hyp.append((prob, hyp_index))
+        The result is a list of utterance hypotheses each with a with assigned
+        probability.  The list also includes the utterance "_other_" for not
+        having the correct utterance in the list.
 
-                open_hyp.sort(reverse=True)
+        Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
 
+        """
         nblist = UtteranceNBList()
-        for idx in closed_hyp:
-            nblist.add(closed_hyp[idx], self.get_hyp_index_utterance(idx))
-
-        # print nblist
-        # print
+        # The hypotheses are generated from the most probable one; therefore,
+        # adding them to the n-best list is cheap.
+        for prob, utterance in islice(self.iter_utterance_hyps(), n):
+            nblist.add(prob, utterance)
 
         nblist.merge()
         nblist.add_other()
 
-        # print nblist
-        # print
-
         return nblist
 
     # TODO Implement!
@@ -16,10 +16,12 @@ from alex.components.asr.exceptions import ASRException
 from alex.components.asr.julius import JuliusASRTimeoutException
 from alex.components.asr.utterance import UtteranceNBList, UtteranceConfusionNetwork
 from alex.components.hub.messages import Command, Frame, ASRHyp
+from alex.components.hub.trace import get_tracer
+from alex.utils.mproc import Reactor
 from alex.utils.procname import set_proc_name
 
 
-class ASR(multiprocessing.Process):
+class ASR(Reactor):
 
     """
     ASR recognizes input audio and returns an N-best list hypothesis or
@@ -34,12 +36,16 @@ class ASR(multiprocessing.Process):
     This component is a wrapper around multiple recognition engines which
     handles inter-process communication.
 
+    If the audio is read from a shared ring buffer, only the commands are
+    received through audio_in. They contain the positions of the start and
+    the end of the speech segment in the ring buffer.
+
     Attributes:
         asr -- the ASR object itself
 
     """
 
-    def __init__(self, cfg, commands, audio_in, asr_hypotheses_out, close_event):
+    def __init__(self, cfg, commands, audio_in, asr_hypotheses_out, close_event, audio_in_ring=None):
         """
         Initialises an ASR object according to the configuration (cfg['ASR']
         is the relevant section), and stores pipe ends to other processes.
@@ -52,16 +58,20 @@ class ASR(multiprocessing.Process):
                 audio frames (from VAD)
             asr_hypotheses_out: our end of a pipe (multiprocessing.Pipe) for
                 sending ASR hypotheses
+            audio_in_ring: a SharedRingReader for reading the audio which
+                must not overtake the VAD
 
         """
 
-        multiprocessing.Process.__init__(self)
+        Reactor.__init__(self)
 
         self.cfg = cfg
         self.commands = commands
         self.local_commands = deque()
         self.audio_in = audio_in
         self.local_audio_in = deque()
+        self.audio_in_ring = audio_in_ring
+        self.audio_in_ring_limit = 0
         self.asr_hypotheses_out = asr_hypotheses_out
         self.close_event = close_event
 
@@ -69,16 +79,33 @@ class ASR(multiprocessing.Process):
         self.asr = asr_factory(cfg)
 
         self.system_logger = self.cfg['Logging']['system_logger']
+        self.tracer = get_tracer(self.cfg)
         self.session_logger = self.cfg['Logging']['session_logger']
 
         self.recognition_on = False
 
+    def get_input_connections(self):
+        if self.audio_in_ring is not None:
+            return [self.commands, self.audio_in, self.audio_in_ring]
+        return [self.commands, self.audio_in]
+
+    def has_pending_input(self):
+        if self.audio_in_ring is not None and self.audio_in_ring.available():
+            return True
+        return bool(self.local_commands or self.local_audio_in)
+
     def recv_input_locally(self):
         """ Copy all input from input connections into local queue objects.
 
         This will prevent blocking the senders.
         """
 
+        if self.audio_in_ring is not None:
+            # The limit must be read before the commands: all commands about the audio before the limit were
+            # already sent by the VAD.
+            self.audio_in_ring_limit = self.audio_in_ring.get_limit()
+            self.audio_in_ring.clear_notifications()
+
         while self.commands.poll():
             command = self.commands.recv()
             self.local_commands.append(command)
@@ -87,6 +114,18 @@ class ASR(multiprocessing.Process):
             frame = self.audio_in.recv()
             self.local_audio_in.append(frame)
 
+    def read_audio_in_ring(self, limit):
+        """Reads the audio from the shared ring buffer up to the limit position and passes it to the ASR if the
+        recognition is on.
+        """
+        position, data = self.audio_in_ring.read(limit - self.audio_in_ring.position, limit)
+        if data is None:
+            return
+
+        if self.recognition_on and len(data):
+            self.asr.rec_in(Frame(data.tostring()))
+        self.audio_in_ring.consume(len(data))
+
     def process_pending_commands(self):
         """Process all pending commands.
 
@@ -113,6 +152,8 @@ class ASR(multiprocessing.Process):
                         self.audio_in.recv()
 
                     self.local_audio_in.clear()
+                    if self.audio_in_ring is not None:
+                        self.audio_in_ring.seek(self.audio_in_ring.get_limit())
                     self.asr.flush()
                     self.recognition_on = False
 
@@ -123,6 +164,10 @@ class ASR(multiprocessing.Process):
         return False
 
     def read_audio_write_asr_hypotheses(self):
+        # Read input audio from the shared ring buffer when all commands about it were processed.
+        if self.audio_in_ring is not None and not self.local_audio_in:
+            self.read_audio_in_ring(self.audio_in_ring_limit)
+
         # Read input audio.
         if self.local_audio_in:
             if len(self.local_audio_in) > 40:
@@ -161,10 +206,16 @@ class ASR(multiprocessing.Process):
 
                     dr_speech_start = "speech_start"
                     fname = data_rec.parsed['fname']
+
+                    if self.audio_in_ring is not None:
+                        self.audio_in_ring.seek(int(data_rec.parsed['position']))
                 elif data_rec.parsed['__name__'] == "speech_end":
                     dr_speech_start = "speech_end"
                     fname = data_rec.parsed['fname']
 
+                    if self.audio_in_ring is not None:
+                        self.read_audio_in_ring(int(data_rec.parsed['position']))
+
                 # Check consistency of the input command.
                 if dr_speech_start:
                     if ((not self.recognition_on and dr_speech_start != "speech_start")
@@ -186,6 +237,7 @@ class ASR(multiprocessing.Process):
 
                 elif dr_speech_start == "speech_end":
                     self.recognition_on = False
+                    trace_start = time.time()
 
                     if self.cfg['ASR']['debug']:
                         self.system_logger.debug('ASR: speech_end(fname="%s")' % fname)
@@ -226,7 +278,8 @@ class ASR(multiprocessing.Process):
                         self.session_logger.asr("user", fname, [(-1, asr_hyp)], None)
 
                     self.commands.send(Command('asr_end(fname="%s")' % fname, 'ASR', 'HUB'))
-                    self.asr_hypotheses_out.send(ASRHyp(asr_hyp, fname=fname))
+                    self.asr_hypotheses_out.send(ASRHyp(asr_hyp, fname=fname, trace_id=data_rec.trace_id))
+                    self.tracer.span(data_rec.trace_id, 'asr', trace_start)
             else:
                 raise ASRException('Unsupported input.')
 
@@ -241,7 +294,7 @@ class ASR(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                self.wait_for_input()
 
                 s = (time.time(), time.clock())
 
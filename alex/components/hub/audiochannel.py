@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Implements a connection for passing audio between the hub components.
+
+Audio frames are sent through an AudioChannel as raw bytes prefixed with a one byte tag, and several frames can be
+sent in one message. Any other objects (e.g. commands) are pickled as by a multiprocessing connection, so the order of
+frames and commands is preserved.
+"""
+
+import cPickle
+import multiprocessing
+import struct
+
+from collections import deque
+
+from alex.components.hub.messages import Frame
+
+# Pickles produced by multiprocessing connections start with the PROTO opcode b'\x80'.
+FRAME_TAG = b'\x00'
+BATCH_TAG = b'\x01'
+
+
+class AudioChannel(object):
+    """
+    A wrapper of a multiprocessing connection with the same interface which sends audio frames without pickling.
+
+    The received frames are new Frame objects with ids of the receiving process. Frames with a source or a target
+    are pickled as any other object.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.received = deque()
+
+    def fileno(self):
+        return self.connection.fileno()
+
+    def close(self):
+        self.connection.close()
+
+    def poll(self, timeout=0.0):
+        return bool(self.received) or self.connection.poll(timeout)
+
+    def send(self, obj):
+        if isinstance(obj, Frame) and obj.source is None and obj.target is None:
+            self.connection.send_bytes(FRAME_TAG + obj.payload)
+        else:
+            self.connection.send(obj)
+
+    def send_frames(self, frames):
+        """Sends the frames in one message.
+
+        :param frames: a list of Frame objects or raw payloads
+        """
+        payloads = [frame.payload if isinstance(frame, Frame) else frame for frame in frames]
+        if not payloads:
+            return
+
+        header = struct.pack(b'<I%dI' % len(payloads), len(payloads), *[len(p) for p in payloads])
+        self.connection.send_bytes(BATCH_TAG + header + b''.join(payloads))
+
+    def recv(self):
+        if not self.received:
+            self.received.extend(self.decode(self.connection.recv_bytes()))
+        return self.received.popleft()
+
+    def decode(self, data):
+        """Returns the list of objects contained in a received message."""
+        tag = data[:1]
+        if tag == FRAME_TAG:
+            return [Frame(data[1:])]
+
+        if tag == BATCH_TAG:
+            n = struct.unpack_from(b'<I', data, 1)[0]
+            lengths = struct.unpack_from(b'<%dI' % n, data, 5)
+            frames = []
+            start = 5 + 4 * n
+            for length in lengths:
+                frames.append(Frame(data[start:start + length]))
+                start += length
+            return frames
+
+        return [cPickle.loads(data)]
+
+
+def AudioPipe(duplex=True):
+    """Returns a pair of AudioChannel objects connected by a pipe, see multiprocessing.Pipe."""
+    conn1, conn2 = multiprocessing.Pipe(duplex)
+    return AudioChannel(conn1), AudioChannel(conn2)
+
+
+def send_frames(connection, frames):
+    """Sends the frames through the connection, in one message if the connection supports it (e.g. an AudioChannel).
+
+    :param connection: an AudioChannel, a SessionConnection or a multiprocessing connection
+    :param frames: a list of Frame objects or raw payloads
+    """
+    if hasattr(connection, 'send_frames'):
+        connection.send_frames(frames)
+    else:
+        for frame in frames:
+            connection.send(frame if isinstance(frame, Frame) else Frame(frame))
@@ -4,14 +4,60 @@
 # pylint: disable-msg=E1101
 
 import fcntl
+import os
+import sqlite3
 import time
 import cPickle as pickle
 
-#FIXME: It should use sqlalchemy instead of the pickles.
+
+def call_db_factory(cfg, file_name, period = 24*60*60):
+    """Returns the call database stored in the file.
+
+    The pickled databases (the *.pckl files) are read by CallDB, all other files are SQLite databases of SQLiteCallDB.
+
+    If the SQLite database does not exist yet and there is a pickled database with the same name (e.g. call_db.pckl
+    for call_db.sqlite), its calls are migrated into the SQLite database, so that the history of the calls (and the
+    limits of the calls based on it) is not lost when the configuration is switched to SQLite.
+    """
+    if file_name.endswith('.pckl'):
+        return CallDB(cfg, file_name, period)
+
+    pickle_file_name = os.path.splitext(file_name)[0] + '.pckl'
+    if not os.path.exists(file_name) and os.path.exists(pickle_file_name):
+        migrate_call_db(cfg, pickle_file_name, file_name)
+
+    return SQLiteCallDB(cfg, file_name, period)
+
+
+def migrate_call_db(cfg, pickle_file_name, file_name):
+    """Copies all calls from the pickled database to a new SQLite database.
+
+    The calls are written into a temporary file which is renamed to the SQLite database when complete, so that an
+    interrupted migration does not leave an incomplete database behind.
+    """
+    calls = CallDB(cfg, pickle_file_name).read_database()['calls_from_start_end_length']
+
+    tmp_file_name = file_name + '.migrating'
+    if os.path.exists(tmp_file_name):
+        os.remove(tmp_file_name)
+
+    db = SQLiteCallDB(cfg, tmp_file_name)
+    db.import_calls(calls)
+    db.close()
+    os.rename(tmp_file_name, file_name)
+
+    if cfg is not None and cfg.get('Logging'):
+        cfg['Logging']['system_logger'].info('Migrated %d calls of %d remote URIs from %s to %s' %
+                                             (sum(len(c) for c in calls.itervalues()), len(calls),
+                                              pickle_file_name, file_name))
+
 
 class CallDB(object):
     """Implements logging of all interesting call stats.
     It can be used for customization of the SDS, e.g. for novice or expert users.
+
+    All the stats are stored in a single pickled dictionary, which is read and written as a whole.
+    SQLiteCallDB should be used for large databases.
     """
     def __init__(self, cfg, file_name, period = 24*60*60):
         self.cfg = cfg
@@ -71,10 +117,12 @@ class CallDB(object):
         except AttributeError:
             pass
 
-    def log(self):
-        db = self.read_database()
+    def get_uris(self):
+        """Returns the remote URIs of all calls in the database."""
+        return self.read_database()['calls_from_start_end_length'].keys()
 
-        for remote_uri in db['calls_from_start_end_length']:
+    def log(self):
+        for remote_uri in self.get_uris():
             num_all_calls, total_time, last_period_num_calls, last_period_total_time, last_period_num_short_calls = self.get_uri_stats(remote_uri)
 
             m = []
@@ -94,8 +142,6 @@ class CallDB(object):
             self.cfg['Logging']['system_logger'].info('\n'.join(m))
 
     def log_uri(self, remote_uri):
-        db = self.read_database()
-
         num_all_calls, total_time, last_period_num_calls, last_period_total_time, last_period_num_short_calls = self.get_uri_stats(remote_uri)
 
         m = []
@@ -166,3 +212,98 @@ class CallDB(object):
             pass
 
         self.close_database(db)
+
+
+class SQLiteCallDB(CallDB):
+    """Implements logging of all interesting call stats in an SQLite database.
+
+    The calls are indexed by the remote URI and the start time, so that the stats of an URI need only the calls from
+    the last period. The total stats of every URI are kept in a separate table and they are updated whenever a call
+    is disconnected.
+    """
+    def __init__(self, cfg, file_name, period = 24*60*60, timeout = 10.0):
+        super(SQLiteCallDB, self).__init__(cfg, file_name, period)
+
+        dir_name = os.path.dirname(self.db_fname)
+        if dir_name and not os.path.exists(dir_name):
+            os.makedirs(dir_name)
+
+        # the transactions are started explicitly
+        self.connection = sqlite3.connect(self.db_fname, timeout=timeout, isolation_level=None)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS calls '
+                                '(id INTEGER PRIMARY KEY, remote_uri TEXT, start REAL, end REAL, length REAL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS calls_uri_start ON calls (remote_uri, start)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS uris '
+                                '(remote_uri TEXT PRIMARY KEY, num_calls INTEGER, total_time REAL)')
+
+    def close(self):
+        self.connection.close()
+
+    def get_uris(self):
+        return [row[0] for row in self.connection.execute('SELECT remote_uri FROM uris')]
+
+    def get_uri_stats(self, remote_uri):
+        row = self.connection.execute('SELECT num_calls, total_time FROM uris WHERE remote_uri = ?',
+                                      (remote_uri, )).fetchone()
+        num_all_calls, total_time = row if row is not None else (0, 0)
+
+        last_period_num_calls, last_period_total_time, last_period_num_short_calls = self.connection.execute(
+            'SELECT COUNT(*), TOTAL(length), TOTAL(length < ?) FROM calls '
+            'WHERE remote_uri = ? AND start > ? AND length > 0',
+            (self.cfg['VoipHub']['short_calls_time_duration'], remote_uri, time.time() - self.period)).fetchone()
+
+        return num_all_calls, total_time, last_period_num_calls, last_period_total_time, int(last_period_num_short_calls)
+
+    def track_confirmed_call(self, remote_uri):
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            self.connection.execute('INSERT OR IGNORE INTO uris VALUES (?, 0, 0)', (remote_uri, ))
+            self.connection.execute('INSERT INTO calls (remote_uri, start, end, length) VALUES (?, ?, 0, 0)',
+                                    (remote_uri, time.time()))
+            self.connection.execute('COMMIT')
+        except:
+            self.connection.execute('ROLLBACK')
+            raise
+
+    def track_disconnected_call(self, remote_uri):
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.connection.execute('SELECT id, start, end, length FROM calls WHERE remote_uri = ? '
+                                          'ORDER BY start DESC, id DESC LIMIT 1', (remote_uri, )).fetchone()
+
+            # disconnecting call which was not confirmed for URI calling for the first time
+            if row is not None:
+                call_id, s, e, l = row
+
+                if e == 0 and l == 0:
+                    # there is a record about last confirmed but not disconnected call
+                    e = time.time()
+                    self.connection.execute('UPDATE calls SET end = ?, length = ? WHERE id = ?', (e, e - s, call_id))
+                    self.add_to_uri_totals(remote_uri, e - s)
+
+            self.connection.execute('COMMIT')
+        except:
+            self.connection.execute('ROLLBACK')
+            raise
+
+    def add_to_uri_totals(self, remote_uri, length):
+        if length > 0:
+            self.connection.execute('UPDATE uris SET num_calls = num_calls + 1, total_time = total_time + ? '
+                                    'WHERE remote_uri = ?', (length, remote_uri))
+
+    def import_calls(self, calls_from_start_end_length):
+        """Adds the calls from the dictionary of a pickled CallDB, which maps the remote URIs to the lists of
+        [start, end, length] of their calls."""
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            for remote_uri, calls in calls_from_start_end_length.iteritems():
+                self.connection.execute('INSERT OR IGNORE INTO uris VALUES (?, 0, 0)', (remote_uri, ))
+                for s, e, l in calls:
+                    self.connection.execute('INSERT INTO calls (remote_uri, start, end, length) VALUES (?, ?, ?, ?)',
+                                            (remote_uri, s, e, l))
+                    self.add_to_uri_totals(remote_uri, l)
+
+            self.connection.execute('COMMIT')
+        except:
+            self.connection.execute('ROLLBACK')
+            raise
@@ -10,12 +10,14 @@ import urllib
 
 from alex.components.slu.da import DialogueAct, DialogueActItem, DialogueActConfusionNetwork
 from alex.components.hub.messages import Command, SLUHyp, DMDA
+from alex.components.hub.trace import get_tracer
 from alex.components.dm.common import dm_factory, get_dm_type
 from alex.components.dm.exceptions import DMException
+from alex.utils.mproc import Reactor
 from alex.utils.procname import set_proc_name
 
 
-class DM(multiprocessing.Process):
+class DM(Reactor):
     """DM accepts N-best list hypothesis or a confusion network generated by an SLU component.
     The result of this component is an output dialogue act.
 
@@ -26,9 +28,10 @@ class DM(multiprocessing.Process):
     """
 
     def __init__(self, cfg, commands, slu_hypotheses_in, dialogue_act_out, close_event):
-        multiprocessing.Process.__init__(self)
+        Reactor.__init__(self)
 
         self.cfg = cfg
+        self.tracer = get_tracer(cfg)
         self.commands = commands
         self.slu_hypotheses_in = slu_hypotheses_in
         self.dialogue_act_out = dialogue_act_out
@@ -45,6 +48,9 @@ class DM(multiprocessing.Process):
         random.seed(self.cfg['DM']['epilogue']['code_seed'])
         random.shuffle(self.codes)
 
+    def get_input_connections(self):
+        return [self.commands, self.slu_hypotheses_in]
+
     def process_pending_commands(self):
         """Process all pending commands.
 
@@ -199,6 +205,8 @@ class DM(multiprocessing.Process):
                 self.commands.send(DMDA(self.epilogue_da, 'DM', 'HUB'))
                 self.commands.send(Command('hangup()', 'DM', 'HUB'))
             elif isinstance(data_slu, SLUHyp):
+                trace_start = time.time()
+
                 # reset measuring of the user silence
                 self.last_user_da_time = time.time()
                 self.last_user_diff_time = time.time()
@@ -219,7 +227,8 @@ class DM(multiprocessing.Process):
 
                     if not self.epilogue_state:
                         self.cfg['Logging']['session_logger'].dialogue_act("system", da)
-                        self.commands.send(DMDA(da, 'DM', 'HUB'))
+                        self.commands.send(DMDA(da, 'DM', 'HUB', data_slu.trace_id))
+                        self.tracer.span(data_slu.trace_id, 'dm', trace_start)
                         self.commands.send(Command('hangup()', 'DM', 'HUB'))
                 else:
                     if self.cfg['DM']['debug']:
@@ -232,7 +241,8 @@ class DM(multiprocessing.Process):
                         self.cfg['Logging']['system_logger'].debug(s)
 
                     self.cfg['Logging']['session_logger'].dialogue_act("system", da)
-                    self.commands.send(DMDA(da, 'DM', 'HUB'))
+                    self.commands.send(DMDA(da, 'DM', 'HUB', data_slu.trace_id))
+                    self.tracer.span(data_slu.trace_id, 'dm', trace_start)
 
 
             elif isinstance(data_slu, Command):
@@ -251,7 +261,7 @@ class DM(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                self.wait_for_input()
 
                 s = (time.time(), time.clock())
 
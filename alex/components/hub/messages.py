@@ -9,19 +9,22 @@ import time
 from datetime import datetime
 
 from alex.utils.text import parse_command
-from alex.utils.mproc import InstanceID
+from alex.utils.mproc import InstanceID, LocalInstanceID
 
 # TODO: add comments
 
 
 class Message(InstanceID):
     """ Abstract class which implements basic functionality for messages passed between components in the alex.
+
+    The trace ID identifies the user turn the message belongs to, see alex.components.hub.trace.
     """
-    def __init__(self, source, target):
+    def __init__(self, source, target, trace_id=None):
         self.id = self.get_instance_id()
         self.time = datetime.now()
         self.source = source
         self.target = target
+        self.trace_id = trace_id
 
     def get_time_str(self):
         """ Return current time in dashed ISO-like format.
@@ -30,8 +33,8 @@ class Message(InstanceID):
             tz=time.tzname[time.localtime().tm_isdst])
 
 class Command(Message):
-    def __init__(self, command, source=None, target=None):
-        Message.__init__(self, source, target)
+    def __init__(self, command, source=None, target=None, trace_id=None):
+        Message.__init__(self, source, target, trace_id)
 
         self.command = command
         self.parsed = collections.defaultdict(unicode, parse_command(self.command))
@@ -43,8 +46,8 @@ class Command(Message):
         return "#%-6d Time: %s From: %-10s To: %-10s Command: %s " % (self.id, self.get_time_str(), self.source, self.target, self.command)
 
 class ASRHyp(Message):
-    def __init__(self, hyp, source=None, target=None, fname = None):
-        Message.__init__(self, source, target)
+    def __init__(self, hyp, source=None, target=None, fname = None, trace_id=None):
+        Message.__init__(self, source, target, trace_id)
 
         self.hyp = hyp
         self.fname = fname
@@ -56,8 +59,8 @@ class ASRHyp(Message):
         return "#%-6d Time: %s From: %-10s To: %-10s Hyp: %s fname: %s" % (self.id, self.get_time_str(), self.source, self.target, self.hyp, self.fname)
 
 class SLUHyp(Message):
-    def __init__(self, hyp, asr_hyp=None, source=None, target=None):
-        Message.__init__(self, source, target)
+    def __init__(self, hyp, asr_hyp=None, source=None, target=None, trace_id=None):
+        Message.__init__(self, source, target, trace_id)
 
         self.hyp = hyp
         self.asr_hyp = asr_hyp
@@ -69,8 +72,8 @@ class SLUHyp(Message):
         return "#%-6d Time: %s From: %-10s To: %-10s Hyp: %s " % (self.id, self.get_time_str(), self.source, self.target, self.hyp)
 
 class DMDA(Message):
-    def __init__(self, da, source=None, target=None):
-        Message.__init__(self, source, target)
+    def __init__(self, da, source=None, target=None, trace_id=None):
+        Message.__init__(self, source, target, trace_id)
 
         self.da = da
 
@@ -78,8 +81,8 @@ class DMDA(Message):
         return "#%-6d Time: %s From: %-10s To: %-10s DA: %s " % (self.id, self.get_time_str(), self.source, self.target, self.da)
 
 class TTSText(Message):
-    def __init__(self, text, source=None, target=None):
-        Message.__init__(self, source, target)
+    def __init__(self, text, source=None, target=None, trace_id=None):
+        Message.__init__(self, source, target, trace_id)
 
         self.text = text
 
@@ -90,12 +93,26 @@ class TTSText(Message):
             return "#%-6d Time: %s From: %-10s To: %-10s Text: %s " % (self.id, self.get_time_str(), self.source, self.target, self.text)
 
 
-class Frame(Message):
+class Frame(LocalInstanceID, Message):
+    """ An audio frame.
+
+    Frames are created every few milliseconds in several processes; therefore, they get ids unique only within
+    the process which created them and their time is stored as a timestamp.
+    """
     def __init__(self, payload, source=None, target=None):
-        Message.__init__(self, source, target)
+        self.id = self.get_instance_id()
+        self.time = time.time()
+        self.source = source
+        self.target = target
 
         self.payload = payload
 
+    def get_time_str(self):
+        """ Return the creation time of the frame in dashed ISO-like format.
+        """
+        return '{dt}-{tz}'.format(dt=datetime.fromtimestamp(self.time).strftime('%Y-%m-%d-%H-%M-%S.%f'),
+            tz=time.tzname[time.localtime(self.time).tm_isdst])
+
     def __str__(self):
         return unicode(self).encode('ascii', 'replace')
 
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Implements routing of the messages of several concurrent calls through shared components.
+
+The stateless components (SLU, NLG, TTS) are not bound to a call. A shared worker runs an ordinary component whose
+connections are SessionConnection objects: every message sent to the worker is wrapped in a SessionMessage carrying
+the ID of the call, and all messages which the component sends while processing it are wrapped with the same ID, so
+that the hub can route them back to the call.
+"""
+
+import collections
+import multiprocessing
+
+from alex.components.hub.messages import Frame
+from alex.utils.config import Config
+
+# The slot identifies the call slot (the components and the session logger of the call), the serial number identifies
+# the call in the slot and the generation is increased whenever the output of the call is flushed, so that the hub can
+# drop the messages which were produced for a flushed or finished call.
+SessionID = collections.namedtuple('SessionID', ['slot', 'serial', 'generation'])
+
+
+class SessionMessage(object):
+    """A message sent to or received from a shared component."""
+
+    def __init__(self, session_id, message):
+        self.session_id = session_id
+        self.message = message
+
+    def __str__(self):
+        return 'Session: %s Message: %s' % (self.session_id, self.message)
+
+
+class SessionContext(object):
+    """The call whose message is currently processed by a shared component.
+
+    When the call changes, the session logger in the configuration of the component is replaced by the session logger
+    of the call slot.
+    """
+
+    def __init__(self, cfg, session_loggers):
+        self.cfg = cfg
+        self.session_loggers = session_loggers
+        self.session_id = None
+
+    def set_session(self, session_id):
+        self.session_id = session_id
+        if session_id is not None:
+            self.cfg['Logging']['session_logger'] = self.session_loggers[session_id.slot]
+
+
+class SessionConnection(object):
+    """
+    A wrapper of a multiprocessing connection with the same interface used by a shared component.
+
+    Received session messages are unwrapped and they set the current call of the context. Sent messages are wrapped
+    with the current call of the context. Other messages (e.g. the stop() command) are passed unchanged.
+    """
+
+    def __init__(self, connection, context):
+        self.connection = connection
+        self.context = context
+
+    def fileno(self):
+        return self.connection.fileno()
+
+    def close(self):
+        self.connection.close()
+
+    def poll(self, timeout=0.0):
+        return self.connection.poll(timeout)
+
+    def send(self, obj):
+        self.connection.send(SessionMessage(self.context.session_id, obj))
+
+    def send_frames(self, frames):
+        """Sends the payloads of the frames in one message, see alex.components.hub.audiochannel.send_frames."""
+        payloads = [frame.payload if isinstance(frame, Frame) else frame for frame in frames]
+        if payloads:
+            self.connection.send(SessionMessage(self.context.session_id, payloads))
+
+    def recv(self):
+        obj = self.connection.recv()
+        if isinstance(obj, SessionMessage):
+            self.context.set_session(obj.session_id)
+            return obj.message
+        return obj
+
+
+def session_config(cfg, session_logger):
+    """Returns a copy of the configuration which differs only in the session logger.
+
+    The sections other than 'Logging' are shared with the original configuration.
+    """
+    config = dict(cfg.config)
+    config['Logging'] = dict(cfg['Logging'])
+    config['Logging']['session_logger'] = session_logger
+    return Config(config=config)
+
+
+class WorkerPool(object):
+    """The hub ends of the connections to the shared workers of one component.
+
+    A request is sent to the least loaded worker; however, all requests of a call are sent to the same worker while it
+    has not finished the previous ones so that the outputs of the call are not reordered.
+    """
+
+    def __init__(self, name, done_command):
+        """
+        :param name: the name of the component, used as the target of the messages
+        :param done_command: the name of the command by which a worker reports that it has finished a request
+        """
+        self.name = name
+        self.done_command = done_command
+
+        self.workers = []
+        self.commands = []
+        self.inputs = []
+        self.outputs = []
+        self.load = []
+        self.pending = {}
+
+    def __len__(self):
+        return len(self.workers)
+
+    def create(self, component_class, cfg, session_loggers, close_event):
+        """Creates a worker running the component and returns it.
+
+        The constructor of the component is called as that of the ordinary component, with the connections for
+        commands, input and output.
+        """
+        commands, child_commands = multiprocessing.Pipe()
+        input, child_input = multiprocessing.Pipe()
+        output, child_output = multiprocessing.Pipe()
+
+        context = SessionContext(session_config(cfg, session_loggers[0]), session_loggers)
+        worker = component_class(context.cfg,
+                                 SessionConnection(child_commands, context),
+                                 SessionConnection(child_input, context),
+                                 SessionConnection(child_output, context),
+                                 close_event)
+
+        self.workers.append(worker)
+        self.commands.append(commands)
+        self.inputs.append(input)
+        self.outputs.append(output)
+        self.load.append(0)
+
+        return worker
+
+    def select(self, session_id):
+        if session_id in self.pending:
+            return self.pending[session_id][0]
+        return min(range(len(self.workers)), key=lambda i: self.load[i])
+
+    def send(self, session_id, message, command=False):
+        """Sends a request of the call to a worker.
+
+        :param command: whether the message is sent through the command connection instead of the input connection
+        """
+        i = self.select(session_id)
+        self.load[i] += 1
+        self.pending[session_id] = (i, self.pending.get(session_id, (i, 0))[1] + 1)
+
+        connection = self.commands[i] if command else self.inputs[i]
+        connection.send(SessionMessage(session_id, message))
+
+    def done(self, session_id):
+        """Records that a worker has finished a request of the call."""
+        if session_id not in self.pending:
+            return
+
+        i, n = self.pending[session_id]
+        self.load[i] -= 1
+        if n > 1:
+            self.pending[session_id] = (i, n - 1)
+        else:
+            del self.pending[session_id]
+
+    def cancel(self, session_id, message):
+        """Sends the message (e.g. a flush command) to the worker processing the requests of the call and forgets the
+        requests, so that they are not counted in the load of the worker any more.
+
+        Nothing is sent if the call has no unfinished requests.
+        """
+        if session_id not in self.pending:
+            return
+
+        i, n = self.pending.pop(session_id)
+        self.load[i] -= n
+        self.commands[i].send(SessionMessage(session_id, message))
+
+    def broadcast(self, message):
+        """Sends the message (e.g. the stop() command) to all workers."""
+        for connection in self.commands:
+            connection.send(message)
@@ -7,12 +7,14 @@ import time
 from alex.components.nlg.common import nlg_factory, get_nlg_type
 
 from alex.components.hub.messages import Command, DMDA, TTSText
+from alex.components.hub.trace import get_tracer
 from alex.components.dm.exceptions import DMException
 
+from alex.utils.mproc import Reactor
 from alex.utils.procname import set_proc_name
 
 
-class NLG(multiprocessing.Process):
+class NLG(Reactor):
     """The NLG component receives a dialogue act generated by the dialogue manager and then it
     converts the act into the text.
 
@@ -21,9 +23,10 @@ class NLG(multiprocessing.Process):
     """
 
     def __init__(self, cfg, commands, dialogue_act_in, text_out, close_event):
-        multiprocessing.Process.__init__(self)
+        Reactor.__init__(self)
 
         self.cfg = cfg
+        self.tracer = get_tracer(cfg)
         self.commands = commands
         self.dialogue_act_in = dialogue_act_in
         self.text_out = text_out
@@ -32,7 +35,12 @@ class NLG(multiprocessing.Process):
         nlg_type = get_nlg_type(cfg)
         self.nlg = nlg_factory(nlg_type, cfg)
 
-    def process_da(self, da):
+    def get_input_connections(self):
+        return [self.commands, self.dialogue_act_in]
+
+    def process_da(self, da, trace_id=None):
+        trace_start = time.time()
+
         if da != "silence()":
             text = self.nlg.generate(da)
 
@@ -48,7 +56,8 @@ class NLG(multiprocessing.Process):
             self.cfg['Logging']['session_logger'].text("system", text)
 
             self.commands.send(Command('nlg_text_generated()', 'NLG', 'HUB'))
-            self.text_out.send(TTSText(text))
+            self.text_out.send(TTSText(text, trace_id=trace_id))
+            self.tracer.span(trace_id, 'nlg', trace_start)
         else:
             # the input dialogue is silence. Therefore, do not generate eny output.
             if self.cfg['NLG']['debug']:
@@ -96,7 +105,7 @@ class NLG(multiprocessing.Process):
 
                     return False
             elif isinstance(command, DMDA):
-                self.process_da(command.da)
+                self.process_da(command.da, command.trace_id)
 
         return False
 
@@ -105,7 +114,7 @@ class NLG(multiprocessing.Process):
             data_da = self.dialogue_act_in.recv()
 
             if isinstance(data_da, DMDA):
-                self.process_da(data_da.da)
+                self.process_da(data_da.da, data_da.trace_id)
             elif isinstance(data_da, Command):
                 self.cfg['Logging']['system_logger'].info(data_da)
             else:
@@ -122,7 +131,7 @@ class NLG(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                self.wait_for_input()
 
                 s = (time.time(), time.clock())
 
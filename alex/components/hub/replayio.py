@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import os
+import time
+import xml.dom.minidom
+import Queue
+
+from collections import deque
+
+from alex.components.hub.audiochannel import send_frames
+from alex.components.hub.messages import Command, Frame
+from alex.components.hub.exceptions import VoipIOException
+from alex.utils.audio import load_wav
+from alex.utils.mproc import Reactor
+from alex.utils.procname import set_proc_name
+import alex.utils.various as various
+
+
+def load_recorded_call(cfg, path):
+    """
+    Returns the audio of the user side of a recorded call.
+
+    The path is either a wave file or a call log, i.e. a session.xml file or the directory with it. The audio of a call
+    log is the complete recording of the user (the dialogue_rec element of the user) if it exists. Otherwise, it is
+    put together from the recordings of the user turns (the rec elements) placed at the times they were recorded and
+    followed by one second of silence.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, 'session.xml')
+
+    if not path.endswith('.xml'):
+        return load_wav(cfg, path)
+
+    log_dir = os.path.dirname(path)
+    doc = xml.dom.minidom.parse(path)
+
+    for rec in doc.getElementsByTagName("dialogue_rec"):
+        fname = os.path.join(log_dir, rec.getAttribute("fname"))
+        if rec.getAttribute("speaker") == "user" and os.path.exists(fname):
+            return load_wav(cfg, fname)
+
+    bytes_per_second = 2 * cfg['Audio']['sample_rate']
+    wav = bytearray()
+    for turn in doc.getElementsByTagName("turn"):
+        if turn.getAttribute("speaker") != "user":
+            continue
+
+        for rec in turn.getElementsByTagName("rec"):
+            fname = os.path.join(log_dir, rec.getAttribute("fname"))
+            if not os.path.exists(fname):
+                continue
+
+            start = 2 * int(float(rec.getAttribute("starttime")) * bytes_per_second / 2)
+            rec_wav = load_wav(cfg, fname)
+            if len(wav) < start:
+                wav.extend(b'\x00' * (start - len(wav)))
+            wav[start:start + len(rec_wav)] = rec_wav
+
+    wav.extend(b'\x00' * bytes_per_second)
+    return bytes(wav)
+
+
+class ReplayIO(Reactor):
+    """
+    ReplayIO replaces VoipIO without any SIP stack. It replays recorded calls, e.g. to generate load for a hub.
+
+    The recorded calls are wave files (e.g. the all-*.recorded.wav files from the call logs) or call logs (see
+    load_recorded_call) taken from a queue shared by all ReplayIO processes. For each call, ReplayIO sends the same commands as VoipIO for an incoming call and then
+    it sends the recorded audio in real time (or faster if the speed is higher than 1). The played audio is discarded;
+    however, the play_utterance_start() and play_utterance_end() commands are sent when the audio would be played.
+    The call is disconnected when all recorded audio was sent or when the hub hangs up. The next call starts after
+    the hub has flushed the output of the previous call.
+    """
+
+    def __init__(self, cfg, commands, audio_record, audio_play, close_event, calls, speed=1.0, replayed_call=None):
+        """
+        :param calls: a multiprocessing.Queue of the file names of the recorded calls or of the call logs
+        :param speed: how many times faster than real time the audio is recorded and played
+        :param replayed_call: a multiprocessing.Array of chars set to the file name of the replayed call, e.g. for the
+            stub ASR (see alex.components.asr.stub), None to disable it
+        """
+        Reactor.__init__(self)
+
+        self.cfg = cfg
+        self.commands = commands
+        self.audio_record = audio_record
+        self.audio_play = audio_play
+        self.close_event = close_event
+        self.calls = calls
+        self.speed = speed
+        self.replayed_call = replayed_call
+
+        self.frame_time = float(self.cfg['Audio']['samples_per_frame']) / self.cfg['Audio']['sample_rate'] / speed
+
+        self.remote_uri = None
+        self.call_start = 0
+        self.frames_rec = []
+        self.n_frames_sent = 0
+        self.audio_recording = False
+        # whether the hub has finished the previous call
+        self.ready = True
+
+        self.local_audio_play = deque()
+        self.audio_playing = False
+        self.play_time = 0
+        self.message_queue = deque()
+
+    def get_input_connections(self):
+        if self.remote_uri is None and self.ready:
+            # wait for the next call
+            return [self.commands, self.audio_play, self.calls._reader]
+        return [self.commands, self.audio_play]
+
+    def get_wait_timeout(self):
+        if self.remote_uri is not None or self.local_audio_play or self.message_queue:
+            return self.frame_time
+        return None
+
+    def start_call(self):
+        try:
+            file_name = self.calls.get_nowait()
+        except Queue.Empty:
+            return
+
+        wav = load_recorded_call(self.cfg, file_name)
+        self.frames_rec = various.split_to_bins(wav, 2 * self.cfg['Audio']['samples_per_frame'])
+        if self.frames_rec and len(self.frames_rec[-1]) < 2 * self.cfg['Audio']['samples_per_frame']:
+            self.frames_rec.pop()
+        self.n_frames_sent = 0
+
+        if self.replayed_call is not None:
+            self.replayed_call.value = file_name
+
+        self.remote_uri = os.path.basename(os.path.dirname(file_name) if file_name.endswith('.xml') else file_name)
+        self.call_start = time.time()
+        self.audio_recording = True
+
+        self.commands.send(Command('incoming_call(remote_uri="%s")' % self.remote_uri, 'VoipIO', 'HUB'))
+        self.commands.send(Command('call_confirmed(remote_uri="%s")' % self.remote_uri, 'VoipIO', 'HUB'))
+
+    def end_call(self):
+        if self.remote_uri is None:
+            return
+
+        self.commands.send(Command('call_disconnected(remote_uri="%s", code="200")' % self.remote_uri,
+                                   'VoipIO', 'HUB'))
+        self.remote_uri = None
+        self.audio_recording = False
+        self.ready = False
+
+    def flush_out(self):
+        while self.audio_play.poll():
+            self.audio_play.recv()
+
+        self.local_audio_play.clear()
+        self.audio_playing = False
+        self.play_time = 0
+
+    def process_pending_commands(self):
+        """Process all pending commands.
+
+        Available commands:
+          stop() - stop processing and exit the process
+          flush() - flush input and output buffers
+          flush_out() - flush output buffers
+          hangup() - disconnect the current call
+
+        The other VoipIO commands are ignored.
+
+        Return True if the process should terminate.
+        """
+
+        while self.commands.poll():
+            command = self.commands.recv()
+
+            if isinstance(command, Command):
+                if self.cfg['VoipIO']['debug']:
+                    self.cfg['Logging']['system_logger'].debug(command)
+
+                if command.parsed['__name__'] == 'stop':
+                    return True
+
+                if command.parsed['__name__'] == 'flush':
+                    self.flush_out()
+                    self.audio_recording = False
+                    self.commands.send(Command("flushed()", 'VoipIO', 'HUB'))
+
+                elif command.parsed['__name__'] == 'flush_out':
+                    self.flush_out()
+                    self.ready = self.remote_uri is None
+                    self.commands.send(Command("flushed_out()", 'VoipIO', 'HUB'))
+
+                elif command.parsed['__name__'] == 'hangup':
+                    self.end_call()
+
+                elif command.parsed['__name__'] not in ['make_call', 'transfer', 'black_list']:
+                    raise VoipIOException('Unsupported command: %s' % command)
+
+        return False
+
+    def play_audio(self):
+        """Plays the received audio in real time, i.e. it only sends the commands when they would be played."""
+        current_time = time.time()
+
+        while self.audio_play.poll():
+            self.local_audio_play.append(self.audio_play.recv())
+
+        # schedule the audio up to one frame ahead
+        while self.local_audio_play and self.play_time < current_time + self.frame_time:
+            data_play = self.local_audio_play.popleft()
+            self.play_time = max(self.play_time, current_time)
+
+            if self.audio_playing and isinstance(data_play, Frame):
+                self.play_time += self.frame_time * len(data_play) / (2 * self.cfg['Audio']['samples_per_frame'])
+
+            elif isinstance(data_play, Command):
+                if data_play.parsed['__name__'] == 'utterance_start':
+                    self.audio_playing = True
+                    self.message_queue.append(
+                        (Command('play_utterance_start(user_id="{uid}",fname="{fname}")'
+                                 .format(uid=data_play.parsed['user_id'], fname=data_play.parsed['fname']),
+                                 'VoipIO', 'HUB'),
+                         self.play_time))
+
+                if self.audio_playing and data_play.parsed['__name__'] == 'utterance_end':
+                    self.audio_playing = False
+                    self.message_queue.append(
+                        (Command('play_utterance_end(user_id="{uid}",fname="{fname}")'
+                                 .format(uid=data_play.parsed['user_id'], fname=data_play.parsed['fname']),
+                                 'VoipIO', 'HUB'),
+                         self.play_time))
+
+        while self.message_queue and self.message_queue[0][1] <= current_time:
+            self.commands.send(self.message_queue.popleft()[0])
+
+    def record_audio(self):
+        """Sends the recorded audio which should have been recorded until now."""
+        if self.remote_uri is None:
+            return
+
+        n_frames = min(len(self.frames_rec), int((time.time() - self.call_start) / self.frame_time))
+        if self.audio_recording and n_frames > self.n_frames_sent:
+            send_frames(self.audio_record, self.frames_rec[self.n_frames_sent:n_frames])
+        self.n_frames_sent = n_frames
+
+        if self.n_frames_sent == len(self.frames_rec):
+            self.end_call()
+
+    def run(self):
+        try:
+            set_proc_name("Alex_ReplayIO")
+            self.cfg['Logging']['session_logger'].cancel_join_thread()
+
+            while 1:
+                # Check the close event.
+                if self.close_event.is_set():
+                    print 'Received close event in: %s' % multiprocessing.current_process().name
+                    return
+
+                self.wait_for_input()
+
+                if self.process_pending_commands():
+                    return
+
+                if self.remote_uri is None and self.ready:
+                    self.start_call()
+
+                self.play_audio()
+                self.record_audio()
+
+        except KeyboardInterrupt:
+            print 'KeyboardInterrupt exception in: %s' % multiprocessing.current_process().name
+            self.close_event.set()
+            return
+        except:
+            self.cfg['Logging']['system_logger'].exception('Uncaught exception in ReplayIO process.')
+            self.close_event.set()
+            raise
+
+        print 'Exiting: %s. Setting close event' % multiprocessing.current_process().name
+        self.close_event.set()
@@ -7,12 +7,14 @@ import time
 
 from alex.components.slu.da import DialogueActNBList, DialogueActConfusionNetwork
 from alex.components.hub.messages import Command, ASRHyp, SLUHyp
+from alex.components.hub.trace import get_tracer
 from alex.components.slu.common import slu_factory
 from alex.components.slu.exceptions import SLUException
+from alex.utils.mproc import Reactor
 from alex.utils.procname import set_proc_name
 
 
-class SLU(multiprocessing.Process):
+class SLU(Reactor):
     """
     The SLU component receives ASR hypotheses and converts them into
     hypotheses about the meaning of the input in the form of dialogue
@@ -39,10 +41,11 @@ class SLU(multiprocessing.Process):
 
         """
 
-        multiprocessing.Process.__init__(self)
+        Reactor.__init__(self)
 
         # Save the configuration.
         self.cfg = cfg
+        self.tracer = get_tracer(cfg)
 
         # Save the pipe ends.
         self.commands = commands
@@ -53,6 +56,9 @@ class SLU(multiprocessing.Process):
         # Load the SLU.
         self.slu = slu_factory(cfg)
 
+    def get_input_connections(self):
+        return [self.commands, self.asr_hypotheses_in]
+
     def process_pending_commands(self):
         """
         Process all pending commands.
@@ -93,6 +99,7 @@ class SLU(multiprocessing.Process):
             data_asr = self.asr_hypotheses_in.recv()
 
             if isinstance(data_asr, ASRHyp):
+                trace_start = time.time()
                 slu_hyp = self.slu.parse(data_asr.hyp)
                 fname = data_asr.fname
 
@@ -122,7 +129,8 @@ class SLU(multiprocessing.Process):
                 self.cfg['Logging']['session_logger'].slu("user", fname, nblist, confnet=confnet)
 
                 self.commands.send(Command('slu_parsed(fname="%s")' % fname, 'SLU', 'HUB'))
-                self.slu_hypotheses_out.send(SLUHyp(slu_hyp, asr_hyp=data_asr.hyp))
+                self.slu_hypotheses_out.send(SLUHyp(slu_hyp, asr_hyp=data_asr.hyp, trace_id=data_asr.trace_id))
+                self.tracer.span(data_asr.trace_id, 'slu', trace_start)
 
             elif isinstance(data_asr, Command):
                 self.cfg['Logging']['system_logger'].info(data_asr)
@@ -140,7 +148,7 @@ class SLU(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                self.wait_for_input()
 
                 s = (time.time(), time.clock())
 
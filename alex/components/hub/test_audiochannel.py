@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.components.hub.audiochannel import AudioPipe, send_frames
+from alex.components.hub.messages import Command, Frame
+
+
+class TestAudioChannel(unittest.TestCase):
+    def test_frames_and_commands(self):
+        out, inp = AudioPipe()
+
+        out.send(Command('utterance_start()', 'TTS', 'AudioOut'))
+        out.send(Frame(b'\x01\x02' * 160))
+        send_frames(out, [Frame(b'\x03\x04' * 160), b'\x05\x06' * 100, b''])
+        out.send(Frame(b'\x07\x08', 'VAD', 'ASR'))
+        out.send(Command('utterance_end()', 'TTS', 'AudioOut'))
+
+        received = []
+        while inp.poll():
+            received.append(inp.recv())
+
+        self.assertEqual([type(m) for m in received], [Command, Frame, Frame, Frame, Frame, Frame, Command])
+        self.assertEqual([m.payload for m in received[1:-1]],
+                         [b'\x01\x02' * 160, b'\x03\x04' * 160, b'\x05\x06' * 100, b'', b'\x07\x08'])
+        self.assertEqual(received[0].command, 'utterance_start()')
+        self.assertEqual(received[-2].source, 'VAD')
+
+        # the frames sent as raw bytes get increasing ids in the receiving process
+        ids = [m.id for m in received[1:-2]]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_plain_connection(self):
+        out, inp = multiprocessing.Pipe()
+
+        send_frames(out, [b'\x01\x02', Frame(b'\x03\x04')])
+
+        self.assertEqual(inp.recv().payload, b'\x01\x02')
+        self.assertEqual(inp.recv().payload, b'\x03\x04')
+        self.assertFalse(inp.poll())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.components.hub.calldb import CallDB, SQLiteCallDB, call_db_factory
+
+
+class TestSQLiteCallDB(unittest.TestCase):
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.cfg = {'VoipHub': {'short_calls_time_duration': 7}}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def test_factory(self):
+        self.assertTrue(isinstance(call_db_factory(self.cfg, os.path.join(self.dir_name, 'db.pckl')), CallDB))
+        self.assertTrue(isinstance(call_db_factory(self.cfg, os.path.join(self.dir_name, 'db.sqlite')),
+                                   SQLiteCallDB))
+
+    def test_track_calls(self):
+        db = SQLiteCallDB(self.cfg, os.path.join(self.dir_name, 'db.sqlite'))
+        db.track_confirmed_call('a')
+        db.track_disconnected_call('a')
+        db.track_confirmed_call('a')
+        # disconnecting a call which was not confirmed is ignored
+        db.track_disconnected_call('b')
+
+        self.assertEqual(sorted(db.get_uris()), ['a'])
+        num_all_calls, total_time, last_period_num_calls, last_period_total_time, last_period_num_short_calls = \
+            db.get_uri_stats('a')
+        self.assertEqual((num_all_calls, last_period_num_calls, last_period_num_short_calls), (1, 1, 1))
+        self.assertTrue(total_time > 0)
+        self.assertEqual(total_time, last_period_total_time)
+        self.assertEqual(db.get_uri_stats('b'), (0, 0, 0, 0, 0))
+        db.close()
+
+    def test_import_pickle(self):
+        now = time.time()
+        calls = {'a': [[now - 100, now - 90, 10], [now - 50, now - 45, 5], [now - 10, 0, 0]],
+                 'b': [[now - 1000000, now - 999990, 10]]}
+
+        pickled_db = CallDB(self.cfg, os.path.join(self.dir_name, 'db.pckl'))
+        pickled_db.open_database()
+        pickled_db.close_database(dict(calls_from_start_end_length=calls))
+
+        db = SQLiteCallDB(self.cfg, os.path.join(self.dir_name, 'db.sqlite'))
+        db.import_calls(calls)
+
+        for uri in ['a', 'b']:
+            self.assertEqual(db.get_uri_stats(uri), pickled_db.get_uri_stats(uri))
+        db.close()
+
+    def test_factory_migrates_pickle(self):
+        now = time.time()
+        calls = {'a': [[now - 100, now - 90, 10]]}
+
+        pickled_db = CallDB(self.cfg, os.path.join(self.dir_name, 'db.pckl'))
+        pickled_db.open_database()
+        pickled_db.close_database(dict(calls_from_start_end_length=calls))
+
+        db = call_db_factory(self.cfg, os.path.join(self.dir_name, 'db.sqlite'))
+        self.assertEqual(db.get_uri_stats('a'), pickled_db.get_uri_stats('a'))
+        db.track_confirmed_call('b')
+        db.close()
+
+        # an existing SQLite database is not migrated again
+        db = call_db_factory(self.cfg, os.path.join(self.dir_name, 'db.sqlite'))
+        self.assertEqual(sorted(db.get_uris()), ['a', 'b'])
+        self.assertEqual(db.get_uri_stats('a'), pickled_db.get_uri_stats('a'))
+        db.close()
+        self.assertEqual(sorted(os.listdir(self.dir_name)), ['db.pckl', 'db.sqlite'])
+
+
+if __name__ == '__main__':
+    unittest.main()
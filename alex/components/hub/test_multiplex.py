@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.components.hub.audiochannel import send_frames
+from alex.components.hub.messages import Command, Frame
+from alex.components.hub.multiplex import SessionID, SessionMessage, SessionContext, SessionConnection, WorkerPool
+from alex.utils.config import Config
+
+
+class Component(object):
+    def __init__(self, cfg, commands, data_in, data_out, close_event):
+        self.cfg = cfg
+        self.commands = commands
+        self.data_in = data_in
+        self.data_out = data_out
+
+
+class TestSessionConnection(unittest.TestCase):
+    def test_session_routing(self):
+        cfg = Config(config={'Logging': {'session_logger': None}})
+        context = SessionContext(cfg, ['logger0', 'logger1'])
+
+        hub_in, worker_in = multiprocessing.Pipe()
+        hub_out, worker_out = multiprocessing.Pipe()
+        data_in = SessionConnection(worker_in, context)
+        data_out = SessionConnection(worker_out, context)
+
+        session_id = SessionID(1, 5, 0)
+        hub_in.send(SessionMessage(session_id, 'text'))
+        hub_in.send(Command('stop()', 'HUB', 'TTS'))
+
+        self.assertEqual(data_in.recv(), 'text')
+        self.assertEqual(context.session_id, session_id)
+        self.assertEqual(cfg['Logging']['session_logger'], 'logger1')
+
+        # messages without a session are passed unchanged
+        self.assertEqual(data_in.recv().command, 'stop()')
+        self.assertEqual(context.session_id, session_id)
+
+        data_out.send('audio')
+        send_frames(data_out, [Frame(b'\x01\x02'), b'\x03\x04'])
+
+        message = hub_out.recv()
+        self.assertEqual((message.session_id, message.message), (session_id, 'audio'))
+        message = hub_out.recv()
+        self.assertEqual((message.session_id, message.message), (session_id, [b'\x01\x02', b'\x03\x04']))
+        self.assertFalse(hub_out.poll())
+
+
+class TestWorkerPool(unittest.TestCase):
+    def test_worker_selection(self):
+        cfg = Config(config={'Logging': {'session_logger': None}})
+        pool = WorkerPool('TTS', 'tts_end')
+        for i in range(2):
+            worker = pool.create(Component, cfg, ['logger0', 'logger1'], None)
+        self.assertEqual(len(pool), 2)
+        # the configuration of the component is a copy
+        self.assertEqual(worker.cfg['Logging']['session_logger'], 'logger0')
+        self.assertFalse(worker.cfg is cfg)
+
+        first, second = SessionID(0, 1, 0), SessionID(1, 1, 0)
+        pool.send(first, 'a')
+        pool.send(second, 'b')
+        # the requests of a call go to the same worker until they are finished
+        pool.send(first, 'c')
+        self.assertEqual(pool.load, [2, 1])
+
+        self.assertEqual([pool.workers[0].data_in.recv() for i in range(2)], ['a', 'c'])
+        self.assertEqual(pool.workers[1].data_in.recv(), 'b')
+
+        pool.done(first)
+        pool.done(first)
+        pool.done(second)
+        self.assertEqual(pool.load, [0, 0])
+        self.assertEqual(pool.pending, {})
+
+        # a finished call goes to the least loaded worker
+        pool.send(second, 'd')
+        pool.send(first, 'e')
+        self.assertEqual(pool.load, [1, 1])
+
+    def test_cancel(self):
+        cfg = Config(config={'Logging': {'session_logger': None}})
+        pool = WorkerPool('TTS', 'tts_end')
+        for i in range(2):
+            pool.create(Component, cfg, ['logger0', 'logger1'], None)
+
+        first, second = SessionID(0, 1, 0), SessionID(1, 1, 0)
+        pool.send(first, 'a')
+        pool.send(first, 'b')
+        pool.send(second, 'c')
+
+        pool.cancel(first, 'flush_session()')
+        self.assertEqual(pool.load, [0, 1])
+        self.assertEqual(list(pool.pending), [second])
+        # the command is received by the worker with the requests of the call
+        self.assertEqual(pool.workers[0].commands.recv(), 'flush_session()')
+        self.assertEqual(pool.workers[0].commands.context.session_id, first)
+
+        # the late done commands of the cancelled requests are ignored, a call without requests is not flushed
+        pool.done(first)
+        pool.cancel(first, 'flush_session()')
+        self.assertEqual(pool.load, [0, 1])
+        self.assertFalse(pool.workers[0].commands.poll())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import time
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.components.hub.trace import STAGES, LatencyHistogram, Tracer, get_tracer
+
+
+def collect(tracer, n_turns):
+    """Waits until the spans put to the queue are read and the given number of turns is complete."""
+    deadline = time.time() + 5.0
+    while tracer.latencies['total'].n < n_turns and time.time() < deadline:
+        tracer.collect()
+        time.sleep(0.01)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_buckets(self):
+        h = LatencyHistogram()
+        for latency in [0.005, 0.015, 0.015, 0.3, 10.0]:
+            h.add(latency)
+
+        self.assertEqual(h.n, 5)
+        self.assertEqual(h.counts[0], 1)
+        self.assertEqual(h.counts[1], 2)
+        self.assertEqual(h.counts[5], 1)
+        self.assertEqual(h.counts[-1], 1)
+        self.assertAlmostEqual(h.mean(), 10.335 / 5)
+        self.assertEqual(h.percentile(0.5), 0.015)
+        self.assertEqual(h.percentile(0.95), 10.0)
+        self.assertEqual(h.percentile(0.0), 0.005)
+        self.assertEqual(h.percentile(1.0), 10.0)
+
+    def test_sample(self):
+        random.seed(0)
+        h = LatencyHistogram()
+        h.sample_size = 100
+        latencies = [0.001 * i for i in range(1000)]
+        random.shuffle(latencies)
+        for latency in latencies:
+            h.add(latency)
+
+        # the sample is bounded, the percentiles are estimated from it
+        self.assertEqual(h.n, 1000)
+        self.assertEqual(len(h.sample), 100)
+        self.assertTrue(set(h.sample) <= set(latencies))
+        self.assertAlmostEqual(h.percentile(0.5), 0.5, delta=0.15)
+        self.assertAlmostEqual(h.percentile(0.95), 0.95, delta=0.1)
+
+    def test_empty(self):
+        h = LatencyHistogram()
+        self.assertEqual(h.mean(), 0.0)
+        self.assertEqual(h.percentile(0.95), 0.0)
+
+
+class TestTracer(unittest.TestCase):
+    def test_turn(self):
+        tracer = Tracer()
+        trace_id = tracer.new_trace_id()
+        self.assertNotEqual(trace_id, tracer.new_trace_id())
+
+        t = 100.0
+        tracer.span(trace_id, 'vad', t - 2.0, t)
+        for i, stage in enumerate(STAGES[1:]):
+            tracer.span(trace_id, stage, t + 0.1 * i + 0.05, t + 0.1 * (i + 1))
+        collect(tracer, 1)
+
+        self.assertEqual(tracer.latencies['total'].n, 1)
+        self.assertAlmostEqual(tracer.latencies['total'].total, 0.5)
+        for stage in STAGES[1:]:
+            self.assertAlmostEqual(tracer.latencies[stage].total, 0.1)
+            self.assertAlmostEqual(tracer.processing_times[stage].total, 0.05)
+        self.assertEqual(len(tracer.open_traces), 0)
+
+        report = tracer.report()
+        self.assertIn('(1 turns)', report)
+        self.assertIn('total', report)
+
+    def test_open_traces(self):
+        tracer = Tracer()
+        tracer.max_open_traces = 2
+
+        trace_ids = [tracer.new_trace_id() for i in range(3)]
+        for trace_id in trace_ids:
+            tracer.span(trace_id, 'vad', 0.0, 1.0)
+        tracer.span(trace_ids[-1], 'tts', 1.0, 2.0)
+
+        deadline = time.time() + 5.0
+        while tracer.latencies['tts'].n < 1 and time.time() < deadline:
+            tracer.collect()
+            time.sleep(0.01)
+
+        self.assertEqual(tracer.latencies['total'].n, 1)
+        # the oldest turn was dropped, the last one is complete
+        self.assertEqual(list(tracer.open_traces.keys()), [trace_ids[1]])
+
+    def test_disabled(self):
+        tracer = get_tracer({'Logging': {}})
+
+        self.assertFalse(tracer.enabled)
+        self.assertIsNone(tracer.new_trace_id())
+        tracer.span(None, 'asr', 0.0)
+        tracer.collect()
+        self.assertEqual(tracer.latencies['total'].n, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
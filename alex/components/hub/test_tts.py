@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import collections
+import multiprocessing
+import threading
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.components.hub.messages import TTSText
+from alex.components.hub.multiplex import SessionID, SessionMessage, SessionContext, SessionConnection
+from alex.components.hub.tts import TTS
+from alex.components.tts import TTSInterface
+from alex.utils.config import Config
+from alex.utils.mproc import wait
+
+
+class EventTTS(TTSInterface):
+    """Synthesizes a text into its characters as soon as the test releases the text."""
+
+    def __init__(self, cfg):
+        super(EventTTS, self).__init__(cfg)
+        self.lock = threading.Lock()
+        self.events = collections.defaultdict(threading.Event)
+        self.synthesized = []
+
+    def get_event(self, text):
+        with self.lock:
+            return self.events[text]
+
+    def release(self, text):
+        self.get_event(text).set()
+
+    def synthesize(self, text):
+        if not self.get_event(text).wait(5.0):
+            raise AssertionError('The text "%s" was not released.' % text)
+
+        with self.lock:
+            self.synthesized.append(text)
+        # 16 bit samples without any silence
+        return b''.join(c * 2 for c in text.encode('ascii'))
+
+
+class TestTTS(unittest.TestCase):
+    def setUp(self):
+        cfg = Config(config={
+            'Audio': {'sample_rate': 16000, 'samples_per_frame': 256},
+            'Hub': {'event_driven': True},
+            'Logging': {'session_logger': None, 'system_logger': None},
+            # the third segment waits for a free thread
+            'TTS': {'type': EventTTS, 'debug': False, 'synthesis_threads': 2, 'in_between_segments_silence': 0.0},
+        })
+        self.context = SessionContext(cfg, [None, None])
+
+        self.commands, commands = multiprocessing.Pipe()
+        self.text_in, text_in = multiprocessing.Pipe()
+        audio_out, self.audio_out = multiprocessing.Pipe()
+
+        self.tts = TTS(cfg, SessionConnection(commands, self.context), SessionConnection(text_in, self.context),
+                       SessionConnection(audio_out, self.context), threading.Event())
+        self.tts.start_synthesis_threads()
+
+    def tearDown(self):
+        # let the threads which are still waiting for their texts finish
+        with self.tts.tts.lock:
+            for event in self.tts.tts.events.values():
+                event.set()
+        self.tts.pool.close()
+        self.tts.pool.join()
+
+    def synthesize(self, text, session_id=None):
+        self.context.set_session(session_id)
+        self.tts.synthesize(None, text)
+
+    def release(self, text):
+        """Releases the synthesis of the text and sends the synthesized segments once the TTS is woken up."""
+        self.tts.tts.release(text)
+        self.assertIn(self.tts.segment_ready_read_fd, wait(self.tts.get_input_connections(), 5.0))
+        self.tts.send_synthesized_segments()
+
+    def received(self):
+        """Returns the commands to the hub and the commands and the audio for the audio output sent by the TTS."""
+        commands = []
+        while self.commands.poll():
+            commands.append(self.commands.recv().message.command.split('(')[0])
+
+        audio = []
+        while self.audio_out.poll():
+            message = self.audio_out.recv().message
+            audio.append(message.command.split('(')[0] if hasattr(message, 'command') else b''.join(message))
+
+        return commands, audio
+
+    def test_segments_sent_in_order(self):
+        self.synthesize('Ab, Cd.')
+        self.tts.send_synthesized_segments()
+        self.assertEqual(self.received(), (['tts_start'], ['utterance_start']))
+
+        # the later segment is not sent before the first one, though it is synthesized first
+        self.release('Cd.')
+        self.assertEqual(self.received(), ([], []))
+
+        self.release('Ab,')
+        self.assertEqual(self.received(), (['tts_end'], [b'AAbb,,', b'CCdd..', 'utterance_end']))
+        self.assertFalse(self.tts.prompts)
+
+    def test_prompt_waits_for_previous_prompt(self):
+        self.synthesize('Ab.')
+        self.synthesize('Cd.')
+
+        self.release('Cd.')
+        self.assertEqual(self.received(), (['tts_start'], ['utterance_start']))
+
+        self.release('Ab.')
+        self.assertEqual(self.received(), (['tts_end', 'tts_start', 'tts_end'],
+                                           [b'AAbb..', 'utterance_end', 'utterance_start', b'CCdd..',
+                                            'utterance_end']))
+
+    def test_flush(self):
+        # both threads are synthesizing the first prompt, the second prompt waits for a thread
+        self.synthesize('Ab, Cd.')
+        self.synthesize('Ef.')
+        self.tts.send_synthesized_segments()
+        self.assertEqual(self.received(), (['tts_start'], ['utterance_start']))
+
+        self.tts.flush()
+
+        # the started prompt is ended and the next prompt is not started
+        self.assertEqual(self.received(), (['tts_end'], ['utterance_end']))
+        self.assertFalse(self.tts.prompts)
+
+        # the audio of the segments which were being synthesized is not sent and the pending segment is skipped
+        self.tts.tts.release('Ab,')
+        self.tts.tts.release('Cd.')
+        self.tts.pool.close()
+        self.tts.pool.join()
+        self.tts.send_synthesized_segments()
+        self.assertEqual(self.received(), ([], []))
+        self.assertNotIn('Ef.', self.tts.tts.synthesized)
+
+    def test_flush_session(self):
+        first, second = SessionID(0, 1, 0), SessionID(1, 1, 0)
+        self.synthesize('Ab.', first)
+        self.synthesize('Cd.', second)
+        self.synthesize('Ef.', first)
+        self.tts.send_synthesized_segments()
+        self.assertEqual(self.received(), (['tts_start'], ['utterance_start']))
+
+        # a text of the flushed call which has not been processed yet is discarded
+        self.text_in.send(SessionMessage(first, TTSText('Gh.')))
+        self.context.set_session(first)
+        self.tts.flush_session(first)
+
+        self.assertEqual(self.received(), (['tts_end'], ['utterance_end']))
+        self.assertEqual([prompt.session_id for prompt in self.tts.prompts], [second])
+        self.assertFalse(self.tts.text_in.poll())
+
+        # the prompt of the other call is sent to its call, the pending segment of the flushed call is skipped
+        self.release('Cd.')
+        message = self.audio_out.recv()
+        self.assertEqual((message.session_id, message.message.command.split('(')[0]), (second, 'utterance_start'))
+        self.assertEqual(self.received(), (['tts_start', 'tts_end'], [b'CCdd..', 'utterance_end']))
+
+        self.tts.tts.release('Ab.')
+        self.tts.pool.close()
+        self.tts.pool.join()
+        self.tts.send_synthesized_segments()
+        self.assertEqual(self.received(), ([], []))
+        self.assertNotIn('Ef.', self.tts.tts.synthesized)
+
+    def test_segment_ready_wakes_up(self):
+        self.synthesize('Ab.')
+        self.assertEqual(wait(self.tts.get_input_connections(), 0.05), [])
+
+        self.tts.tts.release('Ab.')
+        self.assertEqual(wait(self.tts.get_input_connections(), 5.0), [self.tts.segment_ready_read_fd])
+
+        # the notification is cleared once the segments are sent
+        self.tts.send_synthesized_segments()
+        self.assertEqual(wait(self.tts.get_input_connections(), 0.05), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
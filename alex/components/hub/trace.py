@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Implements tracing of the latency of the user turns through the hub components.
+
+Every user turn gets a trace ID when VAD detects the start of speech. The ID travels with the messages of the turn
+(the speech_start() and speech_end() commands around the audio frames, ASRHyp, SLUHyp, DMDA, TTSText and the
+utterance_start() command of the system prompt). Every component records a span, i.e. the time when it started
+processing the turn and the time when it sent its output. The spans are sent through a queue to the Tracer in the hub
+process, which builds histograms of the latencies of all stages.
+"""
+
+import collections
+import itertools
+import multiprocessing
+import os
+import random
+import time
+import Queue
+
+# The stages of a turn in the order of processing. The span of VAD is the speech of the user and the span of TTS ends
+# when the first audio frame of the system prompt is sent.
+STAGES = ['vad', 'asr', 'slu', 'dm', 'nlg', 'tts']
+
+
+class LatencyHistogram(object):
+    """
+    Counts of latencies in the buckets given by their upper bounds, the last bucket is unbounded.
+
+    The percentiles are computed from a uniform random sample of the latencies (reservoir sampling), so they are exact
+    until the sample is full and the memory does not grow with the number of turns.
+    """
+
+    # in seconds
+    bounds = [0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0]
+    # the maximal number of the sampled latencies
+    sample_size = 1000
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.sample = []
+
+    def add(self, latency):
+        i = 0
+        while i < len(self.bounds) and latency >= self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+
+        self.n += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+
+        if len(self.sample) < self.sample_size:
+            self.sample.append(latency)
+        else:
+            # every latency stays in the sample with the same probability
+            i = random.randrange(self.n)
+            if i < self.sample_size:
+                self.sample[i] = latency
+
+    def mean(self):
+        return self.total / self.n if self.n else 0.0
+
+    def percentile(self, p):
+        """Returns the p-th percentile of the sampled latencies, 0.0 if there are none."""
+        if not self.sample:
+            return 0.0
+
+        sample = sorted(self.sample)
+        return sample[min(len(sample) - 1, int(p * len(sample)))]
+
+
+class Tracer(object):
+    """
+    Collects the spans of the turns from all hub processes.
+
+    The components record the spans by span(), the hub process reads them by collect() and adds the latencies of every
+    turn to the histograms when the turn reaches the last stage. The latency of a stage is measured from the end of
+    the previous stage, so it includes the time the turn waited in the pipes and in the hub. The processing time is
+    measured from the start of the span of the stage.
+
+    A disabled tracer does not create any trace IDs, so nothing is recorded.
+    """
+
+    # the maximal number of turns which have not reached the last stage yet, e.g. because of barge-in
+    max_open_traces = 1000
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.counter = itertools.count(1)
+
+        if self.enabled:
+            self.queue = multiprocessing.Queue()
+
+        self.open_traces = collections.OrderedDict()
+        self.latencies = dict((stage, LatencyHistogram()) for stage in STAGES[1:] + ['total'])
+        self.processing_times = dict((stage, LatencyHistogram()) for stage in STAGES[1:])
+
+    def __repr__(self):
+        return "Tracer(enabled={enabled})".format(enabled=self.enabled)
+
+    def new_trace_id(self):
+        """Returns a new trace ID unique among all processes, None if the tracer is disabled."""
+        if not self.enabled:
+            return None
+
+        return '%d-%d' % (os.getpid(), next(self.counter))
+
+    def span(self, trace_id, stage, start, end=None):
+        """Records that the stage of the turn was processed from start to end (now by default)."""
+        if trace_id is None or not self.enabled:
+            return
+
+        self.queue.put((trace_id, stage, start, end if end is not None else time.time()))
+
+    def collect(self):
+        """Reads all recorded spans, the turns which have reached the last stage are added to the histograms."""
+        if not self.enabled:
+            return
+
+        while True:
+            try:
+                trace_id, stage, start, end = self.queue.get_nowait()
+            except Queue.Empty:
+                break
+
+            self.open_traces.setdefault(trace_id, {})[stage] = (start, end)
+
+            if stage == STAGES[-1]:
+                self.add_turn(self.open_traces.pop(trace_id))
+
+            while len(self.open_traces) > self.max_open_traces:
+                self.open_traces.popitem(last=False)
+
+    def add_turn(self, spans):
+        last_end = None
+        for stage in STAGES:
+            if stage not in spans:
+                continue
+
+            start, end = spans[stage]
+            if last_end is not None:
+                self.latencies[stage].add(end - last_end)
+                self.processing_times[stage].add(end - start)
+            last_end = end
+
+        if STAGES[0] in spans:
+            self.latencies['total'].add(spans[STAGES[-1]][1] - spans[STAGES[0]][1])
+
+    def report(self):
+        """Returns a table of the latencies of the stages in milliseconds."""
+        m = []
+        m.append('Turn latencies from the end of the user speech (%d turns)' % self.latencies['total'].n)
+        m.append('-' * 120)
+        m.append('%-6s %6s %9s %9s %9s %9s %9s  %s' %
+                 ('stage', 'turns', 'mean', 'median', '95%', 'max', 'process', 'histogram (ms): ' +
+                  ' '.join('<%g' % (1000 * b) for b in LatencyHistogram.bounds) + ' more'))
+
+        for stage in STAGES[1:] + ['total']:
+            h = self.latencies[stage]
+            processing_time = self.processing_times[stage].mean() if stage in self.processing_times else h.mean()
+            m.append('%-6s %6d %9.1f %9.1f %9.1f %9.1f %9.1f  %s' %
+                     (stage, h.n, 1000 * h.mean(), 1000 * h.percentile(0.5), 1000 * h.percentile(0.95),
+                      1000 * h.max, 1000 * processing_time, ' '.join('%d' % c for c in h.counts)))
+
+        m.append('-' * 120)
+        return '\n'.join(m)
+
+
+def get_tracer(cfg):
+    """Returns the tracer from the configuration, a disabled tracer if there is none."""
+    tracer = cfg['Logging'].get('tracer')
+    if tracer is None:
+        tracer = Tracer(enabled=False)
+    return tracer
@@ -3,7 +3,13 @@
 
 from __future__ import unicode_literals
 
+import collections
+import errno
+import fcntl
+import hashlib
 import multiprocessing
+import multiprocessing.pool
+import threading
 import time
 import sys
 import traceback
@@ -13,23 +19,60 @@ import struct
 
 from datetime import datetime
 
-from alex.components.hub.messages import Command, Frame, TTSText
+from alex.components.hub.audiochannel import send_frames
+from alex.components.hub.messages import Command, TTSText
+from alex.components.hub.trace import get_tracer
 from alex.components.tts.common import get_tts_type, tts_factory
 
+from alex.utils.mproc import Reactor
 from alex.utils.procname import set_proc_name
 from alex.utils.audio import save_wav
+from alex.utils.cache import SQLiteLRUCache
 import alex.utils.various as various
 
 
-class TTS(multiprocessing.Process):
+class Prompt(object):
+    """A text being synthesized segment by segment."""
+
+    def __init__(self, user_id, text, log, session_id, trace_id):
+        self.user_id = user_id
+        self.text = text
+        self.log = log
+        # the call of the request if the TTS is a shared worker, see alex.components.hub.multiplex
+        self.session_id = session_id
+        # the user turn to which the prompt responds
+        self.trace_id = trace_id
+        self.time = time.time()
+        self.fname = 'tts-{stamp}.wav'.format(stamp=datetime.now().strftime('%Y-%m-%d--%H-%M-%S.%f'))
+        self.segments = collections.deque()
+        self.started = False
+        self.first_frame_sent = False
+
+
+class Segment(object):
+    """A segment of a prompt, the audio is set by a synthesis thread."""
+
+    def __init__(self, text):
+        self.text = text
+        self.wav = None
+        self.done = False
+        # whether the prompt of the segment has been flushed
+        self.cancelled = False
+
+
+class TTS(Reactor):
     """TTS synthesizes input text and returns speech audio signal.
 
     This component is a wrapper around multiple TTS engines which handles multiprocessing
     communication.
+
+    The segments of the prompts are synthesized concurrently by a pool of threads. The audio of a segment is sent as
+    soon as it and all the preceding segments are synthesized, and the main loop keeps processing the commands
+    meanwhile, so flush() cancels the pending synthesis immediately.
     """
 
     def __init__(self, cfg, commands, text_in, audio_out, close_event):
-        multiprocessing.Process.__init__(self)
+        Reactor.__init__(self)
 
         self.cfg = cfg
         self.commands = commands
@@ -39,6 +82,56 @@ class TTS(multiprocessing.Process):
 
         tts_type = get_tts_type(cfg)
         self.tts = tts_factory(tts_type, cfg)
+        self.tracer = get_tracer(cfg)
+
+        # the caches are opened by the synthesis threads
+        self.local = threading.local()
+
+        # the prompts waiting for their audio to be sent, the first one is being sent
+        self.prompts = collections.deque()
+        # increased by flush() so that the synthesis threads skip the segments of the flushed prompts
+        self.generation = 0
+
+        # the thread pool and the pipe by which the threads report synthesized segments are created in the TTS process
+        self.pool = None
+        self.segment_ready_read_fd = self.segment_ready_write_fd = None
+
+    def get_input_connections(self):
+        return [self.commands, self.text_in, self.segment_ready_read_fd]
+
+    def start_synthesis_threads(self):
+        self.segment_ready_read_fd, self.segment_ready_write_fd = os.pipe()
+        for fd in [self.segment_ready_read_fd, self.segment_ready_write_fd]:
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+        self.pool = multiprocessing.pool.ThreadPool(self.cfg['TTS']['synthesis_threads'])
+
+    def notify_segment_ready(self):
+        try:
+            os.write(self.segment_ready_write_fd, b'x')
+        except OSError as e:
+            # the pipe is full, it is readable anyway
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def clear_segment_ready(self):
+        try:
+            while os.read(self.segment_ready_read_fd, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def get_session(self):
+        """Returns the call of the currently processed request if the TTS is a shared worker, otherwise None."""
+        context = getattr(self.commands, 'context', None)
+        return context.session_id if context is not None else None
+
+    def set_session(self, session_id):
+        """Makes the messages sent by the TTS belong to the call if the TTS is a shared worker."""
+        context = getattr(self.commands, 'context', None)
+        if context is not None:
+            context.set_session(session_id)
 
     def parse_into_segments(self, text):
         segments = []
@@ -76,7 +169,7 @@ class TTS(multiprocessing.Process):
                 if ord(x) != 0:
                     break
 
-            return wav[2*int(i/2):-2*int(j/2)]
+            return wav[2*int(i/2):len(wav)-2*int(j/2)]
         else:
             return wav
 
@@ -90,38 +183,164 @@ class TTS(multiprocessing.Process):
 
         return struct.pack('h',0)*length
 
-    def synthesize(self, user_id, text, log="true"):
+    def get_cache(self):
+        """ Returns the cache of the synthesized segments of the calling thread, None if it is disabled by the config.
+        """
+        if not self.cfg['TTS'].get('cache'):
+            return None
+
+        # an SQLite connection cannot be shared by threads
+        if getattr(self.local, 'cache', None) is None:
+            self.local.cache = SQLiteLRUCache(self.cfg['TTS']['cache']['file_name'],
+                                              self.cfg['TTS']['cache']['max_size'])
+
+        return self.local.cache
+
+    def get_cache_key(self, text):
+        """ Returns the cache key of the text, it depends on all settings of the TTS engine and on the sample rate.
+        """
+        tts_type = get_tts_type(self.cfg)
+        if isinstance(tts_type, basestring):
+            engine_cfg = sorted(self.cfg['TTS'].get(tts_type, {}).items())
+        else:
+            tts_type = tts_type.__name__
+            engine_cfg = None
+
+        return hashlib.sha1(repr((tts_type, engine_cfg, self.cfg['Audio']['sample_rate'], text))).hexdigest()
+
+    def synthesize_segment(self, text):
+        """ Synthesizes the text and removes the silence at the beginning and the end of the audio.
+
+        The final audio is cached, so a repeated segment needs neither the TTS engine nor any audio conversion.
+
+        :param text: the text of the segment
+        :return: wave audio signal in the default format and sample rate
+        """
+        cache = self.get_cache()
+        if cache is not None:
+            key = self.get_cache_key(text)
+            wav = cache.get(key)
+            if wav is not None:
+                return wav
+
+        wav = self.remove_start_and_final_silence(self.tts.synthesize(text))
+
+        # the TTS engines return no audio when they fail
+        if cache is not None and wav:
+            cache[key] = wav
+
+        return wav
+
+    def synthesize_in_thread(self, segment, generation):
+        """ Synthesizes the segment in a thread of the pool unless its prompt has been flushed meanwhile.
+        """
+        if generation != self.generation or segment.cancelled:
+            return
+
+        try:
+            segment.wav = self.synthesize_segment(segment.text)
+        except:
+            self.cfg['Logging']['system_logger'].exception('Synthesis of a segment failed.')
+            segment.wav = b""
+
+        segment.done = True
+        self.notify_segment_ready()
+
+    def synthesize(self, user_id, text, log="true", trace_id=None):
+        """ Starts the synthesis of all segments of the text, the audio is sent by send_synthesized_segments().
+        """
         if text == "_silence_" or text == "silence()":
             # just let the TTS generate an empty wav
             text == ""
 
-        wav = []
-        timestamp = datetime.now().strftime('%Y-%m-%d--%H-%M-%S.%f')
-        fname = 'tts-{stamp}.wav'.format(stamp=timestamp)
+        prompt = Prompt(user_id, text, log, self.get_session(), trace_id)
+        for segment_text in self.parse_into_segments(text):
+            segment = Segment(segment_text)
+            prompt.segments.append(segment)
+            self.pool.apply_async(self.synthesize_in_thread, (segment, self.generation))
 
-        self.commands.send(Command('tts_start(user_id="%s",text="%s",fname="%s")' % (user_id,text,fname), 'TTS', 'HUB'))
+        self.prompts.append(prompt)
+
+    def start_prompt(self, prompt):
+        self.commands.send(Command('tts_start(user_id="%s",text="%s",fname="%s")' %
+                           (prompt.user_id, prompt.text, prompt.fname), 'TTS', 'HUB'))
         self.audio_out.send(Command('utterance_start(user_id="%s",text="%s",fname="%s",log="%s")' %
-                            (user_id, text, fname, log), 'TTS', 'AudioOut'))
+                            (prompt.user_id, prompt.text, prompt.fname, prompt.log), 'TTS', 'AudioOut',
+                            prompt.trace_id))
+        prompt.started = True
 
-        segments = self.parse_into_segments(text)
+    def end_prompt(self, prompt):
+        self.commands.send(Command('tts_end(user_id="%s",text="%s",fname="%s")' %
+                           (prompt.user_id, prompt.text, prompt.fname), 'TTS', 'HUB'))
+        self.audio_out.send(Command('utterance_end(user_id="%s",text="%s",fname="%s",log="%s")' %
+                            (prompt.user_id, prompt.text, prompt.fname, prompt.log), 'TTS', 'AudioOut'))
 
-        for i, segment_text in enumerate(segments):
-            segment_wav = self.tts.synthesize(segment_text)
-            segment_wav = self.remove_start_and_final_silence(segment_wav)
-            if i <  len(segments) - 1:
-                # add silence only for non-final segments
-                segment_wav += self.gen_silence()
+    def send_synthesized_segments(self):
+        """ Sends the audio of the synthesized segments in the order of the prompts and their segments.
+        """
+        self.clear_segment_ready()
 
-            wav.append(segment_wav)
+        while self.prompts:
+            prompt = self.prompts[0]
+            self.set_session(prompt.session_id)
 
-            segment_wav = various.split_to_bins(segment_wav, 2 * self.cfg['Audio']['samples_per_frame'])
+            if not prompt.started:
+                self.start_prompt(prompt)
 
-            for frame in segment_wav:
-                self.audio_out.send(Frame(frame))
+            while prompt.segments and prompt.segments[0].done:
+                segment_wav = prompt.segments.popleft().wav
+                if prompt.segments:
+                    # add silence only for non-final segments
+                    segment_wav += self.gen_silence()
 
-        self.commands.send(Command('tts_end(user_id="%s",text="%s",fname="%s")' % (user_id,text,fname), 'TTS', 'HUB'))
-        self.audio_out.send(Command('utterance_end(user_id="%s",text="%s",fname="%s",log="%s")' %
-                            (user_id, text, fname, log), 'TTS', 'AudioOut'))
+                segment_wav = various.split_to_bins(segment_wav, 2 * self.cfg['Audio']['samples_per_frame'])
+
+                send_frames(self.audio_out, segment_wav)
+
+                if not prompt.first_frame_sent:
+                    self.tracer.span(prompt.trace_id, 'tts', prompt.time)
+                    prompt.first_frame_sent = True
+
+            if prompt.segments:
+                # wait for the synthesis of the next segment
+                return
+
+            self.end_prompt(prompt)
+            self.prompts.popleft()
+
+    def flush(self, session_id=None):
+        """ Cancels the synthesis of all prompts, or only of the prompts of the call if the session ID is given (see
+        alex.components.hub.multiplex).
+        """
+        if session_id is None:
+            self.generation += 1
+            flushed = list(self.prompts)
+        else:
+            flushed = [prompt for prompt in self.prompts if prompt.session_id == session_id]
+
+        for prompt in flushed:
+            for segment in prompt.segments:
+                segment.cancelled = True
+
+        # the audio of the prompt has been started, so it must be ended; the rest of its audio is not sent
+        if self.prompts and self.prompts[0].started and self.prompts[0] in flushed:
+            self.set_session(self.prompts[0].session_id)
+            self.end_prompt(self.prompts[0])
+
+        remaining = [prompt for prompt in self.prompts if prompt not in flushed]
+        self.prompts.clear()
+        self.prompts.extend(remaining)
+
+    def flush_session(self, session_id):
+        """ Discards the received texts and cancels the synthesis of the prompts of the call, the prompts of the other
+        calls sharing this TTS are kept.
+        """
+        self.flush(session_id)
+
+        while self.text_in.poll():
+            data_tts = self.text_in.recv()
+            if isinstance(data_tts, TTSText) and self.get_session() != session_id:
+                self.synthesize(None, data_tts.text, trace_id=data_tts.trace_id)
 
     def process_pending_commands(self):
         """Process all pending commands.
@@ -130,6 +349,8 @@ class TTS(multiprocessing.Process):
           stop() - stop processing and exit the process
           flush() - flush input buffers.
             Now it only flushes the input connection.
+          flush_session() - flush the input and the prompts of the call which sent the command, if the TTS is
+            shared by several calls
 
         Return True if the process should terminate.
         """
@@ -148,10 +369,17 @@ class TTS(multiprocessing.Process):
                     while self.text_in.poll():
                         data_in = self.text_in.recv()
 
+                    self.flush()
+
                     self.commands.send(Command("flushed()", 'TTS', 'HUB'))
                     
                     return False
 
+                if command.parsed['__name__'] == 'flush_session':
+                    self.flush_session(self.get_session())
+
+                    return False
+
                 if command.parsed['__name__'] == 'synthesize':
                     self.synthesize(command.parsed['user_id'], command.parsed['text'], command.parsed['log'])
 
@@ -160,27 +388,30 @@ class TTS(multiprocessing.Process):
         return False
 
     def read_text_write_audio(self):
-        # read only one TTS command so that the others can be flushed in it is requested
-        # between the processing of the TTS commands
-        # REMEMBER: processing of one TTS command can take a lot of time
+        # the texts are only queued for the synthesis threads, so the commands (e.g. flush) are processed
+        # while the prompts are being synthesized
 
-        if self.text_in.poll():
+        while self.text_in.poll():
             data_tts = self.text_in.recv()
             if isinstance(data_tts, TTSText):
-                self.synthesize(None, data_tts.text)
+                self.synthesize(None, data_tts.text, trace_id=data_tts.trace_id)
+
+        self.send_synthesized_segments()
 
     def run(self):
         try:
             set_proc_name("Alex_TTS")
             self.cfg['Logging']['session_logger'].cancel_join_thread()
 
+            self.start_synthesis_threads()
+
             while 1:
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                self.wait_for_input()
 
                 s = (time.time(), time.clock())
 
@@ -9,7 +9,10 @@ from collections import deque
 from datetime import datetime
 
 from alex.components.asr.exceptions import ASRException
+from alex.components.hub.audiochannel import send_frames
 from alex.components.hub.messages import Command, Frame
+from alex.components.hub.trace import get_tracer
+from alex.utils.mproc import Reactor
 from alex.utils.procname import set_proc_name
 from alex.utils.exceptions import SessionClosedException
 
@@ -17,7 +20,7 @@ import alex.components.vad.power as PVAD
 import alex.components.vad.gmm as GVAD
 import alex.components.vad.ffnn as NNVAD
 
-class VAD(multiprocessing.Process):
+class VAD(Reactor):
     """ VAD detects segments of speech in the audio stream.
 
     It implements two smoothing windows, one for detection of speech and one
@@ -36,22 +39,32 @@ class VAD(multiprocessing.Process):
     These commands have to be properly detected in the output stream by the
     following component.
 
+    If the input audio is read from a shared ring buffer, only the commands are
+    sent to the output. They contain the positions of the start and the end of
+    the speech segment in the ring buffer, from which the following component
+    reads the audio.
+
     """
 
-    def __init__(self, cfg, commands, audio_in, audio_out, close_event):
-        multiprocessing.Process.__init__(self)
+    def __init__(self, cfg, commands, audio_in, audio_out, close_event, audio_in_ring=None):
+        Reactor.__init__(self)
 
         self.cfg = cfg
         self.system_logger = cfg['Logging']['system_logger']
         self.session_logger = cfg['Logging']['session_logger']
+        self.tracer = get_tracer(cfg)
         self.commands = commands
         self.local_commands = deque()
         self.audio_in = audio_in
         self.local_audio_in = deque()
         self.audio_out = audio_out
+        self.audio_in_ring = audio_in_ring
         self.close_event = close_event
 
         self.vad_fname = None
+        # the trace of the current speech segment and the time of its start
+        self.trace_id = None
+        self.speech_start_time = None
 
         if self.cfg['VAD']['type'] == 'power':
             self.vad = PVAD.PowerVAD(cfg)
@@ -66,10 +79,26 @@ class VAD(multiprocessing.Process):
         self.detection_window_speech = deque(maxlen=self.cfg['VAD']['decision_frames_speech'])
         self.detection_window_sil    = deque(maxlen=self.cfg['VAD']['decision_frames_sil'])
         self.deque_audio_in          = deque(maxlen=self.cfg['VAD']['speech_buffer_frames'])
+        # the positions in audio_in_ring of the frames which would be in deque_audio_in
+        self.deque_positions         = deque(maxlen=self.cfg['VAD']['speech_buffer_frames'])
 
         # keeps last decision about whether there is speech or non speech
         self.last_vad = False
 
+    def get_input_connections(self):
+        if self.audio_in_ring is not None:
+            return [self.commands, self.audio_in, self.audio_in_ring]
+        return [self.commands, self.audio_in]
+
+    def has_pending_input(self):
+        if self.audio_in_ring is not None and self.audio_in_ring.available() >= self.frame_size:
+            return True
+        return bool(self.local_commands or self.local_audio_in)
+
+    @property
+    def frame_size(self):
+        return 2 * self.cfg['Audio']['samples_per_frame']
+
     def recv_input_locally(self):
         """ Copy all input from input connections into local queue objects.
 
@@ -84,6 +113,9 @@ class VAD(multiprocessing.Process):
             frame = self.audio_in.recv()
             self.local_audio_in.append(frame)
 
+        if self.audio_in_ring is not None:
+            self.audio_in_ring.clear_notifications()
+
     def process_pending_commands(self):
         """Process all pending commands.
 
@@ -114,6 +146,13 @@ class VAD(multiprocessing.Process):
                     self.detection_window_speech.clear()
                     self.detection_window_sil.clear()
                     self.deque_audio_in.clear()
+                    self.deque_positions.clear()
+                    if self.audio_in_ring is not None:
+                        self.audio_in_ring.seek(self.audio_in_ring.get_limit())
+
+                    # end the recording of the interrupted speech segment
+                    if self.last_vad:
+                        self.session_logger.rec_end(self.vad_fname)
 
                     # reset other state variables
                     self.last_vad = False
@@ -149,6 +188,16 @@ class VAD(multiprocessing.Process):
 
         return vad, change
 
+    def start_trace(self):
+        """Starts the trace of a new user turn."""
+        self.trace_id = self.tracer.new_trace_id()
+        self.speech_start_time = time.time()
+
+    def end_trace(self):
+        """Records the speech of the user turn, the latency of the turn is measured from its end."""
+        self.tracer.span(self.trace_id, 'vad', self.speech_start_time)
+        self.trace_id = None
+
     def read_write_audio(self):
         # read input audio
         if self.local_audio_in:
@@ -180,31 +229,89 @@ class VAD(multiprocessing.Process):
 
                     self.session_logger.turn("user")
                     self.session_logger.rec_start("user", self.vad_fname)
+                    self.start_trace()
 
                     # Inform both the parent and the consumer.
-                    self.audio_out.send(Command('speech_start(fname="%s")' % self.vad_fname, 'VAD', 'AudioIn'))
-                    self.commands.send(Command('speech_start(fname="%s")' % self.vad_fname, 'VAD', 'HUB'))
+                    self.audio_out.send(Command('speech_start(fname="%s")' % self.vad_fname, 'VAD', 'AudioIn',
+                                                self.trace_id))
+                    self.commands.send(Command('speech_start(fname="%s")' % self.vad_fname, 'VAD', 'HUB',
+                                               self.trace_id))
 
                 elif change == 'non-speech':
                     self.session_logger.rec_end(self.vad_fname)
 
                     # Inform both the parent and the consumer.
-                    self.audio_out.send(Command('speech_end(fname="%s")' % self.vad_fname, 'VAD', 'AudioIn'))
-                    self.commands.send(Command('speech_end(fname="%s")' % self.vad_fname, 'VAD', 'HUB'))
+                    self.audio_out.send(Command('speech_end(fname="%s")' % self.vad_fname, 'VAD', 'AudioIn',
+                                                self.trace_id))
+                    self.commands.send(Command('speech_end(fname="%s")' % self.vad_fname, 'VAD', 'HUB',
+                                               self.trace_id))
+                    self.end_trace()
 
                 if vad:
-                    while self.deque_audio_in:
-                        # Send or save all potentially queued data.
-                        #   - When there is change to speech, there will be
-                        #     several frames of audio;
-                        #   - If there is no change, then there will be only
-                        #     one queued frame.
+                    # Send or save all potentially queued data.
+                    #   - When there is change to speech, there will be
+                    #     several frames of audio, they are sent in one message;
+                    #   - If there is no change, then there will be only
+                    #     one queued frame.
+                    send_frames(self.audio_out, self.deque_audio_in)
+
+                    for data_rec in self.deque_audio_in:
+                        self.session_logger.rec_write(self.vad_fname, data_rec)
+                    self.deque_audio_in.clear()
 
-                        data_rec = self.deque_audio_in.popleft()
+    def read_write_audio_ring(self):
+        """Processes one frame of the input audio from the shared ring buffer.
 
-                        # Send the result.
-                        self.audio_out.send(data_rec)
-                        self.session_logger.rec_write(self.vad_fname, data_rec)
+        The frame is consumed only after the commands about the speech segment are sent, so the following
+        component (reading the ring buffer up to the position of the VAD) always gets them before the audio.
+        """
+        if self.audio_in_ring.available() < self.frame_size:
+            return
+
+        position, data_rec = self.audio_in_ring.read(self.frame_size)
+        if data_rec is None or len(data_rec) < self.frame_size:
+            return
+
+        self.deque_positions.append(position)
+
+        decision = self.vad.decide(data_rec)
+        vad, change = self.smoothe_decison(decision)
+
+        if self.cfg['VAD']['debug']:
+            self.system_logger.debug("vad: %s change: %s" % (vad, change))
+
+        if change == 'speech':
+            # Create new wave file.
+            timestamp = datetime.now().strftime('%Y-%m-%d--%H-%M-%S.%f')
+            self.vad_fname = 'vad-{stamp}.wav'.format(stamp=timestamp)
+
+            self.session_logger.turn("user")
+            self.session_logger.rec_start("user", self.vad_fname)
+            self.start_trace()
+
+            # The speech segment starts with the oldest buffered frame.
+            start = self.deque_positions[0]
+            self.audio_out.send(Command('speech_start(fname="%s",position="%d")' % (self.vad_fname, start),
+                                        'VAD', 'AudioIn', self.trace_id))
+            self.commands.send(Command('speech_start(fname="%s")' % self.vad_fname, 'VAD', 'HUB', self.trace_id))
+
+        elif change == 'non-speech':
+            self.session_logger.rec_end(self.vad_fname)
+
+            # The current frame is not a part of the speech segment.
+            self.audio_out.send(Command('speech_end(fname="%s",position="%d")' % (self.vad_fname, position),
+                                        'VAD', 'AudioIn', self.trace_id))
+            self.commands.send(Command('speech_end(fname="%s")' % self.vad_fname, 'VAD', 'HUB', self.trace_id))
+            self.end_trace()
+
+        if vad:
+            start = self.deque_positions[0]
+            segment = self.audio_in_ring.ring.get(start, position + self.frame_size - start)
+            if segment is not None:
+                self.session_logger.rec_write(self.vad_fname, segment.tostring())
+            self.deque_positions.clear()
+
+        self.audio_in_ring.consume(self.frame_size)
 
     def run(self):
         try:
@@ -217,7 +324,7 @@ class VAD(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                self.wait_for_input()
 
                 s = (time.time(), time.clock())
 
@@ -234,7 +341,10 @@ class VAD(multiprocessing.Process):
                 try:
                     for i in range(self.cfg['VAD']['n_rwa']):
                         # process at least n_rwa frames
-                        self.read_write_audio()
+                        if self.audio_in_ring is not None:
+                            self.read_write_audio_ring()
+                        else:
+                            self.read_write_audio()
                 except SessionClosedException as e:
                     self.system_logger.exception('VAD:read_write_audio: {ex!s}'.format(ex=e))
 
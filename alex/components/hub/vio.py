@@ -14,10 +14,12 @@ import pjsuaxt as pj
 from datetime import datetime
 from collections import deque, defaultdict
 
+from alex.components.hub.audiochannel import send_frames
 from alex.components.hub.messages import Command, Frame
 from alex.utils.exceptions import SessionLoggerException
 from alex.components.hub.exceptions import VoipIOException
 from alex.utils.exdec import catch_ioerror
+from alex.utils.mproc import Reactor
 from alex.utils.procname import set_proc_name
 
 # Logging callback
@@ -181,9 +183,12 @@ class CallCallback(pj.CallCallback):
                 call_slot = self.call.info().conf_slot
 
                 # Construct the output file names.
+                # The session logger knows the directory of the call even if the system logger is shared by
+                # several calls.
+                session_dir = self.session_logger.session_dir_name.value or self.system_logger.get_session_dir_name()
                 timestamp = datetime.now().strftime('%Y-%m-%d--%H-%M-%S.%f')
-                self.output_file_name_recorded = os.path.join(self.system_logger.get_session_dir_name(),'all-{stamp}.recorded.wav'.format(stamp=timestamp))
-                self.output_file_name_played = os.path.join(self.system_logger.get_session_dir_name(),'all-{stamp}.played.wav'.format(stamp=timestamp))
+                self.output_file_name_recorded = os.path.join(session_dir,'all-{stamp}.recorded.wav'.format(stamp=timestamp))
+                self.output_file_name_played = os.path.join(session_dir,'all-{stamp}.played.wav'.format(stamp=timestamp))
  
                 self.session_logger.dialogue_rec_start("system", os.path.basename(self.output_file_name_played))
                 self.session_logger.dialogue_rec_start("user", os.path.basename(self.output_file_name_recorded))
@@ -289,7 +294,7 @@ class CallCallback(pj.CallCallback):
             raise
 
 
-class VoipIO(multiprocessing.Process):
+class VoipIO(Reactor):
     """ VoipIO implements IO operations using a SIP protocol.
 
     If enabled then it logs all recorded and played audio into a file.
@@ -297,7 +302,7 @@ class VoipIO(multiprocessing.Process):
     played audio.
     """
 
-    def __init__(self, cfg, commands, audio_record, audio_play, close_event):
+    def __init__(self, cfg, commands, audio_record, audio_play, close_event, audio_record_ring=None):
         """ Initialize VoipIO
 
         cfg - configuration dictionary
@@ -306,13 +311,16 @@ class VoipIO(multiprocessing.Process):
           Audio is divided into frames, each of the length of
           samples_per_frame.
 
+        audio_record_ring - a SharedRingBuffer to which the recorded audio is written
+          instead of sending it through audio_record.
+
         audio_play - inter-process connection for receiving audio to be played.
           Audio must be divided into frames, each with the length of
           samples_per_frame.
 
         """
 
-        multiprocessing.Process.__init__(self)
+        Reactor.__init__(self)
 
         self.cfg = cfg
         self.acc = None
@@ -323,10 +331,13 @@ class VoipIO(multiprocessing.Process):
         self.local_commands = deque()
 
         self.audio_record = audio_record
+        self.audio_record_ring = audio_record_ring
         self.audio_recording = False
 
         self.audio_play = audio_play
         self.audio_playing = False
+        # whether the played utterance is recorded by the session logger
+        self.audio_playing_logged = False
         self.local_audio_play = deque()
 
         self.last_frame_id = 1
@@ -336,6 +347,13 @@ class VoipIO(multiprocessing.Process):
 
         self.black_list = defaultdict(int)
 
+    def get_input_connections(self):
+        return [self.commands, self.audio_play]
+
+    def get_wait_timeout(self):
+        # the recorded audio is not signalled by any connection, it has to be read periodically
+        return self.cfg['Hub']['main_loop_sleep_time']
+
     def recv_input_locally(self):
         """ Copy all input from input connections into local queue objects.
 
@@ -392,7 +410,7 @@ class VoipIO(multiprocessing.Process):
 
                     self.local_audio_play.clear()
                     self.mem_player.flush()
-                    self.audio_playing = False
+                    self.end_playing()
 
                     # flush the recorded data
                     while self.mem_capture.get_read_available():
@@ -411,7 +429,7 @@ class VoipIO(multiprocessing.Process):
 
                     self.local_audio_play.clear()
                     self.mem_player.flush()
-                    self.audio_playing = False
+                    self.end_playing()
 
                     self.commands.send(Command("flushed_out()", 'VoipIO', 'HUB'))
                     
@@ -448,6 +466,17 @@ class VoipIO(multiprocessing.Process):
 
         return False
 
+    def end_playing(self):
+        """Stops playing the current utterance, e.g. when it is flushed, and ends its recording."""
+        if self.audio_playing and self.audio_playing_logged:
+            try:
+                self.cfg['Logging']['session_logger'].rec_end(self.audio_playing)
+            except SessionLoggerException as e:
+                self.cfg['Logging']['system_logger'].exception(e)
+
+        self.audio_playing = False
+        self.audio_playing_logged = False
+
     def send_pending_messages(self):
         """ Send all messages for which corresponding frame was already played.
         """
@@ -482,6 +511,7 @@ class VoipIO(multiprocessing.Process):
             elif isinstance(data_play, Command):
                 if data_play.parsed['__name__'] == 'utterance_start':
                     self.audio_playing = data_play.parsed['fname']
+                    self.audio_playing_logged = False
                     self.message_queue.append(
                         (Command('play_utterance_start(user_id="{uid}",fname="{fname}")'
                                     .format(uid=data_play.parsed['user_id'], fname=data_play.parsed['fname']),
@@ -490,11 +520,13 @@ class VoipIO(multiprocessing.Process):
                     try:
                         if data_play.parsed['log'] == "true":
                             self.cfg['Logging']['session_logger'].rec_start("system", data_play.parsed['fname'])
+                            self.audio_playing_logged = True
                     except SessionLoggerException as e:
                         self.cfg['Logging']['system_logger'].exception(e)
 
                 if self.audio_playing and data_play.parsed['__name__'] == 'utterance_end':
                     self.audio_playing = None
+                    self.audio_playing_logged = False
                     self.message_queue.append(
                         (Command('play_utterance_end(user_id="{uid}",fname="{fname})'
                                  .format(uid=data_play.parsed['user_id'], fname=data_play.parsed['fname']),
@@ -506,14 +538,19 @@ class VoipIO(multiprocessing.Process):
                     except SessionLoggerException as e:
                         self.cfg['Logging']['system_logger'].exception(e)
 
-        if (self.mem_capture.get_read_available() > self.cfg['Audio']['samples_per_frame'] * 2):
-            # Get and send recorded data, it must be read at the other end.
-            data_rec = self.mem_capture.get_frame()
-
-            # send the audio only if the call is connected
-            # ignore any audio signal left after the call was disconnected
-            if self.audio_recording:
-                self.audio_record.send(Frame(data_rec))
+        frames_rec = []
+        while (self.mem_capture.get_read_available() > self.cfg['Audio']['samples_per_frame'] * 2):
+            # Get all recorded data, it is sent in one message and it must be read at the other end.
+            frames_rec.append(self.mem_capture.get_frame())
+
+        # send the audio only if the call is connected
+        # ignore any audio signal left after the call was disconnected
+        if self.audio_recording:
+            if self.audio_record_ring is not None:
+                for frame in frames_rec:
+                    self.audio_record_ring.write(frame)
+            else:
+                send_frames(self.audio_record, frames_rec)
 
     def is_sip_uri(self, dst):
         """ Check whether it is a SIP URI.
@@ -817,7 +854,7 @@ class VoipIO(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                self.wait_for_input()
 
                 s = (time.time(), time.clock())
 
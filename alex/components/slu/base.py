@@ -17,6 +17,10 @@ from alex.components.slu.exceptions import SLUException
 from alex.utils.config import load_as_module
 from alex.utils.various import nesteddict
 
+# The key marking the end of a surface form in the CategoryLabelDatabase.form_trie. No word can be equal to it.
+FORM_END = None
+
+
 class CategoryLabelDatabase(object):
     """Provides a convenient interface to a database of slot value pairs aka
     category labels.
@@ -41,6 +45,9 @@ class CategoryLabelDatabase(object):
        - instead of testing all surface forms from the CLDB from the longest to the shortest in the utterance, we test
          all the substrings in the utterance from the longest to the shortest
 
+    The substring search is implemented by ``find_forms``, which walks a token trie compiled from all surface forms
+    (``form_trie``) in a single left-to-right pass over the utterance.  At each position, it follows the trie as far as
+    the utterance allows and reports the longest surface form ending on the way.
 
     """
     def __init__(self, file_name):
@@ -49,6 +56,7 @@ class CategoryLabelDatabase(object):
         self.forms = []
         self.form_value_cl = []
         self.form2value2cl = nesteddict()
+        self.form_trie = {}
 
         if file_name:
             self.load(file_name)
@@ -99,6 +107,7 @@ class CategoryLabelDatabase(object):
         self.gen_synonym_value_category()
         self.gen_form_value_cl_list()
         self.gen_mapping_form2value2cl()
+        self.gen_form_trie()
 
         self._form_val_upname = None
         self._form_upnames_vals = None
@@ -153,6 +162,55 @@ class CategoryLabelDatabase(object):
 
         self.forms.sort(key=lambda f: len(f), reverse=True)
 
+    def gen_form_trie(self):
+        """
+        Compiles all surface forms from ``form2value2cl`` into a token trie. Every node of the trie is a dictionary
+        mapping the next word to the child node; a node where a surface form ends stores the form under the
+        ``FORM_END`` key.
+
+        :return: none
+        """
+        self.form_trie = {}
+        for form in self.form2value2cl:
+            if not form:
+                continue
+
+            node = self.form_trie
+            for word in form:
+                node = node.setdefault(word, {})
+            node[FORM_END] = form
+
+    def find_forms(self, words):
+        """
+        Scans the sequence of words from left to right and yields the longest surface forms found in the database.
+        Once a surface form is found, the scan continues after its end; therefore, the reported forms do not overlap.
+
+        This is equivalent to testing all substrings of ``words`` starting at each position from the longest to the
+        shortest against ``form2value2cl``, but it does not build any intermediate tuples.
+
+        :param words: a sequence of words, e.g. an Utterance instance
+        :return: a generator of (start, end, form) tuples, where form is the tuple of words ``words[start:end]``
+        """
+        trie = self.form_trie
+        n_words = len(words)
+
+        start = 0
+        while start < n_words:
+            node = trie
+            end, form = start, None
+            for idx in xrange(start, n_words):
+                node = node.get(words[idx])
+                if node is None:
+                    break
+                if FORM_END in node:
+                    end, form = idx + 1, node[FORM_END]
+
+            if form is not None:
+                yield start, end, form
+                start = end
+            else:
+                start += 1
+
 
 class SLUPreprocessing(object):
     """Implements preprocessing of utterances or utterances and dialogue acts.
@@ -6,9 +6,12 @@ from __future__ import unicode_literals
 
 import copy
 import codecs
+import heapq
 
 from operator import xor
 from collections import defaultdict
+from itertools import islice
+from math import log
 
 from alex.corpustools.wavaskey import load_wavaskey, save_wavaskey
 from alex.components.slu.exceptions import SLUException, DialogueActException, DialogueActItemException, \
@@ -610,6 +613,11 @@ class DialogueActNBList(SLUHypothesis, NBList):
         """
         return self.n_best[0][1]
 
+    def hyp_key(self, da):
+        # Dialogue acts are compared as sorted lists of DAIs and DAIs are
+        # compared by their string representation.
+        return tuple(sorted(unicode(dai) for dai in da))
+
     def get_best_nonnull_da(self):
         """Return the best dialogue act (with the highest probability)."""
 
@@ -646,26 +654,28 @@ class DialogueActNBList(SLUHypothesis, NBList):
         if len(self.n_best) <= 1:
             return
         else:
-            new_n_best = self.n_best[:1]
-
-            for cur_idx in xrange(1, len(self.n_best)):
-                cur_hyp = self.n_best[cur_idx]
-                for new_idx, new_hyp in enumerate(new_n_best):
-                    if new_hyp[1] == cur_hyp[1]:
-                        # Merge, add the probabilities.
-                        new_da = new_hyp[1]
-                        for dai in cur_hyp[1]:
-                            new_dais = (new_dai for new_dai in new_da if
-                                        new_dai == dai)
-                            for new_dai in new_dais:
-                                new_dai._unnorm_values.update(
-                                    dai._unnorm_values)
-                        new_hyp[0] += cur_hyp[0]
-                        break
+            new_n_best = []
+            index = {}
+
+            for cur_hyp in self.n_best:
+                key = self.hyp_key(cur_hyp[1])
+                if key in index:
+                    # Merge, add the probabilities.
+                    new_hyp = index[key][0]
+                    new_da = new_hyp[1]
+                    for dai in cur_hyp[1]:
+                        new_dais = (new_dai for new_dai in new_da if
+                                    new_dai == dai)
+                        for new_dai in new_dais:
+                            new_dai._unnorm_values.update(
+                                dai._unnorm_values)
+                    new_hyp[0] += cur_hyp[0]
                 else:
+                    index[key] = [cur_hyp]
                     new_n_best.append(cur_hyp)
 
         self.n_best = sorted(new_n_best, reverse=True)
+        self._index = index
         return self
 
     def get_confnet(self):
@@ -728,6 +738,8 @@ class DialogueActConfusionNetwork(SLUHypothesis, ConfusionNetwork):
             yield dai_hyp
 
     def items(self):
+        # The caller can modify the returned items.
+        self._index = None
         return self.cn
 
     @staticmethod
@@ -774,7 +786,8 @@ class DialogueActConfusionNetwork(SLUHypothesis, ConfusionNetwork):
     def extend(self, conf_net):
         if not isinstance(conf_net, ConfusionNetwork):
             raise DialogueActConfusionNetworkException("Only DialogueActConfusionNetwork can be added.")
-        self.cn.extend(conf_net.cn)
+        for prob, dai in conf_net.cn:
+            self.add(prob, dai)
         return self
 
     def add_merge(self, probability, dai, combine='max'):
@@ -790,10 +803,9 @@ class DialogueActConfusionNetwork(SLUHypothesis, ConfusionNetwork):
 
         """
         combine_meth = self._combine_meths[combine]
-        for dai_idx, (prob_orig, dai_orig) in enumerate(self.cn):
-            if dai == dai_orig:
-                self.cn[dai_idx][0] = combine_meth(prob_orig, probability)
-                break
+        item = self.index.get(dai)
+        if item is not None:
+            item[0] = combine_meth(item[0], probability)
         else:
             # If the DAI was not present, add it.
             self.add(probability, dai)
@@ -895,12 +907,6 @@ class DialogueActConfusionNetwork(SLUHypothesis, ConfusionNetwork):
 
         return prob
 
-    def get_marginal(self, dai):
-        for prob, my_dai in self.cn:
-            if my_dai == dai:
-                return prob
-        return None
-
     def get_next_worse_candidates(self, hyp_index):
         """
         Returns such hypotheses that will have lower probability.
@@ -948,71 +954,58 @@ class DialogueActConfusionNetwork(SLUHypothesis, ConfusionNetwork):
         res.sort(reverse=True)
         return res
 
-    def get_da_nblist(self, n=10, prune_prob=0.005):
-        """Parses the input dialogue act item confusion network and generates N-best hypotheses.
+    def iter_da_hyps(self):
+        """Generates the dialogue act hypotheses lazily in the order of decreasing probability.
 
-        The result is a list of dialogue act hypotheses each with a with
-        assigned probability.  The list also include a dialogue act for not
-        having the correct dialogue act in the list - other().
+        In the most probable hypothesis, each dialogue act item is present if its probability is at least 0.5. Every
+        other hypothesis differs from the best one by flipping the presence of some of the dialogue act items. This is a
+        best-first search over the sets of flipped items. To generate every hypothesis only once, a hypothesis is
+        expanded only by flipping the items after the last flipped one. The log-probabilities of the expanded
+        hypotheses are updated incrementally and they only order the search; the probability of a generated hypothesis
+        is computed exactly by get_prob.
 
-        Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
+        Yields (probability, dialogue act) tuples.
 
         """
+        inf = float('inf')
 
-        #print "cn", [(p, unicode(dai)) for p, dai in self.cn]
-
-        open_hyp = []
-        closed_hyp = {}
-
-        for j, (p, dai) in enumerate(self.cn):
-            if p < 0.5:
-                i = j
-                break
-        else:
-            i = len(self.cn)
+        def neg_log(p):
+            return -log(p) if p > 0.0 else inf
 
-        # create index for the best hypothesis
-        best_hyp = tuple([0,] * i + [1,] * (len(self.cn) - i))
-        best_prob = self.get_prob(best_hyp)
-        open_hyp.append((best_prob, best_hyp))
-        # print "i, bp, bh", i, best_prob, best_hyp
+        # create index for the best hypothesis, 0 - the DAI is present, 1 - the DAI is absent
+        best_hyp = tuple(0 if p >= 0.5 else 1 for p, dai in self.cn)
+        best_neg_logprobs = [neg_log(max(p, 1.0 - p)) for p, dai in self.cn]
+        # the increase of the negative log-probability when the presence of the DAI is flipped
+        flip_costs = [neg_log(min(p, 1.0 - p)) - best for (p, dai), best in zip(self.cn, best_neg_logprobs)]
 
-        i = 0
-        while open_hyp and i < n*100:
-            i += 1
+        # The heap items are (-log-probability, hypothesis index, the index of the first DAI which can be flipped).
+        open_hyp = [(sum(best_neg_logprobs), best_hyp, 0)]
 
-            current_prob, current_hyp_index = open_hyp.pop(0)
+        while open_hyp:
+            neg_logprob, hyp_index, first = heapq.heappop(open_hyp)
+            yield self.get_prob(hyp_index), self.get_hyp_index_dialogue_act(hyp_index)
 
-            if current_hyp_index not in closed_hyp:
-                # process only those hypotheses which were not processed so far
+            for i in xrange(first, len(hyp_index)):
+                worse_hyp = hyp_index[:i] + (1 - hyp_index[i],) + hyp_index[i + 1:]
+                heapq.heappush(open_hyp, (neg_logprob + flip_costs[i], worse_hyp, i + 1))
 
-                closed_hyp[current_hyp_index] = current_prob
-                # print "current_prob, current_hyp_index:", current_prob, current_hyp_index
-
-                for hyp_index in self.get_next_worse_candidates(current_hyp_index):
-                    # print hyp_index
-                    prob = self.get_prob(hyp_index)
-                    open_hyp.append((prob, hyp_index))
+    def get_da_nblist(self, n=10, prune_prob=0.005):
+        """Parses the input dialogue act item confusion network and generates N-best hypotheses.
 
-                open_hyp.sort(reverse=True)
+        The result is a list of dialogue act hypotheses each with a with
+        assigned probability.  The list also include a dialogue act for not
+        having the correct dialogue act in the list - other().
 
-            if len(closed_hyp) >= n:
-                break
+        Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
 
+        """
         nblist = DialogueActNBList()
-        for idx in closed_hyp:
-            # print "p = ",closed_hyp[idx], "hyp = ", self.get_hyp_index_dialogue_act(idx)
-            nblist.add(closed_hyp[idx], self.get_hyp_index_dialogue_act(idx))
-
-        #print nblist
-        #print
+        for prob, da in islice(self.iter_da_hyps(), n):
+            nblist.add(prob, da)
 
         nblist.merge()
         nblist.add_other()
 
-        #print nblist
-        #print
-
         return nblist
 
     def merge(self, combine='max'):
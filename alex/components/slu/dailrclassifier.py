@@ -8,20 +8,56 @@ the way how the features are computed is changed significantly.
 from __future__ import unicode_literals
 
 import copy
+import json
+import multiprocessing
+import struct
+import time
 import numpy as np
 import cPickle as pickle
 
 from collections import defaultdict
+from itertools import imap
 from sklearn.linear_model import LogisticRegression
-from scipy.sparse import lil_matrix, coo_matrix
+from scipy.sparse import coo_matrix, csr_matrix, issparse
 
 from alex.components.asr.utterance import Utterance, UtteranceHyp, UtteranceNBList, UtteranceConfusionNetwork
 from alex.components.slu.exceptions import DAILRException
 from alex.components.slu.base import SLUInterface
 from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork
-from alex.utils.cache import lru_cache
+from alex.utils.cache import LRUCache
 
 CONFNET2NBLIST_EXPANSION_APPROX = 40
+FEATURES_CACHE_SIZE = 10000
+
+# The compiled model file starts with the magic string, the version, and the length of the JSON header. The float32
+# data (the weights followed by the intercepts) start at the next page boundary after the header so that they can be
+# memory mapped.
+COMPILED_MODEL_MAGIC = b'ALEXSLU\x00'
+COMPILED_MODEL_VERSION = 1
+COMPILED_MODEL_ALIGNMENT = 4096
+
+
+def get_compiled_model_data_offset(header_len):
+    offset = len(COMPILED_MODEL_MAGIC) + struct.calcsize(b'<II') + header_len
+    return (offset + COMPILED_MODEL_ALIGNMENT - 1) // COMPILED_MODEL_ALIGNMENT * COMPILED_MODEL_ALIGNMENT
+
+
+def fit_classifier(args):
+    """
+    Fits one logistic regression classifier. It is a module level function so that it can be run in the worker
+    processes of DAILogRegClassifier.train.
+
+    :param args: a tuple (classifier, input matrix, outputs, inverse regularisation)
+    :return: a tuple (classifier, the trained LogisticRegression, mean accuracy on the training data)
+    """
+    clser, classifier_input, classifier_output, inverse_regularisation = args
+
+    # liblinear shuffles the training data, the fixed seed makes the model independent of the worker processes
+    lr = LogisticRegression('l2', dual=True, C=inverse_regularisation, tol=1e-6, random_state=0)
+    lr.fit(classifier_input, classifier_output)
+    mean_accuracy = lr.score(classifier_input, classifier_output)
+
+    return clser, lr, mean_accuracy
 
 
 class Features(object):
@@ -66,6 +102,27 @@ class Features(object):
 
         return data, rows
 
+    @staticmethod
+    def get_feature_matrix_csr(features_list, features_mapping, dtype=np.float64):
+        """
+        Builds a sparse matrix where each row is the feature vector of one Features instance.
+
+        :param features_list: a list of Features instances
+        :param features_mapping: a mapping from features to column indices
+        :param dtype: the type of the matrix elements
+        :return: a csr_matrix of the shape (len(features_list), len(features_mapping))
+        """
+        data = []
+        indices = []
+        indptr = [0, ]
+        for feat in features_list:
+            d, i = feat.get_feature_vector_lil(features_mapping)
+            data.extend(d)
+            indices.extend(i)
+            indptr.append(len(indices))
+
+        return csr_matrix((data, indices, indptr), shape=(len(features_list), len(features_mapping)), dtype=dtype)
+
     def prune(self, remove_features):
         """
         Prune all features in the ``remove_feature`` set.
@@ -186,11 +243,21 @@ class DAILogRegClassifier(SLUInterface):
 
     """
 
-    def __init__(self, cldb, preprocessing, features_size=4, *args, **kwargs):
+    def __init__(self, cldb, preprocessing, features_size=4, features_cache_size=FEATURES_CACHE_SIZE, *args, **kwargs):
         self.features_size = features_size
         self.cldb = cldb
         self.preprocessing = preprocessing
 
+        # The features and FVCs extracted from an utterance depend only on its words; therefore, they are cached by
+        # the tuple of the (normalised) words. The same utterance often occurs in many hypotheses of an N-best list and
+        # many times in the training data.
+        self.features_cache = LRUCache(maxsize=features_cache_size)
+        self.fvc_cache = LRUCache(maxsize=features_cache_size)
+
+        # the classifiers compiled for batched inference, see compile_model()
+        self.features_mapping = None
+        self.compiled_classifiers = None
+
     def __repr__(self):
         r = "DAILogRegClassifier({cldb},{preprocessing},{features_size})"\
             .format(cldb=self.cldb, preprocessing=self.preprocessing, features_size=self.features_size)
@@ -206,31 +273,13 @@ class DAILogRegClassifier(SLUInterface):
 
         abs_utts = []
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            u = copy.deepcopy(utterance)
-                            u = u.replace2(start, end, 'CL_' + c.upper())
-
-                            abs_utts.append((u, f, v, c))
-
-                    #print f
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    u = copy.deepcopy(utterance)
+                    u = u.replace2(start, end, 'CL_' + c.upper())
 
+                    abs_utts.append((u, f, v, c))
 
         return abs_utts
 
@@ -249,21 +298,15 @@ class DAILogRegClassifier(SLUInterface):
         if not form:
             return abs_utt
 
+        # Only the substrings of the same length as the form can match it.
+        form_len = len(form)
         start = 0
         while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f, form
+            if tuple(utterance[start:start + form_len]) == form:
+                abs_utt = abs_utt.replace2(start, start + form_len, c)
 
-                if f == form:
-                    abs_utt = abs_utt.replace2(start, end, c)
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
+                # skip all substring for this form
+                start += form_len
             else:
                 start += 1
 
@@ -279,25 +322,10 @@ class DAILogRegClassifier(SLUInterface):
 
         abs_utt = copy.deepcopy(utterance)
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
 
         return abs_utt
 
@@ -329,28 +357,22 @@ class DAILogRegClassifier(SLUInterface):
         :return: a list of form, value, and category label tuples found in the input sentence
         """
 
+        key = tuple(utterance)
+        fvcs = self.fvc_cache.get(key)
+        if fvcs is not None:
+            return set(fvcs)
+
         fvcs = set()
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-
-                # this looks for an exact surface form in the CLDB
-                # however, we could also search for those withing a some distance from the exact surface form,
-                # for example using a string edit distance
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            fvcs.add((f, v, c))
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        # this looks for an exact surface form in the CLDB
+        # however, we could also search for those withing a some distance from the exact surface form,
+        # for example using a string edit distance
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    fvcs.add((f, v, c))
+
+        self.fvc_cache[key] = frozenset(fvcs)
 
         return fvcs
 
@@ -379,9 +401,8 @@ class DAILogRegClassifier(SLUInterface):
         """
         nblist = confnet.get_utterance_nblist(n=CONFNET2NBLIST_EXPANSION_APPROX)
 
-        return self.get_fvc_in_confnet(nblist)
+        return self.get_fvc_in_nblist(nblist)
 
-    @lru_cache(maxsize=1000)
     def get_fvc(self, obs):
         """
         This function returns the form, value, category label tuple for any of the following classses
@@ -412,11 +433,19 @@ class DAILogRegClassifier(SLUInterface):
         - the abstracted utterance for the given FVC
         - the abstracted where all other FVCs are abstracted as well
 
+        The features are cached by the words of the utterance and the FVC. Therefore, the returned instance is shared
+        and it must not be modified.
+
         :param utterance:
         :param fvc:
         :return: the UtteranceFeatures instance
         """
 
+        key = (self.features_size, tuple(utterance), fvc)
+        feat = self.features_cache.get(key)
+        if feat is not None:
+            return feat
+
         abs_obs = self.get_abstract_utterance(utterance, fvc)
         abs_obs2 = self.get_abstract_utterance2(abs_obs)
 
@@ -426,6 +455,8 @@ class DAILogRegClassifier(SLUInterface):
         feat.merge(UtteranceFeatures(size=self.features_size, utterance=abs_obs), weight=scale)
         feat.merge(UtteranceFeatures(size=self.features_size, utterance=abs_obs2), weight=scale)
 
+        self.features_cache[key] = feat
+
         return feat
 
     def get_features_in_nblist(self, nblist, fvc, fvcs):
@@ -450,7 +481,6 @@ class DAILogRegClassifier(SLUInterface):
         nblist = confnet.get_utterance_nblist(n=CONFNET2NBLIST_EXPANSION_APPROX)
         return self.get_features_in_nblist(nblist, fvc, fvcs)
 
-    # @lru_cache(maxsize=1000)
     def get_features(self, obs, fvc, fvcs):
         """
         Generate utterance features for a specific utterance given by utt_idx.
@@ -533,6 +563,10 @@ class DAILogRegClassifier(SLUInterface):
 
     def gen_classifiers_data(self, verbose=False):
         # generate training data
+        start_time = time.time()
+        n_features_extracted = 0
+        n_features_reused = 0
+
         self.classifiers_outputs = defaultdict(list)
         self.classifiers_cls = defaultdict(list)
         self.classifiers_features = defaultdict(list)
@@ -548,6 +582,13 @@ class DAILogRegClassifier(SLUInterface):
                 print unicode(self.utterances[utt_idx])
                 print unicode(self.das[utt_idx])
 
+            # The features depend only on the utterance and the FVC; therefore, they are extracted only once and shared
+            # by all classifiers.
+            utt_features = {}
+            for fvc in set(self.das_category_labels[utt_idx]) | set([(None, None, None), ]):
+                utt_features[fvc] = self.get_features(self.utterances[utt_idx], fvc, self.das_category_labels[utt_idx])
+            n_features_extracted += len(utt_features)
+
             for clser in self.classifiers:
                 if self.parsed_classifiers[clser].value and self.parsed_classifiers[clser].value.startswith('CL_'):
                     # process abstracted classifiers
@@ -569,8 +610,8 @@ class DAILogRegClassifier(SLUInterface):
                             self.classifiers_outputs[clser].append(0.0)
                             self.classifiers_cls[clser].append((None, None, None))
 
-                        self.classifiers_features[clser].append(
-                            self.get_features(self.utterances[utt_idx], self.das_category_labels[utt_idx][i], self.das_category_labels[utt_idx]))
+                        self.classifiers_features[clser].append(utt_features[self.das_category_labels[utt_idx][i]])
+                        n_features_reused += 1
 
                         if verbose:
                             print "  @", clser, i, dai, f, v, c
@@ -587,7 +628,8 @@ class DAILogRegClassifier(SLUInterface):
                         self.classifiers_outputs[clser].append(0.0)
                         self.classifiers_cls[clser].append((None, None, None))
 
-                    self.classifiers_features[clser].append(self.get_features(self.utterances[utt_idx], (None, None, None), self.das_category_labels[utt_idx]))
+                    self.classifiers_features[clser].append(utt_features[(None, None, None)])
+                    n_features_reused += 1
 
                     if verbose:
                         print "  @", clser
@@ -599,7 +641,14 @@ class DAILogRegClassifier(SLUInterface):
                 print clser
                 print zip(self.classifiers_outputs[clser], self.classifiers_cls[clser])
 
+        if verbose:
+            print "Generated the classifiers data for %d utterances in %.1f s" % \
+                  (len(self.utterances_list), time.time() - start_time)
+            print "  Features extracted: %d, used: %d" % (n_features_extracted, n_features_reused)
+            print "  Features cache hits: %d, misses: %d" % (self.features_cache.hits, self.features_cache.misses)
+
     def prune_features(self, min_feature_count=5, verbose=False):
+        start_time = time.time()
 
         self.classifiers_features_list = {}
         self.classifiers_features_mapping = {}
@@ -621,60 +670,85 @@ class DAILogRegClassifier(SLUInterface):
             if verbose:
                 print "  Number of features: ", len(features_counts)
 
-            remove_features = []
-            for f in features_counts:
-                if features_counts[f] < min_feature_count + len(f):
-                    remove_features.append(f)
+            # The features are shared by all classifiers (see gen_classifiers_data); therefore, they are not pruned
+            # in place. Only the kept features are mapped to the classifier inputs.
+            kept_features = [f for f in features_counts if features_counts[f] >= min_feature_count + len(f)]
 
             if verbose:
-                print "  Number of features occurring less then %d times: %d" % (min_feature_count, len(remove_features))
+                print "  Number of features occurring less then %d times: %d" % \
+                      (min_feature_count, len(features_counts) - len(kept_features))
 
-            remove_features = set(remove_features)
-            for feat in self.classifiers_features[clser]:
-                feat.prune(remove_features)
-
-            features_counts = defaultdict(int)
-            for feat in self.classifiers_features[clser]:
-                for f in feat:
-                    features_counts[f] += 1
-
-            self.classifiers_features_list[clser] = features_counts.keys()
+            self.classifiers_features_list[clser] = kept_features
 
             self.classifiers_features_mapping[clser] = {}
             for i, f in enumerate(self.classifiers_features_list[clser]):
                 self.classifiers_features_mapping[clser][f] = i
 
             if verbose:
-                print "  Number of features after pruning: ", len(features_counts)
+                print "  Number of features after pruning: ", len(kept_features)
+
+        if verbose:
+            print "Pruned the features in %.1f s" % (time.time() - start_time)
+
 
+    def gen_classifier_input(self, clser):
+        """
+        Builds the sparse input matrix for training the classifier from its features.
+
+        :param clser: the classifier
+        :return: a csr_matrix with one row for each training example
+        """
+        return Features.get_feature_matrix_csr(self.classifiers_features[clser], self.classifiers_features_mapping[clser])
+
+    def train(self, inverse_regularisation=1.0, verbose=True, n_jobs=None):
+        """
+        Trains the classifiers. The classifiers are independent; therefore, they are trained in parallel in a pool of
+        worker processes.
 
-    def train(self, inverse_regularisation=1.0, verbose=True):
+        :param inverse_regularisation: the inverse of the regularisation strength of the logistic regression
+        :param verbose: report the progress of the training
+        :param n_jobs: the number of the worker processes, by default the number of CPUs
+        """
+        start_time = time.time()
         self.trained_classifiers = {}
+        self.compiled_classifiers = None
+
+        if n_jobs is None:
+            n_jobs = multiprocessing.cpu_count()
 
         if verbose:
             print '=' * 120
             print 'Training'
             print '-' * 120
+            print "Number of worker processes: ", n_jobs
 
-        for clser in sorted(self.classifiers):
-            if verbose:
-                print "Training classifier: ", clser
-                print "  Matrix:            ", (len(self.classifiers_outputs[clser]), len(self.classifiers_features_list[clser]))
+        tasks = ((clser, self.gen_classifier_input(clser), self.classifiers_outputs[clser], inverse_regularisation)
+                 for clser in sorted(self.classifiers))
 
-            classifier_input = lil_matrix((len(self.classifiers_outputs[clser]), len(self.classifiers_features_list[clser])))
-            for i, feat in enumerate(self.classifiers_features[clser]):
-                classifier_input.data[i], classifier_input.rows[i] = feat.get_feature_vector_lil(self.classifiers_features_mapping[clser])
+        pool = None
+        if n_jobs > 1:
+            pool = multiprocessing.Pool(n_jobs)
+            results = pool.imap_unordered(fit_classifier, tasks)
+        else:
+            results = imap(fit_classifier, tasks)
 
-            classifier_input = classifier_input.tocsr()
+        try:
+            for n, (clser, lr, mean_accuracy) in enumerate(results, start=1):
+                self.trained_classifiers[clser] = lr
 
-            lr = LogisticRegression('l2', dual=True, C=inverse_regularisation, tol=1e-6)
-            lr.fit(classifier_input, self.classifiers_outputs[clser])
-            self.trained_classifiers[clser] = lr
+                if verbose:
+                    print "[%d/%d] Trained classifier: %s" % (n, len(self.classifiers), clser)
+                    print "  Matrix:            ", (len(self.classifiers_outputs[clser]), len(self.classifiers_features_list[clser]))
+                    print "  Prediction mean accuracy on the training data: %6.2f" % (100.0 * mean_accuracy, )
+                    print "  Size of the params:", lr.coef_.shape
+                    print "  Elapsed time: %.1f s" % (time.time() - start_time, )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
 
-            if verbose:
-                mean_accuracy = lr.score(classifier_input, self.classifiers_outputs[clser])
-                print "  Prediction mean accuracy on the training data: %6.2f" % (100.0 * mean_accuracy, )
-                print "  Size of the params:", lr.coef_.shape
+        if verbose:
+            print "Trained %d classifiers in %.1f s" % (len(self.trained_classifiers), time.time() - start_time)
 
     def save_model(self, file_name, gzip=None):
         data = [self.classifiers_features_list, self.classifiers_features_mapping, self.trained_classifiers,
@@ -692,6 +766,12 @@ class DAILogRegClassifier(SLUInterface):
             pickle.dump(data, outfile)
 
     def load_model(self, file_name):
+        # Handle compiled models.
+        with open(file_name, 'rb') as model_file:
+            if model_file.read(len(COMPILED_MODEL_MAGIC)) == COMPILED_MODEL_MAGIC:
+                self.load_compiled_model(file_name)
+                return
+
         # Handle gzipped files.
         if file_name.endswith('gz'):
             import gzip
@@ -704,7 +784,258 @@ class DAILogRegClassifier(SLUInterface):
             (self.classifiers_features_list, self.classifiers_features_mapping, self.trained_classifiers,
              self.parsed_classifiers, self.features_size) = pickle.load(model_file)
 
+        self.compile_model()
+
+    def save_compiled_model(self, file_name):
+        """
+        Saves the compiled classifiers in the compact binary format.
+
+        The feature vocabulary is stored in a JSON header where every word occurring in the features is stored only once
+        and the features refer to the words by their indices. The weights of all classifier groups are stored as one
+        contiguous float32 array, and they are followed by the intercepts of all classifiers.
+
+        :param file_name: the name of the output file
+        """
+        if self.compiled_classifiers is None:
+            self.compile_model()
+
+        words = {}
+        features = [None, ] * len(self.features_mapping)
+        for f, i in self.features_mapping.iteritems():
+            if isinstance(f, tuple):
+                features[i] = [words.setdefault(w, len(words)) for w in f]
+            else:
+                features[i] = words.setdefault(f, len(words))
+
+        words_list = [None, ] * len(words)
+        for w, i in words.iteritems():
+            words_list[i] = w
+
+        groups = []
+        weights = []
+        intercepts = []
+        offset = 0
+        for cl in sorted(self.compiled_classifiers):
+            clsers, cl_weights, cl_intercepts = self.compiled_classifiers[cl]
+            if issparse(cl_weights):
+                cl_weights = cl_weights.toarray()
+
+            groups.append({'category_label': cl, 'classifiers': clsers, 'offset': offset})
+            weights.append(np.ascontiguousarray(cl_weights, dtype='<f4'))
+            intercepts.extend(cl_intercepts)
+            offset += cl_weights.size
+
+        header = {
+            'features_size': self.features_size,
+            'words': words_list,
+            'features': features,
+            'groups': groups,
+            'n_weights': offset,
+        }
+        header = json.dumps(header).encode('utf-8')
+
+        with open(file_name, 'wb') as outfile:
+            outfile.write(COMPILED_MODEL_MAGIC)
+            outfile.write(struct.pack(b'<II', COMPILED_MODEL_VERSION, len(header)))
+            outfile.write(header)
+            outfile.write(b'\x00' * (get_compiled_model_data_offset(len(header)) - outfile.tell()))
+
+            for w in weights:
+                w.tofile(outfile)
+            np.asarray(intercepts, dtype='<f4').tofile(outfile)
+
+    def load_compiled_model(self, file_name):
+        """
+        Loads the compiled classifiers saved by ``save_compiled_model``.
+
+        The weights are memory mapped read-only; therefore, they are loaded lazily and all processes using the same
+        model file share them through the page cache. The model loaded this way can be used only for parsing.
+
+        :param file_name: the name of the model file
+        """
+        with open(file_name, 'rb') as model_file:
+            if model_file.read(len(COMPILED_MODEL_MAGIC)) != COMPILED_MODEL_MAGIC:
+                raise DAILRException("The file {fn} is not a compiled SLU model.".format(fn=file_name))
+
+            version, header_len = struct.unpack(b'<II', model_file.read(struct.calcsize(b'<II')))
+            if version != COMPILED_MODEL_VERSION:
+                raise DAILRException("Unsupported version {v} of the compiled SLU model {fn}."
+                                     .format(v=version, fn=file_name))
+
+            header = json.loads(model_file.read(header_len).decode('utf-8'))
+
+        words = header['words']
+        self.features_size = header['features_size']
+        self.features_mapping = {}
+        for i, f in enumerate(header['features']):
+            if isinstance(f, list):
+                self.features_mapping[tuple(words[w] for w in f)] = i
+            else:
+                self.features_mapping[words[f]] = i
+
+        n_features = len(self.features_mapping)
+        n_classifiers = sum(len(group['classifiers']) for group in header['groups'])
+        data = np.memmap(file_name, dtype='<f4', mode='r', offset=get_compiled_model_data_offset(header_len),
+                         shape=(header['n_weights'] + n_classifiers,))
+        intercepts = np.array(data[header['n_weights']:])
+
+        self.parsed_classifiers = {}
+        self.compiled_classifiers = {}
+        intercepts_offset = 0
+        for group in header['groups']:
+            clsers = group['classifiers']
+            for clser in clsers:
+                self.parsed_classifiers[clser] = DialogueActItem()
+                self.parsed_classifiers[clser].parse(clser)
+
+            start = group['offset']
+            cl_weights = data[start:start + n_features * len(clsers)].reshape((n_features, len(clsers)))
+            cl_intercepts = intercepts[intercepts_offset:intercepts_offset + len(clsers)]
+            intercepts_offset += len(clsers)
+
+            self.compiled_classifiers[group['category_label']] = (clsers, cl_weights, cl_intercepts)
+
+    def compile_model(self):
+        """
+        Compiles the trained classifiers for batched inference.
+
+        All features used by any of the classifiers are mapped into one shared feature space. The classifiers are
+        grouped by the input they are applied to: the concrete classifiers all use the features of the utterance
+        abstracted with the (None, None, None) FVC, and the abstracted classifiers for the same category label all use
+        the features of the utterance abstracted with an FVC of this category label. The weights of the classifiers in
+        each group are stacked column-wise into a single sparse matrix. Therefore, all classifiers in a group are
+        evaluated by one sparse matrix product.
+
+        The compiled classifiers are stored in ``self.compiled_classifiers`` which maps a category label
+        (or None for the concrete classifiers) to a tuple (classifiers, weights, intercepts).
+        """
+        self.features_mapping = {}
+        for clser in sorted(self.trained_classifiers):
+            for f in self.classifiers_features_list[clser]:
+                if f not in self.features_mapping:
+                    self.features_mapping[f] = len(self.features_mapping)
+
+        groups = defaultdict(list)
+        for clser in sorted(self.trained_classifiers):
+            value = self.parsed_classifiers[clser].value
+            if value and value.startswith('CL_'):
+                groups[value].append(clser)
+            else:
+                groups[None].append(clser)
+
+        self.compiled_classifiers = {}
+        for cl, clsers in groups.iteritems():
+            data, rows, cols = [], [], []
+            intercepts = np.zeros(len(clsers))
+
+            for col, clser in enumerate(clsers):
+                lr = self.trained_classifiers[clser]
+                coef = lr.coef_[0]
+                for f, i in self.classifiers_features_mapping[clser].iteritems():
+                    if coef[i] != 0.0:
+                        data.append(coef[i])
+                        rows.append(self.features_mapping[f])
+                        cols.append(col)
+                intercepts[col] = lr.intercept_[0]
+
+            weights = coo_matrix((data, (rows, cols)), shape=(len(self.features_mapping), len(clsers))).tocsc()
+            self.compiled_classifiers[cl] = (clsers, weights, intercepts)
+
+    def predict_proba_compiled(self, cl, features_list):
+        """
+        Computes the probabilities of all classifiers of the group ``cl`` for each of the features.
+
+        :param cl: the category label of the classifiers or None for the concrete classifiers
+        :param features_list: a list of Features instances
+        :return: a tuple (classifiers, probabilities) where probabilities is an array of the shape
+                 (len(features_list), len(classifiers))
+        """
+        clsers, weights, intercepts = self.compiled_classifiers[cl]
+
+        # the inputs must have the same type as the weights, otherwise the weights would be converted
+        inputs = Features.get_feature_matrix_csr(features_list, self.features_mapping, dtype=weights.dtype)
+        z = inputs.dot(weights)
+        if issparse(z):
+            z = z.toarray()
+        z += intercepts
+
+        return clsers, 1.0 / (1.0 + np.exp(-z))
+
     def parse_X(self, utterance, verbose=False):
+        """
+        Parses the utterance using the compiled classifiers. The features for the utterance abstracted with each
+        FVC are computed only once and all classifiers using them are evaluated together.
+
+        :param utterance: the utterance being processed in multiple formats
+        :param verbose: print the probabilities of all classifiers
+        :return: the dialogue act item confusion network
+        """
+        if verbose:
+            print '='*120
+            print 'Parsing X'
+            print '-'*120
+            print unicode(utterance)
+
+        if self.compiled_classifiers is None:
+            self.compile_model()
+
+        if self.preprocessing:
+            utterance = self.preprocessing.normalise(utterance)
+        if isinstance(utterance, UtteranceConfusionNetwork):
+            # expand the confnet only once, not for every FVC
+            utterance = utterance.get_utterance_nblist(n=CONFNET2NBLIST_EXPANSION_APPROX)
+        utterance_fvcs = self.get_fvc(utterance)
+
+        if verbose:
+            print unicode(utterance)
+            print unicode(utterance_fvcs)
+            print "Features cache hits: %d, misses: %d" % (self.features_cache.hits, self.features_cache.misses)
+
+        da_confnet = DialogueActConfusionNetwork()
+
+        # process concrete classifiers
+        if None in self.compiled_classifiers:
+            features = self.get_features(utterance, (None, None, None), utterance_fvcs)
+            clsers, p = self.predict_proba_compiled(None, [features, ])
+
+            for i, clser in enumerate(clsers):
+                if verbose:
+                    print "Using classifier: ", unicode(clser)
+                    print '  Probability:', p[0, i]
+
+                da_confnet.add(p[0, i], self.parsed_classifiers[clser])
+
+        # process abstracted classifiers
+        cl_fvcs = defaultdict(list)
+        for f, v, c in utterance_fvcs:
+            cc = "CL_" + c.upper()
+            if cc in self.compiled_classifiers:
+                cl_fvcs[cc].append((f, v, cc))
+
+        for cc, fvcs in cl_fvcs.iteritems():
+            features = [self.get_features(utterance, fvc, utterance_fvcs) for fvc in fvcs]
+            clsers, p = self.predict_proba_compiled(cc, features)
+
+            for j, (f, v, cc) in enumerate(fvcs):
+                for i, clser in enumerate(clsers):
+                    if verbose:
+                        print "Using classifier: ", unicode(clser), v
+                        print '  Probability:', p[j, i]
+
+                    dai = DialogueActItem(self.parsed_classifiers[clser].dat, self.parsed_classifiers[clser].name, v)
+                    da_confnet.add(p[j, i], dai)
+
+        da_confnet.sort().merge().prune()
+
+        return da_confnet
+
+    def parse_X_per_classifier(self, utterance, verbose=False):
+        """
+        Parses the utterance by evaluating each of the trained classifiers separately.
+
+        This is the reference implementation of ``parse_X``; it is much slower because it recomputes the features for
+        every classifier. It is useful for debugging the compiled classifiers.
+        """
         if verbose:
             print '='*120
             print 'Parsing X'
@@ -713,7 +1044,7 @@ class DAILogRegClassifier(SLUInterface):
 
         if self.preprocessing:
             utterance = self.preprocessing.normalise(utterance)
-            utterance_fvcs = self.get_fvc(utterance)
+        utterance_fvcs = self.get_fvc(utterance)
 
         if verbose:
             print unicode(utterance)
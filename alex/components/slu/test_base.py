@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+import __init__
+
+from alex.components.asr.utterance import Utterance
+from alex.components.slu.base import CategoryLabelDatabase
+
+
+class TestCategoryLabelDatabase(unittest.TestCase):
+    def setUp(self):
+        self.cldb = CategoryLabelDatabase(None)
+        self.cldb.database = {
+            "stop": {
+                "Anděl": ["anděl", "anděla"],
+                "Malostranské náměstí": ["malostranské náměstí", "malostranská"],
+                "Náměstí Míru": ["náměstí míru", ],
+            },
+            "city": {
+                "Praha": ["praha", "prahy"],
+                "Nová Paka": ["nová paka", "paka"],
+            },
+            "vehicle": {
+                "tram": ["tramvaj", ],
+            },
+        }
+        self.cldb.normalise_database()
+        self.cldb.gen_mapping_form2value2cl()
+        self.cldb.gen_form_trie()
+
+    def test_find_forms_longest_match(self):
+        utt = Utterance("kdy jede tramvaj z anděla na malostranské náměstí")
+
+        self.assertEqual(list(self.cldb.find_forms(utt)),
+                         [(2, 3, ('tramvaj',)),
+                          (4, 5, ('anděla',)),
+                          (6, 8, ('malostranské', 'náměstí'))])
+
+    def test_find_forms_no_overlap(self):
+        # The longest match at the start consumes "náměstí", so "náměstí míru" must not be reported.
+        utt = Utterance("malostranské náměstí míru nová paka")
+
+        self.assertEqual(list(self.cldb.find_forms(utt)),
+                         [(0, 2, ('malostranské', 'náměstí')),
+                          (3, 5, ('nová', 'paka'))])
+
+    def test_find_forms_no_match(self):
+        self.assertEqual(list(self.cldb.find_forms(Utterance("dobrý den"))), [])
+        self.assertEqual(list(self.cldb.find_forms(Utterance(""))), [])
+
+    def test_find_forms_equals_substring_search(self):
+        def substring_search(utterance):
+            forms = []
+            start = 0
+            while start < len(utterance):
+                end = len(utterance)
+                while end > start:
+                    f = tuple(utterance[start:end])
+                    if f in self.cldb.form2value2cl:
+                        forms.append((start, end, f))
+                        start = end
+                        break
+                    end -= 1
+                else:
+                    start += 1
+            return forms
+
+        for surface in ["z prahy do nová paka tramvaj",
+                        "náměstí náměstí míru praha",
+                        "paka nová paka nová",
+                        "anděl anděla anděl"]:
+            utt = Utterance(surface)
+            self.assertEqual(list(self.cldb.find_forms(utt)), substring_search(utt))
+
+
+if __name__ == '__main__':
+    unittest.main()
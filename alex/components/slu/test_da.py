@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from copy import deepcopy
+from itertools import product
 import unittest
 
 if __name__ == "__main__":
@@ -109,5 +110,70 @@ class TestDA(unittest.TestCase):
 
         self.assertEqual(unicode(merged_confnets), unicode(correct_merged_confnet))
 
+    def test_get_da_nblist(self):
+        confnet = DialogueActConfusionNetwork()
+        confnet.add(0.2, DialogueActItem('bye'))
+        confnet.add(0.7, DialogueActItem('hello'))
+        confnet.add(0.6, DialogueActItem('inform', 'food', 'chinese'))
+
+        # enumerate all hypotheses and sort them by their probability
+        all_hyps = []
+        for hyp_index in product([0, 1], repeat=len(confnet)):
+            all_hyps.append((confnet.get_prob(hyp_index), confnet.get_hyp_index_dialogue_act(hyp_index)))
+        all_hyps.sort(key=lambda hyp: -hyp[0])
+
+        generated = list(confnet.iter_da_hyps())
+        self.assertEqual(len(generated), len(all_hyps))
+        for (prob, da), (correct_prob, correct_da) in zip(generated, all_hyps):
+            self.assertAlmostEqual(prob, correct_prob)
+        self.assertEqual(generated[0][1], DialogueAct('hello()&inform(food="chinese")'))
+
+        nblist = confnet.get_da_nblist(n=3)
+        correct_nblist = DialogueActNBList()
+        for prob, da in all_hyps[:3]:
+            correct_nblist.add(prob, da)
+        correct_nblist.merge()
+        correct_nblist.add_other()
+
+        self.assertEqual(unicode(nblist), unicode(correct_nblist))
+
+    def test_nblist_index(self):
+        nblist = DialogueActNBList()
+        nblist.add(0.4, DialogueAct('hello()&inform(food="chinese")'))
+        nblist.add(0.3, DialogueAct("bye()"))
+        nblist.add(0.2, DialogueAct('inform(food="chinese")&hello()'))
+
+        self.assertTrue(DialogueAct("bye()") in nblist)
+        self.assertFalse(DialogueAct("hello()") in nblist)
+        self.assertAlmostEqual(nblist.get_prob(DialogueAct('hello()&inform(food="chinese")')), 0.6)
+
+        nblist.merge()
+        self.assertEqual(len(nblist), 2)
+        self.assertAlmostEqual(nblist.get_prob(DialogueAct('inform(food="chinese")&hello()')), 0.6)
+
+        nblist.add(0.05, DialogueAct("hello()"))
+        self.assertAlmostEqual(nblist.get_prob(DialogueAct("hello()")), 0.05)
+
+        nblist.add_other()
+        self.assertAlmostEqual(nblist.get_prob(DialogueAct("other()")), 0.05)
+
+        # Replacing a hypothesis through item access must be reflected by the index.
+        nblist[1][1] = DialogueAct("thankyou()")
+        self.assertFalse(DialogueAct("bye()") in nblist)
+        self.assertAlmostEqual(nblist.get_prob(DialogueAct("thankyou()")), 0.3)
+
+    def test_confnet_index(self):
+        confnet = DialogueActConfusionNetwork()
+        confnet.add(0.2, DialogueActItem('bye'))
+        confnet.add_merge(0.7, DialogueActItem('hello'))
+        confnet.add_merge(0.5, DialogueActItem('hello'))
+        confnet.add_merge(0.1, DialogueActItem('bye'), combine='add')
+
+        self.assertEqual(len(confnet), 2)
+        self.assertAlmostEqual(confnet.get_marginal(DialogueActItem('hello')), 0.7)
+        self.assertAlmostEqual(confnet.get_marginal(DialogueActItem('bye')), 0.3)
+        self.assertIsNone(confnet.get_marginal(DialogueActItem('thankyou')))
+        self.assertTrue(DialogueActItem('bye') in confnet)
+
 if __name__ == '__main__':
     unittest.main()
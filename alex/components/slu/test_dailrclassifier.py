@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+from collections import defaultdict
+
+import numpy as np
+
+if __name__ == "__main__":
+    import autopath
+import __init__
+
+from alex.components.asr.utterance import Utterance, UtteranceNBList
+from alex.components.slu.base import CategoryLabelDatabase, SLUPreprocessing
+from alex.components.slu.da import DialogueAct
+
+try:
+    from alex.components.slu.dailrclassifier import DAILogRegClassifier, Features
+except ImportError:
+    DAILogRegClassifier = None
+
+
+def create_cldb():
+    cldb = CategoryLabelDatabase(None)
+    cldb.database = {
+        "stop": {
+            "Anděl": ["anděl", "anděla"],
+            "Malostranské náměstí": ["malostranské náměstí", "malostranská"],
+            "Florenc": ["florenc", "florence"],
+        },
+        "vehicle": {
+            "tram": ["tramvaj", "tramvají"],
+            "bus": ["autobus", "autobusem"],
+        },
+    }
+    cldb.normalise_database()
+    cldb.gen_mapping_form2value2cl()
+    cldb.gen_form_trie()
+    return cldb
+
+
+def create_data():
+    """Returns the dialogue acts and the utterances of a small synthetic training set."""
+    examples = [
+        ("dobrý den", "hello()"),
+        ("nashledanou", "bye()"),
+        ("ano", "affirm()"),
+        ("ne díky", "negate()"),
+    ]
+    stops = [("anděla", "Anděl"), ("malostranské náměstí", "Malostranské náměstí"), ("florence", "Florenc")]
+    vehicles = [("tramvají", "tram"), ("autobusem", "bus")]
+    for from_form, from_stop in stops:
+        for to_form, to_stop in stops:
+            if from_stop != to_stop:
+                examples.append(("chci jet z {f} na {t}".format(f=from_form, t=to_form),
+                                 'inform(from_stop="{f}")&inform(to_stop="{t}")'.format(f=from_stop, t=to_stop)))
+        for vehicle_form, vehicle in vehicles:
+            examples.append(("pojedu {v} z {f}".format(v=vehicle_form, f=from_form),
+                             'inform(from_stop="{f}")&inform(vehicle="{v}")'.format(f=from_stop, v=vehicle)))
+        examples.append(("na {f}".format(f=from_form), 'inform(to_stop="{f}")'.format(f=from_stop)))
+
+    das, utterances = {}, {}
+    for i in range(2):
+        for j, (utterance, da) in enumerate(examples):
+            utt_idx = "{i}-{j}".format(i=i, j=j)
+            utterances[utt_idx] = Utterance(utterance)
+            das[utt_idx] = DialogueAct(da)
+    return das, utterances
+
+
+def create_slu(cldb):
+    slu = DAILogRegClassifier(cldb, SLUPreprocessing(cldb), features_size=2)
+    das, utterances = create_data()
+    slu.extract_classifiers(das, utterances)
+    slu.prune_classifiers(min_classifier_count=2)
+    slu.gen_classifiers_data()
+    slu.prune_features(min_feature_count=1)
+    return slu
+
+
+def confnet_items(da_confnet):
+    return sorted((unicode(dai), prob) for prob, dai in da_confnet)
+
+
+TEST_UTTERANCES = ["chci jet z anděla na florenc", "pojedu tramvají z malostranské náměstí", "dobrý den",
+                   "na anděl autobusem", "nevím"]
+
+
+@unittest.skipIf(DAILogRegClassifier is None, 'sklearn is not installed')
+class TestDAILogRegClassifier(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cldb = create_cldb()
+        cls.slu = create_slu(cls.cldb)
+        cls.slu.train(verbose=False, n_jobs=1)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assertConfnetsEqual(self, first, second):
+        first, second = confnet_items(first), confnet_items(second)
+        self.assertEqual([dai for dai, prob in first], [dai for dai, prob in second])
+        self.assertTrue(np.allclose([prob for dai, prob in first], [prob for dai, prob in second], atol=1e-5))
+
+    def test_parse_X_equals_parse_X_per_classifier(self):
+        for utterance in TEST_UTTERANCES:
+            self.assertConfnetsEqual(self.slu.parse_X(Utterance(utterance)),
+                                     self.slu.parse_X_per_classifier(Utterance(utterance)))
+
+        nblist = UtteranceNBList()
+        nblist.add(0.7, Utterance(TEST_UTTERANCES[0]))
+        nblist.add(0.3, Utterance(TEST_UTTERANCES[1]))
+        nblist.merge()
+        self.assertConfnetsEqual(self.slu.parse_X(nblist), self.slu.parse_X_per_classifier(nblist))
+
+    def test_predict_proba_compiled(self):
+        utterance = Utterance(TEST_UTTERANCES[0])
+        fvcs = self.slu.get_fvc(utterance)
+        features = self.slu.get_features(utterance, (None, None, None), fvcs)
+
+        clsers, p = self.slu.predict_proba_compiled(None, [features, features])
+        self.assertEqual(p.shape, (2, len(clsers)))
+        for i, clser in enumerate(clsers):
+            inputs = np.array([features.get_feature_vector(self.slu.classifiers_features_mapping[clser])])
+            expected = self.slu.trained_classifiers[clser].predict_proba(inputs)[0, 1]
+            self.assertAlmostEqual(p[0, i], expected, places=6)
+            self.assertAlmostEqual(p[1, i], expected, places=6)
+
+    def test_compiled_model_round_trip(self):
+        file_name = os.path.join(self.tmp_dir, 'model.slu')
+        self.slu.save_compiled_model(file_name)
+
+        slu = DAILogRegClassifier(self.cldb, SLUPreprocessing(self.cldb))
+        # the compiled model is recognised by load_model
+        slu.load_model(file_name)
+
+        self.assertEqual(slu.features_size, self.slu.features_size)
+        self.assertEqual(slu.features_mapping, self.slu.features_mapping)
+        self.assertEqual(sorted(slu.compiled_classifiers), sorted(self.slu.compiled_classifiers))
+        for cl, (clsers, weights, intercepts) in self.slu.compiled_classifiers.iteritems():
+            loaded_clsers, loaded_weights, loaded_intercepts = slu.compiled_classifiers[cl]
+            self.assertEqual(loaded_clsers, clsers)
+            # the weights are stored as float32
+            self.assertTrue(np.allclose(loaded_weights, weights.toarray(), atol=1e-6))
+            self.assertTrue(np.allclose(loaded_intercepts, intercepts, atol=1e-6))
+
+        for utterance in TEST_UTTERANCES:
+            self.assertConfnetsEqual(slu.parse_X(Utterance(utterance)), self.slu.parse_X(Utterance(utterance)))
+
+
+
+@unittest.skipIf(DAILogRegClassifier is None, 'sklearn is not installed')
+class TestDAILogRegClassifierTraining(unittest.TestCase):
+    def setUp(self):
+        self.cldb = create_cldb()
+
+    def test_parallel_training_equals_serial(self):
+        serial = create_slu(self.cldb)
+        serial.train(verbose=False, n_jobs=1)
+        parallel = create_slu(self.cldb)
+        parallel.train(verbose=False, n_jobs=3)
+
+        self.assertEqual(sorted(parallel.trained_classifiers), sorted(serial.trained_classifiers))
+        for clser, lr in serial.trained_classifiers.iteritems():
+            self.assertEqual(parallel.classifiers_features_list[clser], serial.classifiers_features_list[clser])
+            self.assertTrue(np.array_equal(parallel.trained_classifiers[clser].coef_, lr.coef_))
+            self.assertTrue(np.array_equal(parallel.trained_classifiers[clser].intercept_, lr.intercept_))
+
+    def test_shared_features(self):
+        slu = create_slu(self.cldb)
+        # a classifier with an empty cache extracts the features again
+        reference = DAILogRegClassifier(self.cldb, SLUPreprocessing(self.cldb), features_size=2)
+
+        concrete = sorted(clser for clser in slu.classifiers if not slu.parsed_classifiers[clser].value)
+        abstracted = sorted(clser for clser in slu.classifiers if slu.parsed_classifiers[clser].value)
+        self.assertTrue(concrete and abstracted)
+
+        n_abstracted = 0
+        for k, utt_idx in enumerate(slu.utterances_list):
+            utterance = slu.utterances[utt_idx]
+            fvcs = slu.das_category_labels[utt_idx]
+
+            # the features of the utterance are extracted once and shared by all concrete classifiers
+            features = slu.classifiers_features[concrete[0]][k]
+            for clser in concrete:
+                self.assertIs(slu.classifiers_features[clser][k], features)
+            self.assertEqual(dict(features.features),
+                             dict(reference.get_features(utterance, (None, None, None), fvcs).features))
+
+            # the abstracted classifiers get the features of the utterance abstracted with the FVC of every DAI
+            for i, fvc in enumerate(fvcs):
+                expected = dict(reference.get_features(utterance, fvc, fvcs).features)
+                for clser in abstracted:
+                    self.assertEqual(dict(slu.classifiers_features[clser][n_abstracted + i].features), expected)
+            n_abstracted += len(fvcs)
+
+        for clser in abstracted:
+            self.assertEqual(len(slu.classifiers_features[clser]), n_abstracted)
+
+    def test_prune_features_not_in_place(self):
+        slu = create_slu(self.cldb)
+        sizes = dict((clser, [len(f) for f in slu.classifiers_features[clser]]) for clser in slu.classifiers)
+
+        min_feature_count = 10
+        slu.prune_features(min_feature_count=min_feature_count)
+
+        for clser in slu.classifiers:
+            # the shared features are not modified
+            self.assertEqual([len(f) for f in slu.classifiers_features[clser]], sizes[clser])
+
+            features_counts = defaultdict(int)
+            for feat in slu.classifiers_features[clser]:
+                for f in feat:
+                    features_counts[f] += 1
+            kept = set(f for f in features_counts if features_counts[f] >= min_feature_count + len(f))
+            self.assertEqual(set(slu.classifiers_features_list[clser]), kept)
+            self.assertTrue(0 < len(kept) < len(features_counts))
+
+            # the input is the same as from the features pruned in place
+            pruned = copy.deepcopy(slu.classifiers_features[clser])
+            for feat in pruned:
+                feat.prune(set(feat) - kept)
+            expected = Features.get_feature_matrix_csr(pruned, slu.classifiers_features_mapping[clser])
+            inputs = slu.gen_classifier_input(clser)
+            self.assertEqual(inputs.shape, (len(slu.classifiers_outputs[clser]), len(kept)))
+            self.assertEqual((inputs != expected).nnz, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ import alex.components.tts.google as GTTS
 import alex.components.tts.flite as FTTS
 import alex.components.tts.speechtech as STTS
 import alex.components.tts.voicerss as VTTS
+import alex.components.tts.stub as StubTTS
 from alex.components.tts import TTSInterface
 from alex.components.tts.exceptions import TTSException
 
@@ -26,5 +27,7 @@ def tts_factory(tts_type, cfg):
         return STTS.SpeechtechTTS(cfg)
     elif tts_type == 'VoiceRss':
         return VTTS.VoiceRssTTS(cfg)
+    elif tts_type == 'Stub':
+        return StubTTS.StubTTS(cfg)
     else:
         raise TTSException('Unsupported TTS engine: %s' % (tts_type, ))
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+
+from alex.components.tts import TTSInterface
+
+
+class StubTTS(TTSInterface):
+    """Replaces a network TTS service (e.g. Google TTS) in benchmarks, so that they do not depend on the network.
+
+    The synthesis takes as long as a request to the service and it returns a quiet tone which is as long as the
+    text would be spoken. The tone is not a silence, because the silence would be removed by the TTS component.
+
+    """
+
+    def __init__(self, cfg):
+        super(StubTTS, self).__init__(cfg)
+        self.latency = self.cfg['TTS']['Stub']['latency']
+        self.char_duration = self.cfg['TTS']['Stub']['char_duration']
+
+    def synthesize(self, text):
+        time.sleep(self.latency)
+
+        n_samples = int(len(text) * self.char_duration * self.cfg['Audio']['sample_rate'])
+        # the samples 1024, -1024, ... in the 16 bit little endian PCM
+        return b'\x00\x04\x00\xfc' * (n_samples / 2)
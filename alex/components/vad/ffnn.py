@@ -3,14 +3,11 @@
 
 from collections import deque
 import numpy as np
-from scipy.misc import logsumexp
-import struct
-
-from math import log
 
 from alex.components.asr.exceptions import ASRException
 from alex.ml.ffnn import FFNN
 from alex.utils.mfcc import MFCCFrontEnd
+from alex.utils.ringbuffer import RingBuffer
 
 
 class FFNNVAD():
@@ -22,13 +19,13 @@ class FFNNVAD():
     def __init__(self, cfg):
         self.cfg = cfg
 
-        self.audio_recorded_in = []
+        self.audio_recorded_in = RingBuffer()
 
         self.ffnn = FFNN()
         self.ffnn.load(self.cfg['VAD']['ffnn']['model'])
 
+        # log posterior probabilities of speech for the last frames
         self.log_probs_speech = deque(maxlen=self.cfg['VAD']['ffnn']['filter_length'])
-        self.log_probs_sil = deque(maxlen=self.cfg['VAD']['ffnn']['filter_length'])
 
         self.last_decision = 0.0
 
@@ -53,30 +50,30 @@ class FFNNVAD():
         It returns 1.0 for 100% speech segment and 0.0 for 100% non speech segment.
         """
 
-        data = struct.unpack('%dh' % (len(data) / 2, ), data)
-        self.audio_recorded_in.extend(data)
-
-        while len(self.audio_recorded_in) > self.cfg['VAD']['ffnn']['framesize']:
-            frame = self.audio_recorded_in[:self.cfg['VAD']['ffnn']['framesize']]
-            self.audio_recorded_in = self.audio_recorded_in[self.cfg['VAD']['ffnn']['frameshift']:]
+        framesize = self.cfg['VAD']['ffnn']['framesize']
+        frameshift = self.cfg['VAD']['ffnn']['frameshift']
 
-            mfcc = self.front_end.param(frame)
+        self.audio_recorded_in.append(np.frombuffer(data, dtype=np.int16))
 
-            prob_sil, prob_speech = self.ffnn.predict(mfcc)
+        # a frame is processed only if there are more than framesize samples buffered from its start
+        n_frames = max(0, (len(self.audio_recorded_in) - framesize - 1) // frameshift + 1)
 
-            self.log_probs_speech.append(log(prob_speech))
-            self.log_probs_sil.append(log(prob_sil))
+        if n_frames:
+            signal = self.audio_recorded_in.peek((n_frames - 1) * frameshift + framesize)
+            self.audio_recorded_in.consume(n_frames * frameshift)
 
-            log_prob_speech_avg = 0.0
-            for log_prob_speech, log_prob_sil in zip(self.log_probs_speech, self.log_probs_sil):
-                log_prob_speech_avg += log_prob_speech - logsumexp([log_prob_speech, log_prob_sil])
-            log_prob_speech_avg /= len(self.log_probs_speech)
+            mfcc = self.front_end.param_batch(signal, frameshift)
 
-            prob_speech_avg = np.exp(log_prob_speech_avg)
+            prob = self.ffnn.predict(mfcc)
+            log_prob_speech = np.log(prob[:, 1])
+            log_prob_sil = np.log(prob[:, 0])
+            log_probs = log_prob_speech - np.logaddexp(log_prob_speech, log_prob_sil)
 
-#      print 'prob_speech_avg: %5.3f' % prob_speech_avg
+            # only the last filter_length frames contribute to the decision; the window is summed again, because
+            # a running sum would stay NaN forever after a frame with the log probability -inf left the window
+            self.log_probs_speech.extend(log_probs[-self.log_probs_speech.maxlen:])
 
-            self.last_decision = prob_speech_avg
+            self.last_decision = np.exp(sum(self.log_probs_speech) / len(self.log_probs_speech))
 
         # returns a speech / non-speech decisions
         return self.last_decision
@@ -3,12 +3,11 @@
 
 from collections import deque
 import numpy as np
-from scipy.misc import logsumexp
-import struct
 
 from alex.components.asr.exceptions import ASRException
 from alex.ml.gmm import GMM
 from alex.utils.mfcc import MFCCFrontEnd
+from alex.utils.ringbuffer import RingBuffer
 
 
 class GMMVAD():
@@ -20,15 +19,15 @@ class GMMVAD():
     def __init__(self, cfg):
         self.cfg = cfg
 
-        self.audio_recorded_in = []
+        self.audio_recorded_in = RingBuffer()
 
         self.gmm_speech = GMM()
         self.gmm_speech.load_model(self.cfg['VAD']['gmm']['speech_model'])
         self.gmm_sil = GMM()
         self.gmm_sil.load_model(self.cfg['VAD']['gmm']['sil_model'])
 
+        # log posterior probabilities of speech for the last frames
         self.log_probs_speech = deque(maxlen=self.cfg['VAD']['gmm']['filter_length'])
-        self.log_probs_sil = deque(maxlen=self.cfg['VAD']['gmm']['filter_length'])
 
         self.last_decision = 0.0
 
@@ -53,31 +52,29 @@ class GMMVAD():
         It returns 1.0 for 100% speech segment and 0.0 for 100% non speech segment.
         """
 
-        data = struct.unpack('%dh' % (len(data) / 2, ), data)
-        self.audio_recorded_in.extend(data)
+        framesize = self.cfg['VAD']['gmm']['framesize']
+        frameshift = self.cfg['VAD']['gmm']['frameshift']
 
-        while len(self.audio_recorded_in) > self.cfg['VAD']['gmm']['framesize']:
-            frame = self.audio_recorded_in[:self.cfg['VAD']['gmm']['framesize']]
-            self.audio_recorded_in = self.audio_recorded_in[self.cfg['VAD']['gmm']['frameshift']:]
+        self.audio_recorded_in.append(np.frombuffer(data, dtype=np.int16))
 
-            mfcc = self.front_end.param(frame)
+        # a frame is processed only if there are more than framesize samples buffered from its start
+        n_frames = max(0, (len(self.audio_recorded_in) - framesize - 1) // frameshift + 1)
 
-            log_prob_speech = self.gmm_speech.score(mfcc)
-            log_prob_sil = self.gmm_sil.score(mfcc)
-
-            self.log_probs_speech.append(log_prob_speech)
-            self.log_probs_sil.append(log_prob_sil)
+        if n_frames:
+            signal = self.audio_recorded_in.peek((n_frames - 1) * frameshift + framesize)
+            self.audio_recorded_in.consume(n_frames * frameshift)
 
-            log_prob_speech_avg = 0.0
-            for log_prob_speech, log_prob_sil in zip(self.log_probs_speech, self.log_probs_sil):
-                log_prob_speech_avg += log_prob_speech - logsumexp([log_prob_speech, log_prob_sil])
-            log_prob_speech_avg /= len(self.log_probs_speech)
+            mfcc = self.front_end.param_batch(signal, frameshift)
 
-            prob_speech_avg = np.exp(log_prob_speech_avg)
+            log_prob_speech = self.gmm_speech.score(mfcc)
+            log_prob_sil = self.gmm_sil.score(mfcc)
+            log_probs = log_prob_speech - np.logaddexp(log_prob_speech, log_prob_sil)
 
-#      print 'prob_speech_avg: %5.3f' % prob_speech_avg
+            # only the last filter_length frames contribute to the decision; the window is summed again, because
+            # a running sum would stay NaN forever after a frame with the log probability -inf left the window
+            self.log_probs_speech.extend(log_probs[-self.log_probs_speech.maxlen:])
 
-            self.last_decision = prob_speech_avg
+            self.last_decision = np.exp(sum(self.log_probs_speech) / len(self.log_probs_speech))
 
         # returns a speech / non-speech decisions
         return self.last_decision
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from collections import deque
+
+import numpy as np
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.components.vad.ffnn import FFNNVAD
+from alex.utils.ringbuffer import RingBuffer
+
+
+class FrontEnd(object):
+    """Returns one feature vector with the first sample of each frame, so that the test controls the features."""
+
+    def param_batch(self, signal, frameshift):
+        n_frames = (len(signal) - 4) // frameshift + 1
+        return signal[:n_frames * frameshift:frameshift].reshape(-1, 1).astype(np.float64)
+
+
+class Network(object):
+    """Predicts the probability of speech 0.0 for the frames with the feature 0, and 0.9 otherwise."""
+
+    def predict(self, features):
+        prob_speech = np.where(features[:, 0] == 0, 0.0, 0.9)
+        return np.column_stack([1.0 - prob_speech, prob_speech])
+
+
+class TestingFFNNVAD(FFNNVAD):
+    """FFNNVAD with the test front end and network instead of the MFCC front end and the trained model."""
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.audio_recorded_in = RingBuffer()
+        self.log_probs_speech = deque(maxlen=self.cfg['VAD']['ffnn']['filter_length'])
+        self.last_decision = 0.0
+        self.front_end = FrontEnd()
+        self.ffnn = Network()
+
+
+class TestFFNNVAD(unittest.TestCase):
+    filter_length = 3
+
+    def create_vad(self):
+        return TestingFFNNVAD({'VAD': {'ffnn': {'framesize': 4, 'frameshift': 2, 'filter_length': self.filter_length}}})
+
+    def decide_frame(self, vad, feature):
+        # one frame shift of samples, the first sample is the feature of the frame
+        return vad.decide(np.array([feature, 1], dtype=np.int16).tostring())
+
+    def test_zero_probability_frame(self):
+        vad = self.create_vad()
+        for i in range(self.filter_length):
+            self.decide_frame(vad, 1)
+
+        # the log probability of the frame is -inf, so the decision is 0.0 while the frame is in the window;
+        # the frames are decided with a delay, because a frame needs framesize samples
+        self.decide_frame(vad, 0)
+        for i in range(self.filter_length):
+            if vad.decide(b'') == 0.0:
+                break
+            self.decide_frame(vad, 1)
+        else:
+            self.fail('The frame with the zero probability of speech was not decided.')
+
+        for i in range(self.filter_length):
+            decision = self.decide_frame(vad, 1)
+
+        self.assertTrue(np.isfinite(decision))
+        self.assertAlmostEqual(decision, 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -52,8 +52,9 @@ class FFNN(object):
         return y
 
     def softmax(self, y):
-        ey = np.exp(y - y.max(axis=0))
-        y = ey / ey.sum(axis=0)
+        # the softmax is computed over the last axis, i.e. for each row of a 2-D input
+        ey = np.exp(y - y.max(axis=-1)[..., np.newaxis])
+        y = ey / ey.sum(axis=-1)[..., np.newaxis]
 
         # print ey
         # print np.sum(ey, axis = 0)
@@ -68,7 +69,7 @@ class FFNN(object):
          As it is output of a layer with softmax activation function, the output is a vector of probabilities of
            the classes being predicted.
 
-        :param input: input vector for the first NN layer.
+        :param input: input vector for the first NN layer, or a 2-D array with one input vector per row.
         :return: return the output of the last activation layer
         """
 
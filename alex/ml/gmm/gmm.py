@@ -7,6 +7,8 @@
 import numpy as np
 import cPickle as pickle
 
+from itertools import islice
+
 from sklearn.utils.extmath import logsumexp
 
 EPS = np.finfo(float).eps
@@ -14,19 +16,22 @@ EPS = np.finfo(float).eps
 
 class GMM:
     """This is a GMM model of the input data.
-    It is memory efficient so that it can process very large input array like objects.
+    It is memory efficient so that it can process very large input array like objects. The examples are processed in
+    chunks of chunk_size examples.
 
     The mixtures are incrementally added by splitting the heaviest component in two components and
     perturbation of the original mean.
 
     """
 
-    def __init__(self, n_features=1, n_components=1, thresh=1e-3, min_covar=1e-3, n_iter=1):
+    def __init__(self, n_features=1, n_components=1, thresh=1e-3, min_covar=1e-3, n_iter=1, chunk_size=10000):
         self.n_features = n_features
         self.n_components = n_components
         self.thresh = thresh
         self.min_covar = min_covar
         self.n_iter = n_iter
+        # the number of examples processed at once by fit
+        self.chunk_size = chunk_size
 
         self.weights = np.ones(self.n_components) / self.n_components
         self.means = np.zeros((self.n_components, self.n_features))
@@ -41,40 +46,63 @@ class GMM:
         return '\n'.join(s)
 
     def log_multivariate_normal_density_diag(self, x, means=0.0, covars=1.0):
-        """Compute Gaussian log-density at X for a diagonal model"""
-        s, n_dim = x.shape
+        """Compute Gaussian log-density at X for a diagonal model.
 
-        lpr = - 0.5 * (n_dim * np.log(2 * np.pi) + np.sum(
-            np.log(covars), 1)) - 0.5 * np.sum(((x - means) ** 2 / covars), 1)
+        :param x: an array of shape (n_samples, n_features)
+        :return: an array of shape (n_samples, n_components)
+        """
+        n_samples, n_dim = x.shape
 
-#    print "m", means
-#    print "c", covars
-#    print "lm", - 0.5* np.sum(((x - means) ** 2) / covars)
+        lpr = - 0.5 * (n_dim * np.log(2 * np.pi) + np.sum(np.log(covars), 1)
+                       + np.sum((means ** 2) / covars, 1)
+                       - 2 * np.dot(x, (means / covars).T)
+                       + np.dot(x ** 2, (1.0 / covars).T))
 
         return lpr
 
     def expectation(self, x):
-        """ Evaluate one example
+        """ Evaluate the examples in the rows of x.
+
+        :return: the log probs of the examples and the responsibilities of the components for the examples
         """
         lpr = np.log(self.weights) + self.log_multivariate_normal_density_diag(
             x, self.means, self.covars)
 
-#    print "lpr", lpr
-        log_prob = logsumexp(lpr)
-        responsibilities = np.exp(lpr - log_prob)
+        log_prob = logsumexp(lpr, axis=1)
+        responsibilities = np.exp(lpr - log_prob[:, np.newaxis])
 
         return log_prob, responsibilities
 
     def score(self, x):
-        """Get the log prob of the x variable being generated by the mixture."""
-        x = x.reshape((1, len(x)))
+        """Get the log prob of the x variable being generated by the mixture.
+
+        If x is a 2-D array, the log probs of its rows are returned.
+        """
+        if x.ndim == 1:
+            return self.score(x[np.newaxis, :])[0]
 
         lpr = np.log(self.weights) + self.log_multivariate_normal_density_diag(
             x, self.means, self.covars)
-        log_prob = logsumexp(lpr)
+        log_prob = logsumexp(lpr, axis=1)
 
         return log_prob
 
+    def iter_chunks(self, X):
+        """Splits X into 2-D arrays of at most chunk_size examples.
+
+        X can be an array or any iterable of examples, e.g. a list of 1-D arrays.
+        """
+        if isinstance(X, np.ndarray):
+            for i in xrange(0, len(X), self.chunk_size):
+                yield X[i:i + self.chunk_size]
+        else:
+            it = iter(X)
+            while True:
+                chunk = list(islice(it, self.chunk_size))
+                if not chunk:
+                    break
+                yield np.array(chunk)
+
     def mixup(self, n_new_mixies):
         """Add n new mixies to the mixture."""
 
@@ -124,39 +152,22 @@ class GMM:
             acc_means = np.zeros((self.n_components, self.n_features))
             acc_covars = np.zeros((self.n_components, self.n_features))
 
-            for x in X:
-                x_m = x.reshape((1, len(x)))
+            for x in self.iter_chunks(X):
                 #expectation
-                log_prob_x, responsibilities = self.expectation(x_m)
-
-#        print x
-#        print "r", responsibilities
+                log_prob_x, responsibilities = self.expectation(x)
 
                 # maximisation
-                acc_weights += responsibilities
-
-                # make a column matrix from it
-                responsibilities = responsibilities[:, np.newaxis]
-
-#        print responsibilities
-
-                acc_means += np.dot(responsibilities, x_m)
-
-#        print (x_m - self.means)**2
-
-#        print "r", responsibilities.T
-#        print "d", x_m - self.means
-#        print "d**2", (x_m - self.means)**2
-#        print "ac", responsibilities * (x_m - self.means)**2
-
-                acc_covars += responsibilities * (x_m - self.means) ** 2
+                resp_sum = responsibilities.sum(axis=0)
+                resp_x = np.dot(responsibilities.T, x)
 
-                log_prob += log_prob_x
-                n += 1
+                acc_weights += resp_sum
+                acc_means += resp_x
+                # sum_i r_ik * (x_i - mean_k) ** 2
+                acc_covars += np.dot(responsibilities.T, x ** 2) - 2 * self.means * resp_x + \
+                    self.means ** 2 * resp_sum[:, np.newaxis]
 
-#        print "LP", log_prob_x
-#        if n > 100000:
-#          break
+                log_prob += log_prob_x.sum()
+                n += len(x)
 
             self.log_probs.append(log_prob / n)
 
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import numpy as np
+
+from alex.ml.gmm import GMM
+
+
+class TestGMM(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.X = np.vstack([rng.randn(300, 3) * 2 + 3, rng.randn(200, 3) - 1])
+
+    def test_score_batch(self):
+        gmm = GMM(n_features=3, n_components=2)
+        gmm.means = np.array([[3.0, 3.0, 3.0], [-1.0, -1.0, -1.0]])
+        gmm.covars = np.array([[4.0, 4.0, 4.0], [1.0, 1.0, 1.0]])
+
+        scores = gmm.score(self.X[:10])
+        self.assertEqual(scores.shape, (10, ))
+        for x, score in zip(self.X[:10], scores):
+            # the log density of the mixture evaluated directly
+            densities = np.exp(-0.5 * np.sum((x - gmm.means) ** 2 / gmm.covars, 1)) / \
+                np.sqrt(np.prod(2 * np.pi * gmm.covars, 1))
+            self.assertAlmostEqual(gmm.score(x), np.log(np.dot(gmm.weights, densities)))
+            self.assertAlmostEqual(gmm.score(x), score)
+
+    def test_fit_chunks(self):
+        # the result must not depend on how the data are split into chunks, or whether they are a list or an array
+        gmms = []
+        for X, chunk_size in [(self.X, 10000), (self.X, 7), (list(self.X), 64)]:
+            gmm = GMM(n_features=3, n_components=1, n_iter=3, chunk_size=chunk_size)
+            np.random.seed(1)
+            gmm.fit(X)
+            gmm.mixup(1)
+            gmm.fit(X)
+            gmms.append(gmm)
+
+        for gmm in gmms[1:]:
+            self.assertTrue(np.allclose(gmm.weights, gmms[0].weights))
+            self.assertTrue(np.allclose(gmm.means, gmms[0].means))
+            self.assertTrue(np.allclose(gmm.covars, gmms[0].covars))
+            self.assertAlmostEqual(gmm.log_probs[-1], gmms[0].log_probs[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
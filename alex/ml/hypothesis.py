@@ -38,6 +38,12 @@ class NBList(Hypothesis):
     1. add utterances or parse a confusion network
     2. merge and normalise, in either order
 
+    The hypotheses are indexed by their keys (see `hyp_key') so that merging,
+    membership tests and probability lookups do not have to scan the list.
+    The index is rebuilt lazily whenever the list may have been changed from
+    outside (the `n_best' attribute is assigned or an item is accessed by its
+    index). Facts must not be modified in place otherwise.
+
     """
     # NOTE the class invariant: self.n_best is always sorted from the most to
     # the least probable hypothesis.
@@ -56,15 +62,57 @@ class NBList(Hypothesis):
         return len(self.n_best)
 
     def __getitem__(self, i):
+        # The caller can replace the fact in the returned hypothesis.
+        self._index = None
         return self.n_best[i]
 
     def __iter__(self):
         for hyp in self.n_best:
             yield hyp
 
+    def __contains__(self, fact):
+        return self.hyp_key(fact) in self.index
+
     def __cmp__(self, other):
         return (self.n_best >= other.n_best) - (other.n_best >= self.n_best)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_index'] = None
+        return state
+
+    def __setstate__(self, state):
+        # Objects pickled before the index was introduced.
+        if 'n_best' in state:
+            state['_n_best'] = state.pop('n_best')
+        self.__dict__.update(state)
+        self._index = None
+
+    @property
+    def n_best(self):
+        return self._n_best
+
+    @n_best.setter
+    def n_best(self, n_best):
+        self._n_best = n_best
+        self._index = None
+
+    @property
+    def index(self):
+        """A dictionary mapping hypothesis keys to the lists of the
+        [prob, fact] hypotheses with that key."""
+        if self._index is None:
+            index = {}
+            for hyp in self._n_best:
+                index.setdefault(self.hyp_key(hyp[1]), []).append(hyp)
+            self._index = index
+        return self._index
+
+    def hyp_key(self, fact):
+        """Returns a hashable key identifying the fact, i.e. two facts are the
+        same hypothesis iff their keys are equal."""
+        return fact
+
     @classmethod
     def from_fact(cls, fact):
         # Create a new object of our class.
@@ -77,6 +125,12 @@ class NBList(Hypothesis):
         """Returns the most probable value of the object."""
         return self.n_best[0][1]
 
+    def get_prob(self, fact):
+        """Returns the probability of the fact, or 0.0 if it is not in the
+        list.  If the list has not been merged yet, the probabilities of all
+        occurrences of the fact are summed up."""
+        return sum(hyp[0] for hyp in self.index.get(self.hyp_key(fact), ()))
+
     def add(self, probability, fact):
         """\
         Finds the last hypothesis with a lower probability and inserts the
@@ -84,13 +138,17 @@ class NBList(Hypothesis):
         highest probability ones to the lowest probability ones.
 
         """
-        insert_idx = len(self.n_best)
+        n_best = self._n_best
+        insert_idx = len(n_best)
         while insert_idx > 0:
             insert_idx -= 1
-            if probability <= self.n_best[insert_idx][0]:
+            if probability <= n_best[insert_idx][0]:
                 insert_idx += 1
                 break
-        self.n_best.insert(insert_idx, [probability, fact])
+        hyp = [probability, fact]
+        n_best.insert(insert_idx, hyp)
+        if self._index is not None:
+            self._index.setdefault(self.hyp_key(fact), []).append(hyp)
         return self
 
     def merge(self):
@@ -98,26 +156,27 @@ class NBList(Hypothesis):
         if len(self.n_best) <= 1:
             return
         else:
-            new_n_best = self.n_best[:1]
-
-            for cur_idx in xrange(1, len(self.n_best)):
-                cur_hyp = self.n_best[cur_idx]
-                for new_idx, new_hyp in enumerate(new_n_best):
-                    if new_hyp[1] == cur_hyp[1]:
-                        # Merge, add the probabilities.
-                        new_hyp[0] += cur_hyp[0]
-                        break
+            new_n_best = []
+            index = {}
+
+            for cur_hyp in self.n_best:
+                key = self.hyp_key(cur_hyp[1])
+                if key in index:
+                    # Merge, add the probabilities.
+                    index[key][0][0] += cur_hyp[0]
                 else:
+                    index[key] = [cur_hyp]
                     new_n_best.append(cur_hyp)
 
         self.n_best = sorted(new_n_best, reverse=True)
+        self._index = index
         return self
 
     def normalise(self):
         """Scales the list to sum to one."""
         tot = float(sum(p for p, fact in self.n_best))
-        for hyp_idx in xrange(len(self.n_best)):
-            self.n_best[hyp_idx][0] /= tot
+        for hyp in self.n_best:
+            hyp[0] /= tot
         return self
 
     def add_other(self, other):
@@ -128,25 +187,20 @@ class NBList(Hypothesis):
         Returns self.
 
         """
-        tot = 0.0
-        other_idx = -1
-        for hyp_idx in range(len(self.n_best)):
-            tot += self.n_best[hyp_idx][0]
-
-            if self.n_best[hyp_idx][1] == other:
-                if other_idx != -1:
-                    raise NBListException(
-                        'N-best list includes multiple "other" objects: '
-                        '{nb!s}'.format(nb=self.n_best))
-                other_idx = hyp_idx
+        tot = sum(hyp[0] for hyp in self.n_best)
+        other_hyps = self.index.get(self.hyp_key(other), ())
+        if len(other_hyps) > 1:
+            raise NBListException(
+                'N-best list includes multiple "other" objects: '
+                '{nb!s}'.format(nb=self.n_best))
 
         # If `other' is absent,
-        if other_idx == -1:
+        if not other_hyps:
             if tot > 1.0:
                 # Be tolerant.
                 if tot <= 1. + self.tolerance_over1:
-                    for hyp_idx in range(len(self.n_best)):
-                        self.n_best[hyp_idx][0] /= tot
+                    for hyp in self.n_best:
+                        hyp[0] /= tot
                     return self
                 else:
                     raise NBListException(
@@ -154,12 +208,14 @@ class NBList(Hypothesis):
                         '{s:8.6f}'.format(s=tot))
             # Append the `other' object.
             prob_other = 1.0 - tot
-            self.n_best.append([prob_other, other])
+            hyp = [prob_other, other]
+            self.n_best.append(hyp)
+            self.index[self.hyp_key(other)] = [hyp]
         # If `other' was present,
         else:
             # Just normalise the probs.
-            for hyp_idx in range(len(self.n_best)):
-                self.n_best[hyp_idx][0] /= tot
+            for hyp in self.n_best:
+                hyp[0] /= tot
 
         return self
 
@@ -170,6 +226,10 @@ class ConfusionNetwork(Hypothesis):
     Confusion network.  In this representation, each fact breaks down into
     a sequence of elementary acts.
 
+    The elementary acts are indexed the same way as the hypotheses in
+    `NBList', i.e. the index is rebuilt lazily after the `cn' attribute is
+    assigned or an item is accessed by its index.
+
     """
     def __init__(self):
         self.cn = list()
@@ -185,6 +245,8 @@ class ConfusionNetwork(Hypothesis):
         return len(self.cn)
 
     def __getitem__(self, i):
+        # The caller can replace the fact in the returned item.
+        self._index = None
         return self.cn[i]
 
     def __contains__(self, fact):
@@ -194,9 +256,50 @@ class ConfusionNetwork(Hypothesis):
         for fact in self.cn:
             yield fact
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_index'] = None
+        return state
+
+    def __setstate__(self, state):
+        # Objects pickled before the index was introduced.
+        if 'cn' in state:
+            state['_cn'] = state.pop('cn')
+        self.__dict__.update(state)
+        self._index = None
+
+    @property
+    def cn(self):
+        return self._cn
+
+    @cn.setter
+    def cn(self, cn):
+        self._cn = cn
+        self._index = None
+
+    @property
+    def index(self):
+        """A dictionary mapping the elementary acts to their first
+        [prob, fact] item in the network."""
+        if self._index is None:
+            index = {}
+            for item in self._cn:
+                index.setdefault(item[1], item)
+            self._index = index
+        return self._index
+
     def add(self, probability, fact):
         """Append a fact to the confusion network."""
-        self.cn.append([probability, fact])
+        item = [probability, fact]
+        self._cn.append(item)
+        if self._index is not None:
+            self._index.setdefault(fact, item)
+
+    def get_marginal(self, fact):
+        """Returns the probability of the elementary act, or None if it is
+        not in the network."""
+        item = self.index.get(fact)
+        return item[0] if item is not None else None
 
     @classmethod
     def from_fact(cls, fact):
@@ -208,5 +311,5 @@ class ConfusionNetwork(Hypothesis):
         # Create a new object of our class.
         inst = cls()
         # Add the fact as the only hypothesis to the network.
-        inst.cn.extend([1., efact] for efact in fact)
+        inst.cn = [[1., efact] for efact in fact]
         return inst
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import autopath
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from alex.components.hub.calldb import CallDB, SQLiteCallDB
+
+
+def generate_calls(num_calls, num_uris, period):
+    """Returns a dictionary of a pickled CallDB with the calls spread over the last ten periods."""
+    now = time.time()
+    calls = {}
+    for i in xrange(num_calls):
+        s = now - random.random() * 10 * period
+        l = random.expovariate(1 / 120.0)
+        calls.setdefault('sip:%d@example.com' % random.randrange(num_uris), []).append([s, s + l, l])
+
+    for uri_calls in calls.itervalues():
+        uri_calls.sort()
+
+    return calls
+
+
+def measure(db, uris, repeat):
+    """Returns the mean time in seconds of a stats lookup and of tracking a call."""
+    t = time.time()
+    for i in xrange(repeat):
+        db.get_uri_stats(random.choice(uris))
+    lookup_time = (time.time() - t) / repeat
+
+    t = time.time()
+    for i in xrange(repeat):
+        uri = random.choice(uris)
+        db.track_confirmed_call(uri)
+        db.track_disconnected_call(uri)
+    track_time = (time.time() - t) / repeat
+
+    return lookup_time, track_time
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="""
+    Compares the pickled CallDB and SQLiteCallDB on a database of random calls. It reports the mean times of
+    get_uri_stats and of tracking a confirmed and disconnected call, which VoipHub does for every incoming call.
+      """)
+
+    parser.add_argument('--calls', type=int, default=1000000, help='the number of recorded calls')
+    parser.add_argument('--uris', type=int, default=10000, help='the number of remote URIs')
+    parser.add_argument('--repeat', type=int, default=20, help='the number of measured lookups and calls')
+    args = parser.parse_args()
+
+    cfg = {'VoipHub': {'short_calls_time_duration': 7}}
+    period = 48 * 60 * 60
+    calls = generate_calls(args.calls, args.uris, period)
+    uris = calls.keys()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db = CallDB(cfg, os.path.join(tmp_dir, 'call_db.pckl'), period)
+        db.open_database()
+        db.close_database(dict(calls_from_start_end_length=calls))
+        print 'CallDB:       lookup %8.3f ms  track %8.3f ms' % tuple(1000 * t for t in measure(db, uris, args.repeat))
+
+        db = SQLiteCallDB(cfg, os.path.join(tmp_dir, 'call_db.sqlite'), period)
+        db.import_calls(calls)
+        print 'SQLiteCallDB: lookup %8.3f ms  track %8.3f ms' % tuple(1000 * t for t in measure(db, uris, args.repeat))
+        db.close()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
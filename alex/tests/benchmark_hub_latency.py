@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import autopath
+
+import argparse
+import multiprocessing
+import os
+import time
+
+from alex.utils.mproc import CloseEvent, Reactor
+
+
+class Stage(Reactor):
+    """A hub component which forwards every input message to its output after a fixed processing time."""
+
+    def __init__(self, cfg, commands, data_in, data_out, close_event, processing_time):
+        Reactor.__init__(self)
+
+        self.cfg = cfg
+        self.commands = commands
+        self.data_in = data_in
+        self.data_out = data_out
+        self.close_event = close_event
+        self.processing_time = processing_time
+
+    def get_input_connections(self):
+        return [self.commands, self.data_in]
+
+    def run(self):
+        while 1:
+            if self.close_event.is_set():
+                return
+
+            self.wait_for_input()
+
+            while self.commands.poll():
+                if self.commands.recv() == 'stop':
+                    return
+
+            if self.data_in.poll():
+                msg = self.data_in.recv()
+                if self.processing_time:
+                    time.sleep(self.processing_time)
+                self.data_out.send(msg)
+
+
+def get_cpu_time(pids):
+    """Returns the user + system CPU time in seconds consumed so far by the processes."""
+    total = 0
+    for pid in pids:
+        with open('/proc/%d/stat' % pid) as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        total += int(fields[11]) + int(fields[12])
+    return float(total) / os.sysconf(os.sysconf_names['SC_CLK_TCK'])
+
+
+def benchmark(event_driven, n_stages, n_turns, processing_time, sleep_time, idle_time):
+    cfg = {'Hub': {'event_driven': event_driven, 'main_loop_sleep_time': sleep_time}}
+    close_event = CloseEvent()
+
+    first_out, data_in = multiprocessing.Pipe()
+    stages = []
+    for i in range(n_stages):
+        commands, child_commands = multiprocessing.Pipe()
+        data_out, next_in = multiprocessing.Pipe()
+        stages.append((commands, Stage(cfg, child_commands, data_in, data_out, close_event, processing_time)))
+        data_in = next_in
+    last_in = data_in
+
+    for commands, stage in stages:
+        stage.start()
+    pids = [stage.pid for commands, stage in stages]
+
+    # warm up
+    first_out.send(time.time())
+    last_in.recv()
+
+    latencies = []
+    for i in range(n_turns):
+        first_out.send(time.time())
+        latencies.append(time.time() - last_in.recv())
+        # leave the pipeline idle for a while as between the turns of a dialogue
+        time.sleep(0.01)
+
+    cpu = get_cpu_time(pids)
+    time.sleep(idle_time)
+    idle_cpu = (get_cpu_time(pids) - cpu) / idle_time
+
+    close_event.set()
+    for commands, stage in stages:
+        stage.join()
+
+    latencies.sort()
+    return latencies, idle_cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="""
+    Measures the latency of a turn passing through a pipeline of hub components (e.g. VAD, ASR, SLU, DM, NLG, TTS)
+    connected by multiprocessing pipes. The components wait for the input either by sleeping and polling
+    (cfg['Hub']['event_driven'] = False) or by blocking on their connections (cfg['Hub']['event_driven'] = True).
+
+    The CPU time consumed by all components when there is no input is reported as well.
+      """)
+
+    parser.add_argument('--stages', type=int, default=6, help='the number of components in the pipeline')
+    parser.add_argument('--turns', type=int, default=200, help='the number of turns passed through the pipeline')
+    parser.add_argument('--processing-time', type=float, default=0.0,
+                        help='the time each component spends processing a message in seconds')
+    parser.add_argument('--sleep-time', type=float, default=0.001, help='main_loop_sleep_time in seconds')
+    parser.add_argument('--idle-time', type=float, default=2.0, help='how long to measure the idle CPU usage')
+    args = parser.parse_args()
+
+    print "Stages: {s}, turns: {t}, processing time: {p:.4f} s, main_loop_sleep_time: {st:.4f} s".format(
+        s=args.stages, t=args.turns, p=args.processing_time, st=args.sleep_time)
+    print "-" * 80
+    print "{l:15s} {mean:>10s} {med:>10s} {p95:>10s} {max:>10s} {cpu:>10s}".format(
+        l='Main loop', mean='mean [ms]', med='median', p95='95%', max='max', cpu='idle CPU')
+
+    for label, event_driven in [('sleep + poll', False), ('event driven', True)]:
+        latencies, idle_cpu = benchmark(event_driven, args.stages, args.turns, args.processing_time,
+                                        args.sleep_time, args.idle_time)
+        print "{l:15s} {mean:10.3f} {med:10.3f} {p95:10.3f} {max:10.3f} {cpu:9.1f}%".format(
+            l=label,
+            mean=1000 * sum(latencies) / len(latencies),
+            med=1000 * latencies[len(latencies) / 2],
+            p95=1000 * latencies[int(0.95 * len(latencies))],
+            max=1000 * latencies[-1],
+            cpu=100 * idle_cpu)
+
+
+if __name__ == '__main__':
+    main()
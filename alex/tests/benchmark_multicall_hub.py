@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import autopath
+
+import argparse
+import collections
+import fnmatch
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import xml.dom.minidom
+import Queue
+
+from alex.applications.mvhub import MultiVoipHub
+from alex.components.hub.replayio import ReplayIO
+from alex.components.hub.trace import Tracer
+from alex.utils.config import Config
+
+
+def find_recorded_calls(paths):
+    """
+    Returns the recorded calls in the paths.
+
+    The directories are searched for the call logs (the session.xml files) and for the all-*.recorded.wav files in the
+    directories without a call log.
+    """
+    calls = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in sorted(os.walk(path)):
+                if 'session.xml' in files:
+                    calls.append(os.path.join(root, 'session.xml'))
+                else:
+                    calls.extend(os.path.join(root, f) for f in sorted(fnmatch.filter(files, 'all-*.recorded.wav')))
+        else:
+            calls.append(path)
+    return calls
+
+
+def get_logged_utterances(calls):
+    """Returns the best ASR hypotheses of the user turns in the call logs by the file names of the calls."""
+    utterances = {}
+    for file_name in calls:
+        if not file_name.endswith('.xml'):
+            continue
+
+        utterances[file_name] = []
+        doc = xml.dom.minidom.parse(file_name)
+        for turn in doc.getElementsByTagName("turn"):
+            if turn.getAttribute("speaker") != "user":
+                continue
+
+            hyps = turn.getElementsByTagName("hypothesis")
+            if hyps and hyps[0].firstChild is not None:
+                utterances[file_name].append(hyps[0].firstChild.data.strip())
+            else:
+                utterances[file_name].append('_other_')
+    return utterances
+
+
+def replayio_factory(calls, speed):
+    def factory(cfg, slot, commands, audio_record, audio_play, close_event):
+        replayed_call = None
+        if isinstance(cfg['ASR']['Stub']['utterances'], dict):
+            # the stub ASR of the slot recognizes the logged hypotheses of the call replayed in the slot
+            replayed_call = multiprocessing.Array('c', 4096)
+            cfg['ASR'] = dict(cfg['ASR'], Stub=dict(cfg['ASR']['Stub'], replayed_call=replayed_call))
+
+        return ReplayIO(cfg, commands, audio_record, audio_play, close_event, calls, speed, replayed_call)
+    return factory
+
+
+class ProcessMonitor(object):
+    """Samples the CPU time and the resident memory of a process and all its descendants from /proc."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self.clock_ticks = float(os.sysconf('SC_CLK_TCK'))
+
+        # the last CPU time of every process, the processes which have exited are counted as well
+        self.cpu_times = {}
+        # (the number of finished calls, the resident memory of the processes by their names)
+        self.samples = []
+
+    def get_processes(self):
+        """Returns the name, the parent, the CPU time and the resident memory of all processes by their PIDs."""
+        processes = {}
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit():
+                continue
+
+            try:
+                with open('/proc/%s/stat' % pid) as f:
+                    stat = f.read()
+            except IOError:
+                # the process has just exited
+                continue
+
+            name = stat[stat.index('(') + 1:stat.rindex(')')]
+            fields = stat.rsplit(')', 1)[1].split()
+            processes[int(pid)] = (name, int(fields[1]), (int(fields[11]) + int(fields[12])) / self.clock_ticks,
+                                   int(fields[21]) * self.page_size)
+        return processes
+
+    def sample(self, n_calls):
+        processes = self.get_processes()
+
+        children = collections.defaultdict(list)
+        for pid, (name, ppid, cpu_time, rss) in processes.iteritems():
+            children[ppid].append(pid)
+
+        memory = collections.defaultdict(int)
+        pids = [self.pid] if self.pid in processes else []
+        while pids:
+            pid = pids.pop()
+            name, ppid, cpu_time, rss = processes[pid]
+            self.cpu_times[pid] = (name, cpu_time)
+            memory[name] += rss
+            pids.extend(children[pid])
+
+        self.samples.append((n_calls, memory))
+
+    def cpu_time_by_name(self):
+        cpu_times = collections.defaultdict(float)
+        for name, cpu_time in self.cpu_times.itervalues():
+            cpu_times[name] += cpu_time
+        return cpu_times
+
+
+def percentile(values, p):
+    """Returns the p-th percentile of the sorted values."""
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="""
+    Benchmarks the hub offline, without any SIP stack. MultiVoipHub runs the real VAD, ASR, SLU, DM, NLG and TTS
+    components, and every call slot gets a ReplayIO component instead of VoipIO, which replays recorded calls in real
+    time. The recorded calls are the call logs (directories with the session.xml files and the recordings of the user
+    turns) or wave files (e.g. the all-*.recorded.wav files). They are repeated until the requested number of calls is
+    finished.
+
+    The ASR and TTS network services can be replaced by stubs with a fixed latency (see alex.components.asr.stub and
+    alex.components.tts.stub); the stub ASR recognizes the logged ASR hypotheses of the user turns of the replayed
+    call in turn ('_other_' in the calls without a call log).
+
+    The benchmark reports:
+      - the throughput of the hub,
+      - the response times of the system (from the end of the user speech detected by VAD to the start of the system
+        prompt) and the latencies of the components (see alex.components.hub.trace),
+      - the CPU time per call of the hub and all its processes,
+      - the growth of their resident memory from the end of the first call, i.e. after all components warmed up.
+
+    The call database and the limits of calls are replaced, so that the repeated calls are not rejected.
+
+    The program reads the default config in the resources directory ('../resources/default.cfg') and all config files
+    passed as an argument of a '-c'. They must configure the VAD, ASR, SLU, DM, NLG and TTS components.
+      """)
+
+    parser.add_argument('-c', '--configs', nargs='+', help='additional configuration files')
+    parser.add_argument('--calls', type=int, default=20, help='the number of calls')
+    parser.add_argument('--slots', type=int, default=4, help='the number of concurrent calls')
+    parser.add_argument('--speed', type=float, default=1.0, help='how many times faster than real time the calls are')
+    parser.add_argument('--timeout', type=float, default=600.0,
+                        help='the maximal time in seconds to wait for a call to finish')
+    parser.add_argument('--stub-asr', action='store_true', help='replace the ASR by the stub ASR')
+    parser.add_argument('--stub-tts', action='store_true', help='replace the TTS by the stub TTS')
+    parser.add_argument('--no-trace', action='store_true', help='do not trace the latencies of the components')
+    parser.add_argument('--sample-period', type=float, default=1.0,
+                        help='how often the CPU time and the memory are sampled, in seconds')
+    parser.add_argument('recordings', nargs='+', help='call logs, wave files or directories with the recorded calls')
+    args = parser.parse_args()
+
+    cfg = Config.load_configs(args.configs)
+    cfg['MultiVoipHub']['max_calls'] = args.slots
+
+    recorded_calls = find_recorded_calls(args.recordings)
+    if not recorded_calls:
+        parser.error('No recorded calls were found.')
+
+    if args.stub_asr:
+        cfg['ASR']['type'] = 'Stub'
+        cfg['ASR']['Stub']['utterances'] = get_logged_utterances(recorded_calls)
+    if args.stub_tts:
+        cfg['TTS']['type'] = 'Stub'
+    if not args.no_trace:
+        cfg['Logging']['tracer'] = Tracer()
+
+    call_db_dir = tempfile.mkdtemp()
+    cfg['VoipHub']['call_db'] = os.path.join(call_db_dir, 'call_db.sqlite')
+    for limit in ['last_period_max_num_calls', 'last_period_max_total_time', 'last_period_max_num_short_calls']:
+        cfg['VoipHub'][limit] = float('inf')
+
+    calls = multiprocessing.Queue()
+    for i in range(args.calls):
+        calls.put(recorded_calls[i % len(recorded_calls)])
+
+    call_stats = multiprocessing.Queue()
+    hub = MultiVoipHub(cfg, io_factory=replayio_factory(calls, args.speed), call_stats=call_stats)
+    hub_process = multiprocessing.Process(target=hub.run)
+
+    start = time.time()
+    hub_process.start()
+    monitor = ProcessMonitor(hub_process.pid)
+
+    results = []
+    try:
+        last_call_time = time.time()
+        while len(results) < args.calls and hub_process.is_alive():
+            try:
+                results.append(call_stats.get(timeout=args.sample_period))
+                last_call_time = time.time()
+            except Queue.Empty:
+                if last_call_time + args.timeout < time.time():
+                    print 'No call finished in %0.1f s.' % args.timeout
+                    break
+
+            monitor.sample(len(results))
+    finally:
+        wall_time = time.time() - start
+        hub.close_event.set()
+        hub_process.join()
+        shutil.rmtree(call_db_dir)
+
+    response_times = sorted(t for stats in results for t in stats['response_times'])
+    call_time = sum(stats['duration'] for stats in results)
+
+    print "Slots: {s}, calls: {c}, speed: {sp:.1f}x, recorded calls: {r}, ASR: {asr}, TTS: {tts}".format(
+        s=args.slots, c=args.calls, sp=args.speed, r=len(recorded_calls), asr=cfg['ASR']['type'],
+        tts=cfg['TTS']['type'])
+    print "-" * 80
+    print "Finished calls:           {n}".format(n=len(results))
+    print "Wall time (s):            {t:.1f}".format(t=wall_time)
+    print "Calls per minute:         {c:.2f}".format(c=60.0 * len(results) / wall_time)
+    print "Concurrent calls (mean):  {c:.2f}".format(c=call_time / wall_time)
+    print "Turns:                    {t}".format(t=sum(stats['turns'] for stats in results))
+
+    if response_times:
+        print "-" * 80
+        print "{l:15s} {mean:>10s} {med:>10s} {p90:>10s} {p95:>10s} {p99:>10s} {max:>10s}".format(
+            l='Response time', mean='mean [ms]', med='median', p90='90%', p95='95%', p99='99%', max='max')
+        print "{l:15s} {mean:10.3f} {med:10.3f} {p90:10.3f} {p95:10.3f} {p99:10.3f} {max:10.3f}".format(
+            l='',
+            mean=1000 * sum(response_times) / len(response_times),
+            med=1000 * percentile(response_times, 0.5),
+            p90=1000 * percentile(response_times, 0.9),
+            p95=1000 * percentile(response_times, 0.95),
+            p99=1000 * percentile(response_times, 0.99),
+            max=1000 * response_times[-1])
+
+    trace_reports = [stats['trace_report'] for stats in results if 'trace_report' in stats]
+    if trace_reports:
+        print
+        print trace_reports[-1]
+
+    if results:
+        # the memory at the end of the first call and at the end of the benchmark
+        first = min(i for i, (n_calls, memory) in enumerate(monitor.samples) if n_calls > 0)
+        n_calls = monitor.samples[-1][0] - monitor.samples[first][0]
+        memory_first = monitor.samples[first][1]
+        memory_last = monitor.samples[-1][1]
+        cpu_times = monitor.cpu_time_by_name()
+
+        print
+        print "{name:20s} {cpu:>12s} {cpu_s:>12s} {first:>12s} {last:>12s} {growth:>14s}".format(
+            name='Process', cpu='CPU/call [s]', cpu_s='CPU [%]', first='RSS 1st [MB]', last='RSS end [MB]',
+            growth='growth/call [kB]')
+        print "-" * 88
+        for name in sorted(set(cpu_times) | set(memory_last)) + ['total']:
+            if name == 'total':
+                print "-" * 88
+                cpu_time = sum(cpu_times.values())
+                first_rss = sum(memory_first.values())
+                last_rss = sum(memory_last.values())
+            else:
+                cpu_time = cpu_times.get(name, 0.0)
+                first_rss = memory_first.get(name, 0)
+                last_rss = memory_last.get(name, 0)
+
+            print "{name:20s} {cpu:12.3f} {cpu_s:12.1f} {first:12.1f} {last:12.1f} {growth:14.1f}".format(
+                name=name,
+                cpu=cpu_time / len(results),
+                cpu_s=100 * cpu_time / call_time if call_time else 0.0,
+                first=first_rss / 1024.0 ** 2,
+                last=last_rss / 1024.0 ** 2,
+                growth=(last_rss - first_rss) / 1024.0 / n_calls if n_calls else 0.0)
+
+        print
+        print "CPU [%] is the CPU time per second of the calls."
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import autopath
+
+import argparse
+import multiprocessing
+import shutil
+import tempfile
+import time
+
+from alex.utils.mproc import SystemLogger
+
+
+def component_loop(logger, period, n_loops, burst, jitters):
+    """Runs a main loop of a hub component which logs a burst of debug messages every iteration, and reports how
+    late the iterations start."""
+    late = []
+    next_start = time.time() + period
+    for i in xrange(n_loops):
+        time.sleep(max(next_start - time.time(), 0.0))
+        late.append(time.time() - next_start)
+        next_start += period
+
+        for j in xrange(burst):
+            logger.debug('Loop %d, message %d: %s' % (i, j, 'x' * 100))
+
+    jitters.put(late)
+
+
+def benchmark(asynchronous, n_processes, period, n_loops, burst):
+    output_dir = tempfile.mkdtemp()
+    try:
+        logger = SystemLogger(output_dir, stdout=False, asynchronous=asynchronous)
+
+        jitters = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=component_loop, args=(logger, period, n_loops, burst, jitters))
+                     for i in range(n_processes)]
+        for p in processes:
+            p.start()
+        late = []
+        for p in processes:
+            late.extend(jitters.get())
+        for p in processes:
+            p.join()
+
+        # measure how long it takes to write the queued messages, the synchronous messages are written by the
+        # threads of the components which have finished already
+        s = time.time()
+        logger.close()
+        flush_time = time.time() - s
+    finally:
+        shutil.rmtree(output_dir)
+
+    late.sort()
+    return late, flush_time
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="""
+    Measures the jitter of the main loops of hub components which log at the DEBUG level. Every component runs
+    a loop with a fixed period and logs a burst of messages in every iteration. The jitter is how late an iteration
+    starts.
+
+    The SystemLogger writes every message either by a new thread holding a lock shared by all processes, or
+    asynchronously by a single writer thread.
+      """)
+
+    parser.add_argument('--processes', type=int, default=6, help='the number of components')
+    parser.add_argument('--period', type=float, default=0.01, help='the period of the main loops in seconds')
+    parser.add_argument('--loops', type=int, default=200, help='the number of iterations of every main loop')
+    parser.add_argument('--burst', type=int, default=20, help='the number of messages logged in every iteration')
+    args = parser.parse_args()
+
+    print "Components: {p}, period: {t:.4f} s, loops: {l}, messages per loop: {b}".format(
+        p=args.processes, t=args.period, l=args.loops, b=args.burst)
+    print "-" * 80
+    print "{l:15s} {mean:>10s} {med:>10s} {p95:>10s} {max:>10s} {flush:>10s}".format(
+        l='Logging', mean='mean [ms]', med='median', p95='95%', max='max', flush='flush')
+
+    for label, asynchronous in [('synchronous', False), ('asynchronous', True)]:
+        late, flush_time = benchmark(asynchronous, args.processes, args.period, args.loops, args.burst)
+        print "{l:15s} {mean:10.3f} {med:10.3f} {p95:10.3f} {max:10.3f} {flush:10.3f}".format(
+            l=label,
+            mean=1000 * sum(late) / len(late),
+            med=1000 * late[len(late) / 2],
+            p95=1000 * late[int(0.95 * len(late))],
+            max=1000 * late[-1],
+            flush=1000 * flush_time)
+
+
+if __name__ == '__main__':
+    main()
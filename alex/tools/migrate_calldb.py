@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import autopath
+
+import argparse
+import os
+
+from alex.components.hub.calldb import CallDB, migrate_call_db
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="""
+    Copies all calls from a pickled call database (e.g. call_db.pckl) to an SQLite call database.
+
+    Then the VoipHub.call_db in the config should be set to the SQLite database. The hub migrates the calls itself
+    when the SQLite database does not exist and the pickled database with the same name does, e.g. call_db.pckl for
+    call_db.sqlite.
+      """)
+
+    parser.add_argument('pickle', help='the pickled call database')
+    parser.add_argument('sqlite', help='the SQLite call database, it must not exist yet')
+    args = parser.parse_args()
+
+    if os.path.exists(args.sqlite):
+        parser.error('The SQLite call database already exists: %s' % args.sqlite)
+
+    migrate_call_db(None, args.pickle, args.sqlite)
+    calls = CallDB(None, args.pickle).read_database()['calls_from_start_end_length']
+
+    print 'Copied %d calls of %d remote URIs.' % (sum(len(c) for c in calls.itervalues()), len(calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -102,10 +102,11 @@ if __name__ == '__main__':
 
     prev_rec_label = 'sil'
 
-    for frame, label in vta:
-        log_prob_speech = gmm_speech.score(frame)
-        log_prob_sil = gmm_sil.score(frame)
+    frames = np.array([frame for frame, label in vta])
+    log_probs_speech_all = gmm_speech.score(frames)
+    log_probs_sil_all = gmm_sil.score(frames)
 
+    for (frame, label), log_prob_speech, log_prob_sil in zip(vta, log_probs_speech_all, log_probs_sil_all):
         log_probs_speech.append(log_prob_speech)
         log_probs_sil.append(log_prob_sil)
 
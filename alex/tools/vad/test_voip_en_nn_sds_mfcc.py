@@ -99,16 +99,15 @@ if __name__ == '__main__':
     print datetime.datetime.now()
 
     nn_acc = [0.0, ]*len(nns)
-    n = 0
+    n = len(vta)
 
-    for frame, label in vta:
-        for i, nn in enumerate(nns):
-            p = nn.predict(frame)
+    frames = np.array([frame for frame, label in vta])
+    is_sil = np.array([label == 'sil' for frame, label in vta])
 
-            if (p[0] > 0.5 and label == 'sil') or (p[0] < 0.5 and label != 'sil'):
-                nn_acc[i] += 1
+    for i, nn in enumerate(nns):
+        p = nn.predict(frames)
 
-        n += 1
+        nn_acc[i] = np.sum(((p[:, 0] > 0.5) & is_sil) | ((p[:, 0] < 0.5) & ~is_sil))
 
     for i, nn in enumerate(nns):
         print "VAD accuracy %s: %0.3f%% " % (nnfn[i], nn_acc[i]*100.0/n)
@@ -68,7 +68,7 @@ def mixup(gmm, vta, name):
 
 def train_gmm(name, vta):
 
-    vta = [frame for frame, label in vta if label == name]
+    vta = np.array([frame for frame, label in vta if label == name])
 
     gmm = GMM(n_features=36, n_components=1, n_iter=n_iter)
     gmm.fit(vta)
@@ -149,24 +149,13 @@ if __name__ == '__main__':
     print "Length of test data:", len(vta)
     print datetime.datetime.now()
 
-    accuracy = 0.0
-    n = 0
-    for frame, label in vta:
-        log_prob_speech = gmm_speech.score(frame)
-        log_prob_sil = gmm_sil.score(frame)
-
-        ratio = log_prob_speech - log_prob_sil
-        if ratio >= 0:
-            rec_label = 'speech'
-        else:
-            rec_label = 'sil'
-
-        if rec_label == label:
-            accuracy += 1.0
+    frames = np.array([frame for frame, label in vta])
+    is_speech = np.array([label == 'speech' for frame, label in vta])
 
-        n += 1
+    ratio = gmm_speech.score(frames) - gmm_sil.score(frames)
+    n = len(vta)
 
-    accuracy = accuracy * 100.0 / n
+    accuracy = np.sum((ratio >= 0) == is_speech) * 100.0 / n
 
     print "VAD accuracy : %0.3f%% " % accuracy
     print datetime.datetime.now()
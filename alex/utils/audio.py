@@ -4,13 +4,12 @@
 
 import os
 import pyaudio
-import pysox
 import audioop
 import wave
 import subprocess
 import contextlib
 
-from os import remove, fdopen
+from os import remove
 from tempfile import mkstemp
 
 import alex.utils.various as various
@@ -73,52 +72,46 @@ def load_wav(cfg, file_name):
     return wav
 
 
-def convert_wav(cfg, wav):
+def sox_pipe(cfg, data, input_args, effects):
     """
-    Convert the given WAV byte buffer into the desired sample rate
-    using SoX. Assumes mono + 16-bit sample size.
+    Converts the audio data by the sox command and returns the audio in the
+    default format (mono, pcm16, default sample rate).
+
+    The data are passed to sox through pipes, so no temporary files are
+    needed.
+
+    :param data: the audio data in the format described by input_args
+    :param input_args: sox options describing the format of the data
+    :param effects: sox effects applied to the audio
     """
     sample_rate = cfg['Audio']['sample_rate']
 
-    # write the buffer to a temporary file
-    tmp1fh, tmp1path = mkstemp()
-    tmp1fh = fdopen(tmp1fh, 'wb')
-    tmp1fh.write(wav)
-    tmp1fh.close()
+    cmd = ['sox', '-q'] + input_args + ['-',
+           '-t', 'raw', '-r', str(sample_rate), '-c', '1', '-b', '16', '-e', 'signed-integer', '-'] + effects
+    sox = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    wav, err = sox.communicate(data)
 
-    # transform the temporary file using SoX (can't do this in memory :-()
-    tmp2fh, tmp2path = mkstemp()
-    sox_in = pysox.CSoxStream(tmp1path)
-    sox_out = pysox.CSoxStream(tmp2path, 'w', pysox.CSignalInfo(sample_rate, 1, 16), fileType='wav')
-    sox_chain = pysox.CEffectsChain(sox_in, sox_out)
-    sox_chain.add_effect(pysox.CEffect("rate", [str(sample_rate)]))
-    sox_chain.flow_effects()
-    sox_out.close()
+    if sox.returncode != 0:
+        raise Exception('SoX failed: %s' % err.strip())
 
-    # read the transformation results back to the buffer
-    return load_wav(cfg, fdopen(tmp2fh, 'rb'))
+    return wav
+
+def convert_wav(cfg, wav):
+    """
+    Convert the given WAV byte buffer into the desired sample rate
+    using SoX. Assumes mono + 16-bit sample size.
+    """
+    return sox_pipe(cfg, wav, ['-t', 'wav'], ['rate', str(cfg['Audio']['sample_rate'])])
 
 def change_tempo(cfg, tempo, wav):
     """
     Change tempo of an input WAV byte buffer.
     """
-    sample_rate = cfg['Audio']['sample_rate']
-
-    # write the buffer to a temporary file
-    tmp1fh, tmp1path = mkstemp()
-    save_wav(cfg, tmp1path, wav)
+    if tempo == 1.0:
+        return wav
 
-    # transform the temporary file using SoX (can't do this in memory :-()
-    tmp2fh, tmp2path = mkstemp()
-    sox_in = pysox.CSoxStream(tmp1path)
-    sox_out = pysox.CSoxStream(tmp2path, 'w', pysox.CSignalInfo(sample_rate, 1, 16), fileType='wav')
-    sox_chain = pysox.CEffectsChain(sox_in, sox_out)
-    sox_chain.add_effect(pysox.CEffect("tempo", [str(tempo)]))
-    sox_chain.flow_effects()
-    sox_out.close()
-
-    # read the transformation results back to the buffer
-    return load_wav(cfg, fdopen(tmp2fh, 'rb'))
+    input_args = ['-t', 'raw', '-r', str(cfg['Audio']['sample_rate']), '-c', '1', '-b', '16', '-e', 'signed-integer']
+    return sox_pipe(cfg, wav, input_args, ['tempo', str(tempo)])
 
 def save_wav(cfg, file_name, wav):
     """
@@ -163,26 +156,7 @@ def convert_mp3_to_wav(cfg, mp3_string):
     (mono, pcm16, default sample rate).
 
     """
-
-    sample_rate = cfg['Audio']['sample_rate']
-
-    # write the buffer to a temporary file
-    tmp1fh, tmp1path = mkstemp()
-    tmp1fh = fdopen(tmp1fh, 'wb')
-    tmp1fh.write(mp3_string)
-    tmp1fh.close()
-
-    # transform the temporary file using SoX (can't do this in memory :-()
-    tmp2fh, tmp2path = mkstemp()
-    sox_in = pysox.CSoxStream(tmp1path, fileType='mp3')
-    sox_out = pysox.CSoxStream(tmp2path, 'w', pysox.CSignalInfo(sample_rate, 1, 16), fileType='wav')
-    sox_chain = pysox.CEffectsChain(sox_in, sox_out)
-    sox_chain.add_effect(pysox.CEffect("rate", [str(sample_rate)]))
-    sox_chain.flow_effects()
-    sox_out.close()
-
-    # read the transformation results back to the buffer
-    return load_wav(cfg, fdopen(tmp2fh, 'rb'))
+    return sox_pipe(cfg, mp3_string, ['-t', 'mp3'], ['rate', str(cfg['Audio']['sample_rate'])])
 
 def play(cfg, wav):
     # open the audio device
@@ -11,6 +11,9 @@ import os.path
 import cPickle as pickle
 import fcntl
 import hashlib
+import sqlite3
+import threading
+import time
 
 from itertools import ifilterfalse
 from heapq import nsmallest
@@ -25,6 +28,156 @@ class Counter(dict):
         return 0
 
 
+class LRUCache(object):
+    """Mapping of a bounded size which discards the least recently used items.
+
+    Unlike the lru_cache decorator, it is meant to be used explicitly with keys
+    computed by the caller, e.g. from the content of the cached objects.
+    Cache performance statistics are stored in the hits and misses attributes.
+
+    """
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self.cache = collections.OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __contains__(self, key):
+        return key in self.cache
+
+    def __setitem__(self, key, value):
+        self.cache.pop(key, None)
+        self.cache[key] = value
+
+        # purge least recently used cache entry
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Returns the value for the key and marks it as recently used, or
+        the default if the key is not cached."""
+        try:
+            value = self.cache.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.cache[key] = value
+        self.hits += 1
+        return value
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = self.misses = 0
+
+
+class SQLiteLRUCache(object):
+    """Persistent mapping of strings to strings of a bounded total size which
+    discards the least recently used items.
+
+    All items are stored in a single SQLite database file, so the cache can be
+    shared by several processes; however, every process must create its own
+    SQLiteLRUCache object because a database connection cannot be used after
+    fork. The database is in the write-ahead log mode, so the readers are not
+    blocked by a writer. The order of use is updated only if the database is not
+    locked by another process; therefore, it is approximate. Optionally, the
+    items which have not been used for max_age seconds expire.
+    Cache performance statistics are stored in the hits and misses attributes.
+
+    """
+    def __init__(self, file_name, max_size=100 * 1024 * 1024, timeout=10.0, max_age=None):
+        """
+        :param file_name: the name of the database file
+        :param max_size: the maximal total size of the values in bytes
+        :param timeout: how long to wait for a lock of the database in seconds
+        :param max_age: the time in seconds after which an unused item expires, None if the items do not expire
+        """
+        self.file_name = os.path.expanduser(file_name)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.hits = self.misses = 0
+
+        dir_name = os.path.dirname(self.file_name)
+        if dir_name and not os.path.exists(dir_name):
+            os.makedirs(dir_name)
+
+        # the transactions are started explicitly
+        self.connection = sqlite3.connect(self.file_name, timeout=timeout, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cache '
+                                '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, used REAL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS cache_used ON cache (used)')
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def __contains__(self, key):
+        return self.connection.execute('SELECT 1 FROM cache WHERE key = ?', (key, )).fetchone() is not None
+
+    def __setitem__(self, key, value):
+        size = len(value)
+        if size > self.max_size:
+            return
+
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            self.connection.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                                    (key, sqlite3.Binary(value), size, time.time()))
+
+            # purge expired cache entries
+            if self.max_age is not None:
+                self.connection.execute('DELETE FROM cache WHERE used < ?', (time.time() - self.max_age, ))
+
+            # purge least recently used cache entries
+            excess = self.connection.execute('SELECT SUM(size) FROM cache').fetchone()[0] - self.max_size
+            if excess > 0:
+                purged = []
+                cursor = self.connection.execute('SELECT key, size FROM cache ORDER BY used')
+                for purged_key, purged_size in cursor:
+                    purged.append((purged_key, ))
+                    excess -= purged_size
+                    if excess <= 0:
+                        break
+                cursor.close()
+
+                self.connection.executemany('DELETE FROM cache WHERE key = ?', purged)
+
+            self.connection.execute('COMMIT')
+        except:
+            self.connection.execute('ROLLBACK')
+            raise
+
+    def get(self, key, default=None):
+        """Returns the value for the key and marks it as recently used, or
+        the default if the key is not cached."""
+        row = self.connection.execute('SELECT value, used FROM cache WHERE key = ?', (key, )).fetchone()
+        if row is None or (self.max_age is not None and row[1] < time.time() - self.max_age):
+            self.misses += 1
+            return default
+
+        # do not wait for a writer, the order of use is approximate anyway
+        self.connection.execute('PRAGMA busy_timeout = 0')
+        try:
+            self.connection.execute('UPDATE cache SET used = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            self.connection.execute('PRAGMA busy_timeout = %d' % int(1000 * self.timeout))
+
+        self.hits += 1
+        return str(row[0])
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+        self.hits = self.misses = 0
+
+    def close(self):
+        self.connection.close()
+
+
 def lru_cache(maxsize=100):
     '''Least-recently-used cache decorator.
 
@@ -154,46 +307,87 @@ def lfu_cache(maxsize=100):
     return decorator
 
 
-def get_persitent_cache_content(key):
-    key_name = os.path.join(persistent_cache_directory, '_'.join([str(i) for i in key]).replace(' ', '_'))
-    
-    try:
-        # you cannot have exlusive lock if you don't ask for writing permissions
-        # therefor use "r+" mode
-        f = open(key_name, 'r+b')
+class FilePersistentCache(object):
+    """Persistent mapping of strings to strings which stores every item in
+    its own file named by the key.
+
+    It grows indefinitely. It is the original store of the persistent_cache
+    decorator.
+
+    """
+    def __init__(self, dir_name):
+        self.dir_name = os.path.expanduser(dir_name)
+
+    def get(self, key, default=None):
+        try:
+            # you cannot have exlusive lock if you don't ask for writing permissions
+            # therefor use "r+" mode
+            f = open(os.path.join(self.dir_name, key), 'r+b')
+            fcntl.lockf(f, fcntl.LOCK_EX)
+        except IOError:
+            return default
+
+        value = f.read()
+
+        fcntl.lockf(f, fcntl.LOCK_UN)
+        f.close()
+
+        return value
+
+    def __setitem__(self, key, value):
+        f = open(os.path.join(self.dir_name, key), 'wb')
         fcntl.lockf(f, fcntl.LOCK_EX)
-    except IOError:
-        raise KeyError
 
-    data = pickle.load(f)
+        f.write(value)
+
+        fcntl.lockf(f, fcntl.LOCK_UN)
+        f.close()
 
-    fcntl.lockf(f, fcntl.LOCK_UN)
-    f.close()
 
-    return data
+persistent_cache_file_name = os.path.join(persistent_cache_directory, 'persistent_cache.sqlite')
+persistent_cache_max_size = 1024 * 1024 * 1024  # in bytes
+persistent_cache_max_age = 90 * 24 * 60 * 60  # in seconds
 
+persistent_cache_local = threading.local()
 
-def set_persitent_cache_content(key, value):
-    key_name = os.path.join(persistent_cache_directory,'_'.join([str(i) for i in key]).replace(' ', '_'))
-    
-    f = open(key_name, 'wb')
-    fcntl.lockf(f, fcntl.LOCK_EX)
 
-    data = pickle.dump(value, f)
+def sqlite_persistent_cache_store():
+    """Returns the SQLiteLRUCache of the calling thread in
+    persistent_cache_file_name.
 
-    fcntl.lockf(f, fcntl.LOCK_UN)
-    f.close()
+    A database connection can be used neither after fork nor by another
+    thread, so every process and thread opens its own connection.
 
+    """
+    if getattr(persistent_cache_local, 'pid', None) != os.getpid():
+        persistent_cache_local.store = SQLiteLRUCache(persistent_cache_file_name,
+                                                      persistent_cache_max_size,
+                                                      max_age=persistent_cache_max_age)
+        persistent_cache_local.pid = os.getpid()
 
-def persistent_cache(method=False, file_prefix='', file_suffix=''):
+    return persistent_cache_local.store
+
+
+def file_persistent_cache_store():
+    """Returns the FilePersistentCache in persistent_cache_directory."""
+    return FilePersistentCache(persistent_cache_directory)
+
+
+# The function returning the store of the persistent_cache decorators which
+# do not have their own store. The store maps the keys to the pickled results.
+persistent_cache_store = sqlite_persistent_cache_store
+
+
+def persistent_cache(method=False, file_prefix='', file_suffix='', store=None):
     '''Persistent cache decorator.
 
-    It grows indefinitely.
+    The results are pickled and kept in the store returned by the store
+    function, which defaults to persistent_cache_store. The default store is
+    a single SQLite file of a bounded size whose unused items expire.
     Arguments to the cached function must be hashable.
     Cache performance statistics stored in f.hits and f.misses.
 
     '''
-    sha = hashlib.sha1()
     def decorator(user_function):
         @functools.wraps(user_function)
         def wrapper(*args, **kwds):
@@ -209,17 +403,19 @@ def persistent_cache(method=False, file_prefix='', file_suffix=''):
 
             key += (file_suffix,)
 
-            key = (hashlib.sha224(str(key)).hexdigest(),)
+            key = hashlib.sha224(str(key)).hexdigest()
 
-            try:
-                result = get_persitent_cache_content(key)
+            cache = (store or persistent_cache_store)()
+            data = cache.get(key)
+            if data is not None:
+                result = pickle.loads(data)
                 wrapper.hits += 1
-            except KeyError:
+            else:
                 result = user_function(*args, **kwds)
                 wrapper.misses += 1
 
                 # record this key
-                set_persitent_cache_content(key, result)         
+                cache[key] = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
 
             return result
 
@@ -4,7 +4,6 @@
 import numpy as np
 
 from scipy.fftpack import dct
-from collections import deque
 
 
 class MFCCFrontEnd:
@@ -48,8 +47,14 @@ class MFCCFrontEnd:
         self.prior = 0.0
 
         self.n_last_frames = n_last_frames
-        self.mfcc_queue = deque(maxlen=4 + n_last_frames)
-        self.mfcc_delta_queue = deque(maxlen=4 + n_last_frames)
+        # The deltas and accelerations are computed over a window of the last
+        # ``history_len + 1`` frames, the previous frames are kept in
+        # preallocated history buffers (the oldest frame first).
+        self.history_len = 3 + n_last_frames
+        self.mfcc_size = numceps + 1 if usec0 else numceps
+        self.n_frames = 0
+        self.mfcc_history = np.zeros((self.history_len, self.mfcc_size))
+        self.mfcc_delta_history = np.zeros((self.history_len, self.mfcc_size))
 
         self.init_hamming()
         self.init_mel_filter_bank()
@@ -110,90 +115,128 @@ class MFCCFrontEnd:
 
         self.cep_lift_weights = cep_lift_weights
 
-    def preemphasis(self, frame):
-        out_frame = np.zeros_like(frame)
-        out_frame[0] = frame[0] - self.preemcoef * self.prior
-        for i in range(1, len(frame)):
-            out_frame[i] = frame[i] - self.preemcoef * frame[i - 1]
+    def preemphasis(self, frames):
+        """Applies the preemphasis to consecutive frames of shape (n_frames, framesize).
 
-        self.prior = frame[-1]
+        The sample preceding each frame is the last sample of the previous frame.
+        """
+        priors = np.empty(len(frames))
+        priors[0] = self.prior
+        priors[1:] = frames[:-1, -1]
 
-        return out_frame
+        out_frames = np.empty_like(frames)
+        out_frames[:, 0] = frames[:, 0] - self.preemcoef * priors
+        out_frames[:, 1:] = frames[:, 1:] - self.preemcoef * frames[:, :-1]
 
-    def param(self, frame):
-        """Compute the MFCC coefficients in a way similar to the HTK."""
+        self.prior = frames[-1, -1]
+
+        return out_frames
+
+    def get_frames(self, signal, frameshift):
+        """Splits the signal into frames of the frame size shifted by ``frameshift`` samples.
+
+        Trailing samples which do not fill a whole frame are ignored.
+        """
+        signal = np.asarray(signal, dtype=np.float64)
+        n_frames = max(0, (len(signal) - self.framesize) // frameshift + 1)
+        idx = np.arange(n_frames)[:, np.newaxis] * frameshift + np.arange(self.framesize)
+        return signal[idx]
+
+    def cepstrum(self, frames):
+        """Compute the liftered cepstral coefficients of the frames (and C0 if requested)."""
         # zero mean
         if self.zmeansource:
-            frame = frame - np.mean(frame)
+            frames = frames - np.mean(frames, axis=1)[:, np.newaxis]
         # preemphasis
-        frame = self.preemphasis(frame)
+        frames = self.preemphasis(frames)
         # apply hamming window
         if self.usehamming:
-            frame = self.hamming * frame
+            frames = self.hamming * frames
 
-        complex_spectrum = np.fft.rfft(frame)
-#    print "LCS", len(complex_spectrum)
+        complex_spectrum = np.fft.rfft(frames, axis=1)
         power_spectrum = complex_spectrum.real * complex_spectrum.real + \
             complex_spectrum.imag * complex_spectrum.imag
         # compute only power spectrum if required
         if not self.usepower:
             power_spectrum = np.sqrt(power_spectrum)
 
-#    print "SPS",power_spectrum.shape
         mel_spectrum = np.dot(power_spectrum, self.mel_filter_bank)
         # apply mel floor
-        for i in range(len(mel_spectrum)):
-            if mel_spectrum[i] < 1.0:
-                mel_spectrum[i] = 1.0
-        mel_spectrum = np.log(mel_spectrum)
-
-        cepstrum = dct(mel_spectrum, type=2, norm='ortho')
-        c0 = cepstrum[0]
-        htk_cepstrum = cepstrum[1:self.numceps + 1]
+        mel_spectrum = np.log(np.maximum(mel_spectrum, 1.0))
+
+        cepstrum = dct(mel_spectrum, type=2, norm='ortho', axis=1)
         # cepstral liftering
-        cep_lift_mfcc = self.cep_lift_weights * htk_cepstrum
+        cep_lift_mfcc = self.cep_lift_weights * cepstrum[:, 1:self.numceps + 1]
 
         if self.usec0:
-            mfcc = np.append(cep_lift_mfcc, c0)
-        else:
-            mfcc = cep_lift_mfcc
-
-        # compute delta and acceleration coefficients if requested
-        self.mfcc_queue.append(mfcc)
-
-#        print len(self.mfcc_queue)
-
+            return np.hstack((cep_lift_mfcc, cepstrum[:, :1]))
+        return cep_lift_mfcc
+
+    def param_batch(self, signal, frameshift):
+        """Compute the MFCC coefficients for all frames of a chunk of audio.
+
+        The frames are ``framesize`` samples long and shifted by ``frameshift`` samples, trailing samples which do not
+        fill a whole frame are ignored. The state of the front end is preserved between the calls so that the result
+        is the same as if the frames were passed to ``param`` one by one.
+
+        :param signal: a sequence of audio samples
+        :param frameshift: the number of samples between the starts of two consecutive frames
+        :return: an array of shape (n_frames, n_params), one row of parameters per frame
+        """
+        frames = self.get_frames(signal, frameshift)
+        n_new = len(frames)
+        if n_new == 0:
+            return np.zeros((0, self.get_param_size()))
+
+        mfcc = self.cepstrum(frames)
+
+        # Stack the buffered frames before the new ones; t are the indices of the new frames in the whole stream and
+        # the row of the frame t in the stacked array is t - t_first.
+        n_hist = min(self.n_frames, self.history_len)
+        t_first = self.n_frames - n_hist
+        t = np.arange(self.n_frames, self.n_frames + n_new)
+        mfcc_all = np.vstack((self.mfcc_history[self.history_len - n_hist:], mfcc))
+
+        params = [mfcc]
+
+        # Delta of the frame t is the average difference over the window of the frames max(0, t - history_len) .. t,
+        # the delta of the first frame is zero.
+        t_lo = np.maximum(0, t - self.history_len)
+        delta = (mfcc_all[t - t_first] - mfcc_all[t_lo - t_first]) / np.maximum(t - t_lo, 1)[:, np.newaxis]
         if self.usedelta:
-#      print "LMQ", len(self.mfcc_queue)
-            if len(self.mfcc_queue) >= 2:
-                delta = np.zeros_like(mfcc)
-                for i in range(1, len(self.mfcc_queue)):
-                    delta += self.mfcc_queue[i] - self.mfcc_queue[i - 1]
-                delta /= len(self.mfcc_queue) - 1
-
-                self.mfcc_delta_queue.append(delta)
-            else:
-                delta = np.zeros_like(mfcc)
+            params.append(delta)
+            delta_all = np.vstack((self.mfcc_delta_history[self.history_len - n_hist:], delta))
 
         if self.useacc:
-            if len(self.mfcc_delta_queue) >= 2:
-                acc = np.zeros_like(mfcc)
-                for i in range(1, len(self.mfcc_delta_queue)):
-                    acc += self.mfcc_delta_queue[i] - \
-                        self.mfcc_delta_queue[i - 1]
-                acc /= len(self.mfcc_delta_queue) - 1
+            if self.usedelta:
+                # The acceleration is computed from the deltas the same way, ignoring the zero delta of the first
+                # frame.
+                t_lo = np.minimum(t, np.maximum(1, t - self.history_len))
+                acc = (delta_all[t - t_first] - delta_all[t_lo - t_first]) / np.maximum(t - t_lo, 1)[:, np.newaxis]
             else:
                 acc = np.zeros_like(mfcc)
-
+            params.append(acc)
+
+        for i in range(1, self.n_last_frames + 1):
+            # the i-th previous frame, zeros before the start of the stream
+            prev = mfcc_all[np.maximum(t - i, t_first) - t_first]
+            prev[t - i < 0] = 0.0
+            params.append(prev)
+
+        # update the history buffers
+        self.n_frames += n_new
+        n_keep = min(n_new + n_hist, self.history_len)
+        self.mfcc_history[self.history_len - n_keep:] = mfcc_all[-n_keep:]
         if self.usedelta:
-            mfcc = np.append(mfcc, delta)
-        if self.useacc:
-            mfcc = np.append(mfcc, acc)
+            self.mfcc_delta_history[self.history_len - n_keep:] = delta_all[-n_keep:]
 
-        for i in range(self.n_last_frames):
-            if len(self.mfcc_queue) > i + 1 :
-                mfcc = np.append(mfcc, self.mfcc_queue[-1-i-1])
-            else:
-                mfcc = np.append(mfcc, np.zeros_like(self.mfcc_queue[-1]))
+        return np.hstack(params)
+
+    def get_param_size(self):
+        """Returns the number of parameters computed for one frame."""
+        n = 1 + int(self.usedelta) + int(self.useacc) + self.n_last_frames
+        return n * self.mfcc_size
 
-        return mfcc
+    def param(self, frame):
+        """Compute the MFCC coefficients in a way similar to the HTK."""
+        return self.param_batch(frame, self.framesize)[0]
@@ -8,10 +8,16 @@ Implements useful classes for handling multiprocessing implementation of
 the Alex system.
 """
 
+import atexit
+import collections
 import functools
+import itertools
 import multiprocessing
 import threading
+import Queue
 import fcntl
+import errno
+import select
 import time
 import os
 import sys
@@ -145,9 +151,141 @@ class InstanceID(object):
         return InstanceID.instance_id.value
 
 
+class LocalInstanceID(object):
+    """
+    This class provides ids to all instances of objects inheriting from this
+    class which are unique and increasing within the process which created them.
+
+    Unlike InstanceID, it does not need any lock shared by all processes;
+    therefore, it is suitable for objects created very often, e.g. audio frames.
+
+    """
+
+    pid = None
+    instance_ids = None
+
+    def get_instance_id(self):
+        # The counter must be restarted in a forked process.
+        if LocalInstanceID.pid != os.getpid():
+            LocalInstanceID.pid = os.getpid()
+            LocalInstanceID.instance_ids = itertools.count(1)
+        return next(LocalInstanceID.instance_ids)
+
+
+def wait(objects, timeout=None):
+    """Waits until some of the objects are ready for reading.
+
+    It is a counterpart of multiprocessing.connection.wait from Python 3.
+
+    :param objects: objects with the fileno() method, e.g. multiprocessing connections or CloseEvent
+    :param timeout: the maximal time to wait in seconds, None to wait until some object is ready
+    :return: the list of the objects which are ready
+    """
+    while True:
+        try:
+            return select.select(objects, [], [], timeout)[0]
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+
+
+class CloseEvent(object):
+    """
+    An event shared by processes with the interface of multiprocessing.Event.
+
+    Unlike multiprocessing.Event, it can be waited for together with the connections of a process: once the event is
+    set, its file descriptor is readable in all processes until the event is cleared.
+
+    """
+
+    def __init__(self):
+        self.event = multiprocessing.Event()
+        self.read_fd, self.write_fd = os.pipe()
+        for fd in [self.read_fd, self.write_fd]:
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def fileno(self):
+        return self.read_fd
+
+    def is_set(self):
+        return self.event.is_set()
+
+    def set(self):
+        self.event.set()
+        try:
+            os.write(self.write_fd, b'x')
+        except OSError as e:
+            # the pipe is full, it is readable anyway
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def clear(self):
+        self.event.clear()
+        try:
+            while os.read(self.read_fd, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def wait(self, timeout=None):
+        return self.event.wait(timeout)
+
+
+class Reactor(multiprocessing.Process):
+    """
+    Base class for the processes of the hub components.
+
+    Instead of sleeping for cfg['Hub']['main_loop_sleep_time'] and polling the connections, the main loop of
+    a component calls wait_for_input(), which blocks until there is input on some of the connections returned by
+    get_input_connections() or the close event is set.
+
+    The derived classes are expected to have the cfg and close_event attributes. If cfg['Hub']['event_driven'] is
+    False, wait_for_input() just sleeps as the original main loops did.
+
+    """
+
+    # If the close event cannot be waited for (e.g. it is a multiprocessing.Event), it is checked at least this often.
+    close_event_check_time = 0.1
+
+    def get_input_connections(self):
+        """Returns the connections whose input should wake up the main loop."""
+        return []
+
+    def has_pending_input(self):
+        """Returns True if there is already received input which has not been processed yet."""
+        return False
+
+    def get_wait_timeout(self):
+        """Returns the maximal time in seconds the main loop can wait for input, None if there is no limit."""
+        return None
+
+    def wait_for_input(self):
+        if not self.cfg['Hub']['event_driven']:
+            time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+            return
+
+        if self.has_pending_input():
+            return
+
+        objects = list(self.get_input_connections())
+        timeout = self.get_wait_timeout()
+        if hasattr(self.close_event, 'fileno'):
+            objects.append(self.close_event)
+        elif timeout is None or timeout > self.close_event_check_time:
+            timeout = self.close_event_check_time
+
+        wait(objects, timeout)
+
+
 class SystemLogger(object):
     """
     This is a multiprocessing-safe logger.  It should be used by all components in Alex.
+
+    By default, every message is written by a new thread which holds a lock shared by all processes. In the
+    asynchronous mode, the messages are formatted (including their timestamps) by the logging process and put into
+    a queue. A single writer thread in the process which created the logger writes them to the log files in batches,
+    so the logging processes never wait for each other or for the disk.
     """
 
     lock = multiprocessing.RLock()
@@ -161,11 +299,16 @@ class SystemLogger(object):
         'ERROR':           60,
     }
 
-    def __init__(self, output_dir, stdout_log_level='DEBUG', stdout=True, file_log_level='DEBUG'):
+    # The maximal number of messages written by the writer thread at once.
+    max_batch_size = 1000
+
+    def __init__(self, output_dir, stdout_log_level='DEBUG', stdout=True, file_log_level='DEBUG',
+                 asynchronous=False):
         self.stdout_log_level = stdout_log_level
         self.stdout = stdout
         self.file_log_level = file_log_level
         self.output_dir = output_dir
+        self.asynchronous = asynchronous
 
         if not os.path.exists(output_dir):
             os.mkdir(output_dir)
@@ -176,11 +319,21 @@ class SystemLogger(object):
         self.current_session_log_dir_name.value = ''
         self._session_started = False
 
+        if self.asynchronous:
+            self.queue = multiprocessing.Queue()
+            self.writer_pid = os.getpid()
+            self.writer = threading.Thread(target=self.run_writer, name='SystemLoggerWriter')
+            self.writer.daemon = True
+            self.writer.start()
+            atexit.register(self.close)
+
     def __repr__(self):
         return ("SystemLogger(output_dir={outdir}, stdout_log_level='"
-                "{lvl_out}', stdout={stdout}, file_log_level='{lvl_f}')"
+                "{lvl_out}', stdout={stdout}, file_log_level='{lvl_f}', "
+                "asynchronous={asynchronous})"
                 ).format(lvl_out=self.stdout_log_level, stdout=self.stdout,
-                         lvl_f=self.file_log_level, outdir=self.output_dir)
+                         lvl_f=self.file_log_level, outdir=self.output_dir,
+                         asynchronous=self.asynchronous)
 
     def get_time_str(self):
         """ Return current time in dashed ISO-like format.
@@ -229,7 +382,6 @@ class SystemLogger(object):
         # back off to the default logging directory
         return self.output_dir
 
-    @global_lock(lock)
     def formatter(self, lvl, message):
         """ Format the message - pretty print
         """
@@ -243,82 +395,121 @@ class SystemLogger(object):
 
         return s + ss + u'\n'
 
-    @global_lock(lock)
     def log(self, lvl, message, session_system_log=False):
         """
         Logs the message based on its level and the logging setting.
+
+        The message is formatted immediately, then it is written either by a new thread or, in the asynchronous mode,
+        by the writer thread.
+
+        """
+        record = (time.time(), lvl, self.formatter(lvl, message), self.current_session_log_dir_name.value,
+                  session_system_log)
+
+        if self.asynchronous:
+            self.queue.put(record)
+        else:
+            self.write_records_in_thread([record, ])
+
+    @async
+    @global_lock(lock)
+    def write_records_in_thread(self, records):
+        self.write_records(records)
+
+    def write_records(self, records):
+        """
+        Writes the formatted messages to stdout, to the global log and to the call-specific logs.
         Before writing into a logging file, it locks the file.
 
         """
+        log_files = collections.OrderedDict()
+
+        for t, lvl, msg, session_log_dir_name, session_system_log in records:
+            if self.stdout:
+                # Log to stdout.
+                if (SystemLogger.levels[lvl] >= SystemLogger.levels[self.stdout_log_level]):
+                    print msg
 
-        msg = self.formatter(lvl, message)
+            if self.output_dir:
+                if (SystemLogger.levels[lvl] >= SystemLogger.levels[self.file_log_level]):
+                    # Log to the global log.
+                    log_files.setdefault(os.path.join(self.output_dir, 'system.log'), []).append(msg)
+
+            if session_log_dir_name:
+                if (session_system_log or SystemLogger.levels[lvl] >= SystemLogger.levels[self.file_log_level]):
+                    # Log to the call-specific log.
+                    log_files.setdefault(os.path.join(session_log_dir_name, 'system.log'), []).append(msg)
 
         if self.stdout:
-            # Log to stdout.
-            if (SystemLogger.levels[lvl] >= SystemLogger.levels[self.stdout_log_level]):
-                print msg
-                sys.stdout.flush()
-
-        if self.output_dir:
-            if (SystemLogger.levels[lvl] >= SystemLogger.levels[self.file_log_level]):
-                # Log to the global log.
-                log_fname = os.path.join(self.output_dir, 'system.log')
-                with codecs.open(log_fname, "a+", encoding='utf8', buffering=0) as log_file:
-                    fcntl.lockf(log_file, fcntl.LOCK_EX)
-                    log_file.write(msg)
-                    log_file.write('\n')
-                    fcntl.lockf(log_file, fcntl.LOCK_UN)
+            sys.stdout.flush()
 
-        if self.current_session_log_dir_name.value:
-            if (session_system_log or SystemLogger.levels[lvl] >= SystemLogger.levels[self.file_log_level]):
-                # Log to the call-specific log.
-                session_log_fname = os.path.join(self.current_session_log_dir_name.value, 'system.log')
-                with codecs.open(session_log_fname, "a+", encoding='utf8', buffering=0) as session_log_file:
-                    fcntl.lockf(session_log_file, fcntl.LOCK_EX)
-                    session_log_file.write(msg)
-                    session_log_file.write('\n')
-                    fcntl.lockf(session_log_file, fcntl.LOCK_UN)
+        for log_fname, msgs in log_files.iteritems():
+            with codecs.open(log_fname, "a+", encoding='utf8') as log_file:
+                fcntl.lockf(log_file, fcntl.LOCK_EX)
+                log_file.write(u''.join(msg + u'\n' for msg in msgs))
+                log_file.flush()
+                fcntl.lockf(log_file, fcntl.LOCK_UN)
+
+    def run_writer(self):
+        """
+        Writes the queued messages in batches until None is received. The messages of every batch are ordered by
+        their timestamps.
+
+        """
+        while True:
+            records = [self.queue.get(), ]
+            try:
+                while len(records) < self.max_batch_size:
+                    records.append(self.queue.get_nowait())
+            except Queue.Empty:
+                pass
+
+            stop = None in records
+            records = sorted((r for r in records if r is not None), key=lambda r: r[0])
+
+            try:
+                self.write_records(records)
+            except:
+                traceback.print_exc()
+
+            if stop:
+                return
+
+    def close(self):
+        """ Writes all queued messages and stops the writer thread.
+
+        It is called at exit of the process which created the logger.
+        """
+        if self.asynchronous and os.getpid() == self.writer_pid and self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
 
-    @async
     @etime('syslog_info')
-    @global_lock(lock)
     def info(self, message):
         self.log('INFO', message)
 
-    @async
     @etime('syslog_debug')
-    @global_lock(lock)
     def debug(self, message):
         self.log('DEBUG', message)
 
-    @async
     @etime('syslog_warning')
-    @global_lock(lock)
     def warning(self, message):
         self.log('WARNING', message)
 
-    @async
     @etime('syslog_critical')
-    @global_lock(lock)
     def critical(self, message):
         self.log('CRITICAL', message)
 
-    @async
     @etime('syslog_exception')
-    @global_lock(lock)
     def exception(self, message):
         tb = traceback.format_exc()
         self.log('EXCEPTION', unicode(message) + '\n' + unicode(tb, 'utf8'))
 
-    @async
     @etime('syslog_error')
-    @global_lock(lock)
     def error(self, message):
         self.log('ERROR', message)
 
-    @async
     @etime('syslog_session_system_log')
-    @global_lock(lock)
     def session_system_log(self, message):
         """This logs specifically only into the call-specific system log."""
         self.log('SYSTEM-LOG', message, session_system_log=True)
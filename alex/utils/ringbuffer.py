@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+class RingBuffer(object):
+    """FIFO buffer of samples stored in a preallocated numpy array.
+
+    Samples are appended at the end and consumed from the beginning without moving the stored data. When the buffer
+    gets full, its capacity is doubled.
+    """
+
+    def __init__(self, capacity=4096, dtype=np.int16):
+        self.buffer = np.zeros(capacity, dtype=dtype)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.buffer)
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    def resize(self, capacity):
+        """Reallocates the buffer so that it can hold at least ``capacity`` samples."""
+        if capacity <= self.capacity:
+            return
+        buffer = np.zeros(capacity, dtype=self.buffer.dtype)
+        buffer[:self.size] = self.peek(self.size)
+        self.buffer = buffer
+        self.start = 0
+
+    def append(self, samples):
+        """Appends the samples at the end of the buffer."""
+        samples = np.asarray(samples, dtype=self.buffer.dtype)
+        n = len(samples)
+        if self.size + n > self.capacity:
+            self.resize(max(2 * self.capacity, self.size + n))
+
+        end = (self.start + self.size) % self.capacity
+        n_tail = min(n, self.capacity - end)
+        self.buffer[end:end + n_tail] = samples[:n_tail]
+        self.buffer[:n - n_tail] = samples[n_tail:]
+        self.size += n
+
+    def peek(self, n):
+        """Returns a copy of the first n samples without removing them from the buffer."""
+        n = min(n, self.size)
+        n_tail = min(n, self.capacity - self.start)
+        if n_tail == n:
+            return self.buffer[self.start:self.start + n].copy()
+        return np.concatenate((self.buffer[self.start:], self.buffer[:n - n_tail]))
+
+    def consume(self, n):
+        """Removes the first n samples from the buffer."""
+        n = min(n, self.size)
+        self.start = (self.start + n) % self.capacity
+        self.size -= n
+
+    def pop(self, n):
+        """Removes the first n samples from the buffer and returns them."""
+        samples = self.peek(n)
+        self.consume(n)
+        return samples
@@ -3,6 +3,7 @@
 # This code is mostly PEP8-compliant. See
 # http://www.python.org/dev/peps/pep-0008.
 
+import cPickle
 import multiprocessing
 import time
 import os
@@ -15,13 +16,13 @@ import wave
 from datetime import datetime
 from collections import deque
 
-from alex.utils.mproc import etime
+from alex.utils.mproc import etime, Reactor
 from alex.utils.exdec import catch_ioerror
 from alex.utils.exceptions import SessionLoggerException, SessionClosedException
 from alex.utils.procname import set_proc_name
 
 
-class SessionLogger(multiprocessing.Process):
+class SessionLogger(Reactor):
     """
     This is a multiprocessing-safe logger. It should be used by Alex to log
     information according the SDC 2010 XML format.
@@ -30,18 +31,48 @@ class SessionLogger(multiprocessing.Process):
 
     Times should be in seconds from the beginning of the dialogue.
 
+    The audio of the recordings is not sent to the logger process. The process
+    calling rec_start() writes the audio passed to rec_write() directly into
+    the wave file in the session directory; only the start and the end of
+    the recording are logged through the queue.
+
+    The logged events are kept in memory and appended to the session journal
+    (session.journal). The session.xml file is written only when the session
+    ends, when a new session starts, when the logger exits or on demand by
+    calling write_session_xml(). If the process is killed, session.xml can be
+    rebuilt from the journal by rebuild_session_xml().
+
     """
 
+    # the commands which do not change the session log and are not written into the journal
+    not_journaled = set(['session_start', 'session_end', 'write_session_xml'])
+
     def __init__(self):
-        multiprocessing.Process.__init__(self)
+        Reactor.__init__(self)
 
+        self.cfg = None
         self._session_dir_name = ''
         self._session_start_time = time.time()
         self._is_open = False   # whether the session is started
         self._doc = None
+        self._journal = None
+        self._replaying = False
+
+        # the time of the currently processed event
+        self._now = None
+        self._last_session_start_time = 0
+        self._last_session_end_time = 0
 
         # filename of the started recording
         self._rec_started = {}
+        # the recordings written by the current process, they are not shared by the processes
+        self._rec_writers = {}
+        # the session directory in which the recordings of the current process were opened
+        self._rec_dir_name = ''
+
+        # the current session directory shared by all processes
+        self.session_dir_name = multiprocessing.Array('c', ' ' * 1000)
+        self.session_dir_name.value = ''
 
         self.queue = multiprocessing.Queue()
         self._queue = deque()
@@ -55,6 +86,12 @@ class SessionLogger(multiprocessing.Process):
     def cancel_join_thread(self):
         self.queue.cancel_join_thread()
 
+    def get_input_connections(self):
+        return [self.queue._reader]
+
+    def has_pending_input(self):
+        return bool(self._queue)
+
     def __repr__(self):
         return "SessionLogger()"
 
@@ -69,12 +106,91 @@ class SessionLogger(multiprocessing.Process):
 
         return queue
 
+    def session_start(self, output_dir):
+        """Starts logging into the output_dir.
+
+        The directory is immediately available to all processes so that they can write their recordings into it.
+        """
+        self.session_dir_name.value = output_dir
+        self.queue.put(('session_start', (output_dir, ), {}, time.time()))
+
+    def session_end(self):
+        """Stops logging into the session directory.
+
+        The recordings started in any process after this call are discarded.
+        """
+        self.session_dir_name.value = ''
+        self.queue.put(('session_end', (), {}, time.time()))
+
+    def rec_start(self, speaker, fname):
+        """Starts the recording in the session directory and logs it in the last "speaker" turn.
+
+        The wave file is opened in the calling process, which must also call rec_write() and rec_end().
+        """
+        self.queue.put(('rec_start', (speaker, fname), {}, time.time()))
+
+        session_dir_name = self._close_recordings_of_ended_session()
+
+        rec = None
+        if session_dir_name and self.cfg is not None:
+            try:
+                rec = wave.open(os.path.join(session_dir_name, fname), 'w')
+                rec.setnchannels(1)
+                rec.setsampwidth(2)
+                rec.setframerate(self.cfg['Audio']['sample_rate'])
+            except IOError as e:
+                print "Exception when logging: rec_start", fname
+                print e
+                rec = None
+
+        # the audio of a recording which could not be opened is discarded
+        self._rec_writers[fname] = rec
+
+    def rec_write(self, fname, data_rec):
+        """Writes the audio into the recording started in the calling process.
+
+        :param data_rec: a string with the PCM samples or a Frame
+        """
+        self._close_recordings_of_ended_session()
+
+        rec = self._rec_writers.get(fname)
+        if rec:
+            # the header is updated when the recording is closed
+            rec.writeframesraw(getattr(data_rec, 'payload', data_rec))
+
+    def rec_end(self, fname):
+        """Closes the recording started in the calling process and logs its end time.
+        """
+        self.queue.put(('rec_end', (fname, ), {}, time.time()))
+
+        rec = self._rec_writers.pop(fname, None)
+        if rec:
+            rec.close()
+
+    def _close_recordings_of_ended_session(self):
+        """Closes all recordings of the calling process if the session has changed since they were opened, e.g.
+        the recordings interrupted by a flush which were not ended by rec_end().
+
+        Returns the current session directory.
+        """
+        session_dir_name = self.session_dir_name.value
+        if session_dir_name != self._rec_dir_name:
+            for rec in self._rec_writers.itervalues():
+                if rec:
+                    rec.close()
+            self._rec_writers.clear()
+            self._rec_dir_name = session_dir_name
+
+        return session_dir_name
+
     def _get_date_str(self):
         """ Return current time in ISO format.
 
         It is useful when constructing file and directory names.
         """
-        dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S") + " " + time.tzname[time.localtime().tm_isdst]
+        now = self._now or time.time()
+        dt = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S") + " " + \
+            time.tzname[time.localtime(now).tm_isdst]
 
         return dt
 
@@ -84,14 +200,18 @@ class SessionLogger(multiprocessing.Process):
 
         It is useful when constructing file and directory names.
         """
-        dt = time.time() - self._session_start_time
+        dt = (self._now or time.time()) - self._session_start_time
 
         return "%.3f" % dt
 
     @etime('seslog_session_start')
     def _session_start(self, output_dir):
         """ Records the target directory and creates the template call log.
+
+        The log of the previous session is written if it was not ended.
         """
+        if self._is_open:
+            self._session_end()
 
         self._session_dir_name = output_dir
 
@@ -103,12 +223,16 @@ class SessionLogger(multiprocessing.Process):
         f.write('\n')
         f.close()
 
-        self._session_start_time = time.time()
+        self._session_start_time = self._now or time.time()
         self._read_session_xml()
         self._is_open = True
 
+        if not self._replaying:
+            self._journal = open(os.path.join(self._session_dir_name, 'session.journal'), 'wb')
+            self._write_journal('session_start', (output_dir, ), {})
+
     def _flush(self):
-        # close all opened rec_started files
+        # end all started recordings
 
         for f in self._rec_started:
             if self._rec_started[f]:
@@ -131,6 +255,42 @@ class SessionLogger(multiprocessing.Process):
         self._doc = None
         self._is_open = False
 
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+    def _write_journal(self, cmd, args, kw):
+        """ Appends the event to the session journal.
+        """
+        if self._journal:
+            if cmd == 'external_data_file':
+                # the data are already stored in the external file
+                args, kw = args[:2], {}
+            cPickle.dump((cmd, args, kw, self._now), self._journal, cPickle.HIGHEST_PROTOCOL)
+
+    def _replay_journal(self, output_dir):
+        """ Rebuilds the session log from the journal in the output_dir.
+        """
+        self._replaying = True
+        try:
+            with open(os.path.join(output_dir, 'session.journal'), 'rb') as journal:
+                while True:
+                    try:
+                        cmd, args, kw, self._now = cPickle.load(journal)
+                    except (EOFError, cPickle.UnpicklingError):
+                        # the last event may be incomplete if the process was killed
+                        break
+
+                    try:
+                        SessionLogger.__dict__['_' + cmd](self, *args, **kw)
+                    except SessionLoggerException:
+                        pass
+
+            self._write_session_xml()
+        finally:
+            self._replaying = False
+            self._now = None
+
     def _cfg_formatter(self, message):
         """ Format the message - pretty print
         """
@@ -183,8 +343,6 @@ class SessionLogger(multiprocessing.Process):
                 config = els[0].appendChild(self._doc.createElement("config"))
             config.appendChild(self._doc.createComment(self._cfg_formatter(cfg)))
 
-        self._write_session_xml()
-
     @etime('seslog_header')
     @catch_ioerror
     def _header(self, system_txt, version_txt):
@@ -205,8 +363,6 @@ class SessionLogger(multiprocessing.Process):
             version = header.appendChild(self._doc.createElement("version"))
             version.appendChild(self._doc.createTextNode(version_txt))
 
-        self._write_session_xml()
-
     @etime('seslog_input_source')
     @catch_ioerror
     def _input_source(self, input_source):
@@ -217,8 +373,6 @@ class SessionLogger(multiprocessing.Process):
             i_s = els[0].appendChild(self._doc.createElement("input_source"))
             i_s.setAttribute("type", input_source)
 
-        self._write_session_xml()
-
     @etime('seslog_dialogue_rec_start')
     # @catch_ioerror - do not add! VIO catches the IOError
     def _dialogue_rec_start(self, speaker, fname):
@@ -238,11 +392,8 @@ class SessionLogger(multiprocessing.Process):
             da.setAttribute("fname", fname)
             da.setAttribute("starttime", self._get_time_str())
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing dialogue element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_dialogue_rec_end')
     # @catch_ioerror - do not add! VIO catches the IOError
     def _dialogue_rec_end(self, fname):
@@ -255,11 +406,8 @@ class SessionLogger(multiprocessing.Process):
                 els[i].setAttribute("endtime", self._get_time_str())
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException("Missing dialogue_rec element for %s fname" % fname)
 
-        self._write_session_xml()
-
     @etime('seslog_evaluation')
     @catch_ioerror
     def _evaluation(self, num_turns, task_success, user_sat, score):
@@ -295,8 +443,6 @@ class SessionLogger(multiprocessing.Process):
             turn.setAttribute("turn_number", unicode(turn_number))
             turn.setAttribute("time", self._get_time_str())
 
-        self._write_session_xml()
-
     @etime('seslog_dialogue_act')
     @catch_ioerror
     def _dialogue_act(self, speaker, dialogue_act):
@@ -311,11 +457,8 @@ class SessionLogger(multiprocessing.Process):
                 da.appendChild(self._doc.createTextNode(unicode(dialogue_act)))
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_text')
     @catch_ioerror
     def _text(self, speaker, text, cost=None):
@@ -332,11 +475,8 @@ class SessionLogger(multiprocessing.Process):
                 da.appendChild(self._doc.createTextNode(unicode(text)))
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException("Missing turn element for {spkr} speaker".format(spkr=speaker))
 
-        self._write_session_xml()
-
     @etime('seslog_rec_start')
     @catch_ioerror
     def _rec_start(self, speaker, fname):
@@ -353,25 +493,9 @@ class SessionLogger(multiprocessing.Process):
                 da.setAttribute("starttime", self._get_time_str())
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for the {spkr} speaker".format(spkr=speaker)))
 
-        self._write_session_xml()
-
-        self._rec_started[fname] = wave.open(os.path.join(self._session_dir_name, fname), 'w')
-        self._rec_started[fname].setnchannels(1)
-        self._rec_started[fname].setsampwidth(2)
-        self._rec_started[fname].setframerate(self.cfg['Audio']['sample_rate'])
-
-    @etime('seslog_rec_write')
-    @catch_ioerror
-    def _rec_write(self, fname, data_rec):
-        """Write into open file recording.
-        """
-        try:
-            self._rec_started[fname].writeframes(bytearray(data_rec))
-        except KeyError:
-            raise SessionLoggerException("rec_write: missing rec element %s" % fname)
+        self._rec_started[fname] = True
 
     @etime('seslog_rec_end')
     @catch_ioerror
@@ -388,8 +512,8 @@ class SessionLogger(multiprocessing.Process):
             else:
                 raise SessionLoggerException(("Missing rec element for the {fname} fname.".format(fname=fname)))
 
-            self._write_session_xml()
-            self._rec_started[fname].close()
+            if not self._rec_started[fname]:
+                raise KeyError(fname)
             self._rec_started[fname] = None
         except KeyError:
             raise SessionLoggerException("rec_end: missing rec element %s" % fname)
@@ -438,11 +562,8 @@ class SessionLogger(multiprocessing.Process):
 
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_slu')
     @catch_ioerror
     def _slu(self, speaker, fname, nblist, confnet=None):
@@ -479,11 +600,8 @@ class SessionLogger(multiprocessing.Process):
 
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_barge_in')
     @catch_ioerror
     def _barge_in(self, speaker, tts_time=False, asr_time=False):
@@ -502,8 +620,6 @@ class SessionLogger(multiprocessing.Process):
         else:
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_hangup')
     @catch_ioerror
     def _hangup(self, speaker):
@@ -516,11 +632,8 @@ class SessionLogger(multiprocessing.Process):
                 els[i].appendChild(self._doc.createElement("hangup"))
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     ########################################################################
     ## The following functions define functionality above what was set in ##
     ## SDC 2010 XML logging format.                                       ##
@@ -538,7 +651,6 @@ class SessionLogger(multiprocessing.Process):
             if els[i].getAttribute("speaker") == speaker:
                 return els[i]
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
     @etime('seslog_dialogue_state')
@@ -565,8 +677,6 @@ class SessionLogger(multiprocessing.Process):
                 sl.setAttribute("name", "%s" % slot_name)
                 sl.appendChild(self._doc.createTextNode(unicode(slot_value)))
 
-        self._write_session_xml()
-
     @etime('seslog_external_data_file')
     @catch_ioerror
     def _external_data_file(self, ftype, fname, data=None):
@@ -582,88 +692,102 @@ class SessionLogger(multiprocessing.Process):
         el = turn.appendChild(self._doc.createElement("external"))
         el.setAttribute("type", ftype)
         el.setAttribute("fname", os.path.basename(fname))
-        self._write_session_xml()
         # write the file data
         if data is not None:
             with open(fname, 'w') as fh:
                 fh.write(data)
 
+    def _dispatch(self, cmd, args, kw, cmd_time):
+        """ Calls the method for the queued command.
+        """
+        attr = '_'+cmd
+        try:
+            if cmd == 'session_start':
+                self._last_session_start_time = time.time()
+            elif cmd == 'session_end':
+                self._last_session_start_time = time.time()
+
+            if not self._is_open and cmd != 'session_start':
+                session_start_found = False
+                while time.time() - cmd_time < 3.0 and not session_start_found:
+                    # these are probably commands for the new un-opened session
+                    for i, (_cmd, _args, _kw, _cmd_time) in enumerate(self._queue):
+                        if _cmd == 'session_start':
+                            print "SessionLogger: finally found session start"
+                            self._now = time.time()
+                            self._session_start(*_args,**_kw)
+                            del self._queue[i]
+                            session_start_found = True
+                            break
+                    else:
+                        time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                        self.recv_input_locally()
+
+                if not session_start_found and (self._last_session_end_time - cmd_time < 2.0):
+                    # just silently ignore because these are likely the be commands for the already
+                    # closed session
+
+                    # print "SessionLogger: should be silent"
+                    # print "SessionLogger: calling method", cmd, "when the session is not open"
+                    # print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
+                    return
+
+                if not session_start_found:
+                    print "SessionLogger: no session start found"
+                    print "SessionLogger: calling method", cmd, "when the session is not open"
+                    print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
+                    return
+
+            cf = SessionLogger.__dict__[attr]
+            self._now = time.time()
+            if cmd not in self.not_journaled:
+                self._write_journal(cmd, args, kw)
+            cf(self, *args, **kw)
+        except AttributeError:
+            print "SessionLogger: unknown method", cmd
+            self.close_event.set()
+            raise
+        except SessionLoggerException as e:
+            print "Exception when logging:", cmd, args, kw
+            print e
+        except SessionClosedException as e:
+            print "Exception when logging:", cmd, args, kw
+            print e
+        finally:
+            self._now = None
+
+    def _dispatch_all(self):
+        """ Processes all queued commands.
+        """
+        while self._queue:
+            cmd, args, kw, cmd_time = self._queue.popleft()
+            self._dispatch(cmd, args, kw, cmd_time)
+
+        if self._journal:
+            self._journal.flush()
+
+    def recv_input_locally(self):
+        while not self.queue.empty():
+            self._queue.append(self.queue.get())
+
     def run(self):
         try:
             set_proc_name("Alex_SessionLogger")
-            last_session_start_time = 0
-            last_session_end_time = 0
 
             while 1:
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    if self._is_open:
+                        self._session_end()
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                self.wait_for_input()
 
                 s = (time.time(), time.clock())
 
-                while not self.queue.empty():
-                    self._queue.append(self.queue.get())
-
-                if len(self._queue):
-                    cmd, args, kw, cmd_time = self._queue.popleft()
-
-                    attr = '_'+cmd
-                    try:
-                        if cmd == 'session_start':
-                            last_session_start_time = time.time()
-                        elif cmd == 'session_end':
-                            last_session_start_time = time.time()
-
-
-                        if not self._is_open and cmd != 'session_start':
-                            session_start_found = False
-                            while time.time() - cmd_time < 3.0 and not session_start_found:
-                                # these are probably commands for the new un-opened session
-                                for i, (_cmd, _args, _kw, _cmd_time) in enumerate(self._queue):
-                                    if _cmd == 'session_start':
-                                        print "SessionLogger: finally found session start"
-                                        self._session_start(*_args,**_kw)
-                                        del self._queue[i]
-                                        session_start_found = True
-                                        break
-                                else:
-                                    time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
-
-                            if not session_start_found and (last_session_end_time - cmd_time < 2.0):
-                                # just silently ignore because these are likely the be commands for the already
-                                # closed session
-
-                                # print "SessionLogger: should be silent"
-                                # print "SessionLogger: calling method", cmd, "when the session is not open"
-                                # print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
-                                continue
-
-
-                            if not session_start_found:
-                                print "SessionLogger: no session start found"
-                                print "SessionLogger: calling method", cmd, "when the session is not open"
-                                print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
-                                continue
-
-                        cf = SessionLogger.__dict__[attr]
-                        cf(self, *args, **kw)
-                    except AttributeError:
-                        print "SessionLogger: unknown method", cmd
-                        self.close_event.set()
-                        raise
-                    except SessionLoggerException as e:
-                        if cmd == 'rec_write':
-                            print "Exception when logging:", cmd
-                            print e
-                        else:
-                            print "Exception when logging:", cmd, args, kw
-                            print e
-                    except SessionClosedException:
-                        print "Exception when logging:", cmd, args, kw
-                        print e
+                self.recv_input_locally()
+                self._dispatch_all()
 
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
@@ -680,3 +804,11 @@ class SessionLogger(multiprocessing.Process):
 
         print 'Exiting: %s. Setting close event' % multiprocessing.current_process().name
         self.close_event.set()
+
+
+def rebuild_session_xml(output_dir):
+    """Rebuilds session.xml in the output_dir from the session journal.
+
+    It is useful when the SessionLogger process was killed before the session log was written.
+    """
+    SessionLogger()._replay_journal(output_dir)
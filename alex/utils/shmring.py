@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import errno
+import fcntl
+import mmap
+import os
+
+import numpy as np
+
+
+def set_nonblocking(fd):
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+
+class SharedRingBuffer(object):
+    """Ring buffer of bytes in an anonymous shared memory segment with a single producer and multiple consumers.
+
+    The buffer must be created before the producer and the consumer processes are forked. The producer appends
+    the data and publishes the number of bytes written so far (the write position). Every consumer has its own read
+    position stored in the shared segment. Each position is written by only one process; therefore, no locks are
+    needed.
+
+    The producer never waits for the consumers. A consumer which falls behind by more than the capacity of the buffer
+    loses the overwritten data, so the capacity should cover several seconds of audio.
+
+    Every consumer has a pipe which becomes readable when new data are written so that the consumer can wait for
+    the data together with its connections.
+    """
+
+    def __init__(self, capacity, n_consumers=1):
+        self.n_consumers = n_consumers
+        header_size = 8 * (1 + n_consumers)
+
+        self.mmap = mmap.mmap(-1, header_size + capacity)
+        # positions[0] is the write position, positions[1 + i] is the read position of the i-th consumer
+        self.positions = np.frombuffer(self.mmap, dtype=np.int64, count=1 + n_consumers)
+        self.data = np.frombuffer(self.mmap, dtype=np.uint8, offset=header_size)
+
+        self.notifications = []
+        for i in range(n_consumers):
+            read_fd, write_fd = os.pipe()
+            set_nonblocking(read_fd)
+            set_nonblocking(write_fd)
+            self.notifications.append((read_fd, write_fd))
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    def get_write_position(self):
+        return int(self.positions[0])
+
+    def write(self, data):
+        """Appends the data to the buffer and notifies the consumers.
+
+        :param data: a string or any other object with the buffer interface
+        """
+        if not len(data):
+            return
+
+        data = np.frombuffer(data, dtype=np.uint8)
+        position = self.get_write_position()
+
+        # only the last capacity bytes can be stored
+        skip = max(0, len(data) - self.capacity)
+        n = len(data) - skip
+        start = (position + skip) % self.capacity
+        n_tail = min(n, self.capacity - start)
+        self.data[start:start + n_tail] = data[skip:skip + n_tail]
+        self.data[:n - n_tail] = data[skip + n_tail:]
+
+        # the data must be stored before the new write position is published
+        self.positions[0] = position + len(data)
+
+        for read_fd, write_fd in self.notifications:
+            try:
+                os.write(write_fd, b'x')
+            except OSError as e:
+                # the pipe is full, it is readable anyway
+                if e.errno != errno.EAGAIN:
+                    raise
+
+    def get(self, position, n):
+        """Returns n bytes starting at the position in the stream.
+
+        The returned array is a view of the shared memory if the data are stored contiguously, otherwise it is a copy.
+        The view is valid until the producer overwrites the data.
+
+        :return: a numpy array of bytes, None if the data were already overwritten or not yet written
+        """
+        if position < self.get_write_position() - self.capacity or position + n > self.get_write_position():
+            return None
+
+        start = position % self.capacity
+        if start + n <= self.capacity:
+            return self.data[start:start + n]
+        return np.concatenate((self.data[start:], self.data[:start + n - self.capacity]))
+
+    def reader(self, consumer, limit=None):
+        """Returns the consumer end of the buffer.
+
+        :param consumer: the index of the consumer
+        :param limit: the index of another consumer which this consumer must not overtake, None if it can read all
+                      data written by the producer
+        """
+        return SharedRingReader(self, consumer, limit)
+
+
+class SharedRingReader(object):
+    """The consumer end of a SharedRingBuffer.
+
+    It has the fileno() method, so it can be waited for together with multiprocessing connections.
+    """
+
+    def __init__(self, ring, consumer, limit=None):
+        self.ring = ring
+        self.consumer = consumer
+        self.limit = limit
+        self.lost = 0
+
+    def fileno(self):
+        return self.ring.notifications[self.consumer][0]
+
+    @property
+    def position(self):
+        return int(self.ring.positions[1 + self.consumer])
+
+    def get_limit(self):
+        """Returns the position up to which the consumer can read."""
+        if self.limit is None:
+            return self.ring.get_write_position()
+        return int(self.ring.positions[1 + self.limit])
+
+    def available(self):
+        return max(0, self.get_limit() - self.position)
+
+    def clear_notifications(self):
+        try:
+            while os.read(self.fileno(), 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def seek(self, position):
+        self.ring.positions[1 + self.consumer] = position
+
+    def read(self, n, limit=None):
+        """Returns at most n bytes starting at the read position without consuming them.
+
+        If the data at the read position were already overwritten, the read position is moved to the oldest data
+        available and the number of lost bytes is increased.
+
+        :param limit: the position up to which the data can be read, the current limit if None
+        :return: a tuple of the position of the data and a numpy array of the bytes, see SharedRingBuffer.get
+        """
+        oldest = self.ring.get_write_position() - self.ring.capacity
+        if self.position < oldest:
+            self.lost += oldest - self.position
+            self.seek(oldest)
+
+        if limit is None:
+            limit = self.get_limit()
+        position = self.position
+        n = max(0, min(n, limit - position))
+        return position, self.ring.get(position, n)
+
+    def consume(self, n):
+        """Moves the read position by n bytes."""
+        self.seek(self.position + n)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import distutils.spawn
+import math
+import struct
+import unittest
+import wave
+from StringIO import StringIO
+
+from alex.utils.audio import convert_wav, change_tempo
+
+
+def gen_tone(sample_rate, duration, frequency=440.0):
+    """Returns a sine tone in the 16 bit PCM format."""
+    n_samples = int(sample_rate * duration)
+    return struct.pack('<%dh' % n_samples,
+                       *[int(8000 * math.sin(2 * math.pi * frequency * i / sample_rate)) for i in range(n_samples)])
+
+
+@unittest.skipIf(distutils.spawn.find_executable('sox') is None, 'sox is not installed')
+class TestSoxPipe(unittest.TestCase):
+    cfg = {'Audio': {'sample_rate': 16000}}
+
+    def test_convert_wav(self):
+        f = StringIO()
+        wf = wave.open(f, 'wb')
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(8000)
+        wf.writeframes(gen_tone(8000, 0.5))
+        wf.close()
+
+        wav = convert_wav(self.cfg, f.getvalue())
+        # 0.5 s of 16 bit samples in the sample rate of the configuration
+        self.assertAlmostEqual(len(wav) / 2, 8000, delta=100)
+        self.assertNotEqual(wav.strip(b'\x00'), b'')
+
+    def test_change_tempo(self):
+        tone = gen_tone(16000, 1.0)
+
+        self.assertEqual(change_tempo(self.cfg, 1.0, tone), tone)
+
+        wav = change_tempo(self.cfg, 2.0, tone)
+        self.assertEqual(len(wav) % 2, 0)
+        self.assertAlmostEqual(len(wav) / 2, 8000, delta=400)
+
+
+if __name__ == '__main__':
+    unittest.main()
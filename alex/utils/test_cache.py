@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from alex.utils.cache import LRUCache, SQLiteLRUCache, FilePersistentCache, persistent_cache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = LRUCache(maxsize=2)
+        cache['a'] = 1
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('b', 0), 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache['a'] = 1
+        cache['b'] = 2
+        # 'a' becomes the most recently used item, so 'b' is evicted
+        cache.get('a')
+        cache['c'] = 3
+
+        self.assertEqual(len(cache), 2)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+
+    def test_clear(self):
+        cache = LRUCache(maxsize=2)
+        cache['a'] = 1
+        cache.get('a')
+        cache.clear()
+
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+
+
+class TestSQLiteLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.dir_name, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def test_get_set(self):
+        cache = SQLiteLRUCache(self.file_name, max_size=10)
+        cache['a'] = 'aaa'
+
+        self.assertEqual(cache.get('a'), 'aaa')
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+    def test_eviction(self):
+        cache = SQLiteLRUCache(self.file_name, max_size=10)
+        cache['a'] = 'aaaa'
+        cache['b'] = 'bbbb'
+        # 'a' becomes the most recently used item, so 'b' is evicted
+        cache.get('a')
+        cache['c'] = 'cccc'
+        # the item is larger than the whole cache
+        cache['d'] = 'd' * 11
+
+        self.assertEqual(len(cache), 2)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+        self.assertFalse('d' in cache)
+        cache.close()
+
+    def test_expiry(self):
+        cache = SQLiteLRUCache(self.file_name, max_age=0.05)
+        cache['a'] = 'aaa'
+        self.assertEqual(cache.get('a'), 'aaa')
+
+        time.sleep(0.1)
+        self.assertEqual(cache.get('a'), None)
+        # the expired items are purged when a new item is stored
+        cache['b'] = 'bbb'
+        self.assertFalse('a' in cache)
+        cache.close()
+
+    def test_shared_file(self):
+        writer = SQLiteLRUCache(self.file_name)
+        reader = SQLiteLRUCache(self.file_name)
+        writer['a'] = '\x00\x01'
+
+        self.assertEqual(reader.get('a'), '\x00\x01')
+        writer.close()
+        reader.close()
+
+
+class TestPersistentCache(unittest.TestCase):
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def check_store(self, store):
+        calls = []
+
+        class Synthesizer(object):
+            @persistent_cache(True, 'Synthesizer.synthesize.', store=store)
+            def synthesize(self, text, speed=1.0):
+                calls.append(text)
+                return [text, speed]
+
+        synthesizer = Synthesizer()
+        self.assertEqual(synthesizer.synthesize('a'), ['a', 1.0])
+        self.assertEqual(synthesizer.synthesize('a'), ['a', 1.0])
+        self.assertEqual(synthesizer.synthesize('a', speed=2.0), ['a', 2.0])
+        self.assertEqual(calls, ['a', 'a'])
+        self.assertEqual((Synthesizer.synthesize.hits, Synthesizer.synthesize.misses), (1, 2))
+
+    def test_sqlite_store(self):
+        cache = SQLiteLRUCache(os.path.join(self.dir_name, 'cache.sqlite'))
+        self.check_store(lambda: cache)
+        self.assertEqual(len(cache), 2)
+        cache.close()
+
+    def test_file_store(self):
+        self.check_store(lambda: FilePersistentCache(self.dir_name))
+        self.assertEqual(len(os.listdir(self.dir_name)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
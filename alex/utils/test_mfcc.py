@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from collections import deque
+
+import numpy as np
+from scipy.fftpack import dct
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.utils.mfcc import MFCCFrontEnd
+
+
+class ReferenceMFCCFrontEnd(MFCCFrontEnd):
+    """The previous implementation of MFCCFrontEnd.param, which processed one frame at a time with loops."""
+
+    def __init__(self, **kwargs):
+        MFCCFrontEnd.__init__(self, **kwargs)
+        self.mfcc_queue = deque(maxlen=4 + self.n_last_frames)
+        self.mfcc_delta_queue = deque(maxlen=4 + self.n_last_frames)
+
+    def preemphasis_frame(self, frame):
+        out_frame = np.zeros_like(frame)
+        out_frame[0] = frame[0] - self.preemcoef * self.prior
+        for i in range(1, len(frame)):
+            out_frame[i] = frame[i] - self.preemcoef * frame[i - 1]
+
+        self.prior = frame[-1]
+
+        return out_frame
+
+    def param(self, frame):
+        if self.zmeansource:
+            frame = frame - np.mean(frame)
+        frame = self.preemphasis_frame(frame)
+        if self.usehamming:
+            frame = self.hamming * frame
+
+        complex_spectrum = np.fft.rfft(frame)
+        power_spectrum = complex_spectrum.real * complex_spectrum.real + \
+            complex_spectrum.imag * complex_spectrum.imag
+        if not self.usepower:
+            power_spectrum = np.sqrt(power_spectrum)
+
+        mel_spectrum = np.dot(power_spectrum, self.mel_filter_bank)
+        for i in range(len(mel_spectrum)):
+            if mel_spectrum[i] < 1.0:
+                mel_spectrum[i] = 1.0
+        mel_spectrum = np.log(mel_spectrum)
+
+        cepstrum = dct(mel_spectrum, type=2, norm='ortho')
+        c0 = cepstrum[0]
+        cep_lift_mfcc = self.cep_lift_weights * cepstrum[1:self.numceps + 1]
+
+        if self.usec0:
+            mfcc = np.append(cep_lift_mfcc, c0)
+        else:
+            mfcc = cep_lift_mfcc
+
+        self.mfcc_queue.append(mfcc)
+
+        if self.usedelta:
+            if len(self.mfcc_queue) >= 2:
+                delta = np.zeros_like(mfcc)
+                for i in range(1, len(self.mfcc_queue)):
+                    delta += self.mfcc_queue[i] - self.mfcc_queue[i - 1]
+                delta /= len(self.mfcc_queue) - 1
+
+                self.mfcc_delta_queue.append(delta)
+            else:
+                delta = np.zeros_like(mfcc)
+
+        if self.useacc:
+            if len(self.mfcc_delta_queue) >= 2:
+                acc = np.zeros_like(mfcc)
+                for i in range(1, len(self.mfcc_delta_queue)):
+                    acc += self.mfcc_delta_queue[i] - self.mfcc_delta_queue[i - 1]
+                acc /= len(self.mfcc_delta_queue) - 1
+            else:
+                acc = np.zeros_like(mfcc)
+
+        if self.usedelta:
+            mfcc = np.append(mfcc, delta)
+        if self.useacc:
+            mfcc = np.append(mfcc, acc)
+
+        for i in range(self.n_last_frames):
+            if len(self.mfcc_queue) > i + 1:
+                mfcc = np.append(mfcc, self.mfcc_queue[-1 - i - 1])
+            else:
+                mfcc = np.append(mfcc, np.zeros_like(self.mfcc_queue[-1]))
+
+        return mfcc
+
+
+class TestMFCCFrontEnd(unittest.TestCase):
+    def test_param_batch_equals_reference(self):
+        framesize, frameshift = 512, 160
+        signal = np.random.RandomState(1).randint(-3000, 3000, size=8000)
+        n_frames = (len(signal) - framesize) // frameshift + 1
+
+        for kwargs in [{}, {'n_last_frames': 3}, {'usedelta': False}, {'useacc': False, 'usec0': False},
+                       {'usepower': False, 'usehamming': False}]:
+            reference = ReferenceMFCCFrontEnd(framesize=framesize, **kwargs)
+            expected = np.array([reference.param(signal[i * frameshift:i * frameshift + framesize])
+                                 for i in range(n_frames)])
+
+            # the frames of the first half of the signal and then the rest
+            front_end = MFCCFrontEnd(framesize=framesize, **kwargs)
+            n_first = (len(signal) // 2 - framesize) // frameshift + 1
+            batch = np.vstack([front_end.param_batch(signal[:len(signal) // 2], frameshift),
+                               front_end.param_batch(signal[n_first * frameshift:], frameshift)])
+
+            self.assertEqual(batch.shape, expected.shape)
+            self.assertTrue(np.allclose(batch, expected), kwargs)
+
+    def test_param_batch_equals_param(self):
+        framesize, frameshift = 512, 160
+        signal = np.random.RandomState(0).randint(-3000, 3000, size=8000)
+        n_frames = (len(signal) - framesize) // frameshift + 1
+
+        for kwargs in [{}, {'n_last_frames': 2}, {'usedelta': False}, {'useacc': False, 'usec0': False}]:
+            front_end = MFCCFrontEnd(framesize=framesize, **kwargs)
+            single = np.array([front_end.param(signal[i * frameshift:i * frameshift + framesize])
+                               for i in range(n_frames)])
+
+            # the same signal split into uneven chunks
+            front_end = MFCCFrontEnd(framesize=framesize, **kwargs)
+            batches = []
+            start = 0
+            for n in [1, 4, 10, n_frames]:
+                n = min(n, n_frames - start)
+                chunk = signal[start * frameshift:(start + n - 1) * frameshift + framesize]
+                batches.append(front_end.param_batch(chunk, frameshift))
+                start += n
+            batch = np.vstack(batches)
+
+            self.assertEqual(batch.shape, (n_frames, front_end.get_param_size()))
+            self.assertTrue(np.allclose(single, batch))
+
+    def test_param_batch_short_signal(self):
+        front_end = MFCCFrontEnd(framesize=512)
+        self.assertEqual(front_end.param_batch(np.zeros(100), 160).shape, (0, front_end.get_param_size()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import unittest
+
+import numpy as np
+
+from alex.utils.ringbuffer import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_wrap_around(self):
+        rb = RingBuffer(capacity=8)
+        rb.append([1, 2, 3, 4, 5, 6])
+        self.assertEqual(list(rb.pop(4)), [1, 2, 3, 4])
+
+        # the new samples wrap around the end of the array
+        rb.append([7, 8, 9, 10])
+        self.assertEqual(rb.capacity, 8)
+        self.assertEqual(len(rb), 6)
+        self.assertEqual(list(rb.peek(10)), [5, 6, 7, 8, 9, 10])
+
+        rb.consume(3)
+        self.assertEqual(list(rb.peek(3)), [8, 9, 10])
+
+    def test_resize(self):
+        rb = RingBuffer(capacity=4, dtype=np.int16)
+        rb.append([1, 2, 3])
+        rb.consume(2)
+        rb.append(range(10))
+
+        self.assertEqual(rb.capacity, 11)
+        self.assertEqual(list(rb.pop(len(rb))), [3] + range(10))
+        self.assertEqual(len(rb), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
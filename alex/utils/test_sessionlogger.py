@@ -3,6 +3,9 @@
 
 import unittest
 import os
+import shutil
+import time
+import wave
 
 if __name__ == "__main__":
     import autopath
@@ -10,7 +13,7 @@ if __name__ == "__main__":
 from alex.components.asr.utterance import UtteranceConfusionNetwork
 from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork
 from alex.utils.config import Config
-from alex.utils.sessionlogger import SessionLogger
+from alex.utils.sessionlogger import SessionLogger, rebuild_session_xml
 from alex.utils.mproc import SystemLogger
 
 
@@ -97,5 +100,95 @@ class TestSessionLogger(unittest.TestCase):
             sl.rec_end("user2.wav")
             sl.hangup("user")
 
+    def test_session_journal(self):
+        sess_dir = "./journal"
+        if os.path.isdir(sess_dir):
+            shutil.rmtree(sess_dir)
+        os.mkdir(sess_dir)
+
+        sl = SessionLogger()
+        sl.set_cfg({'Audio': {'sample_rate': 16000}, 'Hub': {'main_loop_sleep_time': 0.001}})
+
+        # the recordings are written by the calling process, only their start and end go through the queue
+        sl.session_start(sess_dir)
+        sl._queue.append(sl.queue.get(timeout=1.0))
+        for cmd, args in [('header', ("Default alex", "1.0")),
+                          ('turn', ("system", )),
+                          ('text', ("system", "Hello.")),
+                          ('turn', ("user", ))]:
+            sl._queue.append((cmd, args, {}, time.time()))
+        sl.rec_start("user", "user1.wav")
+        sl._queue.append(sl.queue.get(timeout=1.0))
+        sl.rec_write("user1.wav", b'\x00\x01' * 160)
+        sl.rec_end("user1.wav")
+        sl._queue.append(sl.queue.get(timeout=1.0))
+        sl._queue.append(('hangup', ("user", ), {}, time.time()))
+        sl._dispatch_all()
+
+        wav = wave.open(os.path.join(sess_dir, 'user1.wav'))
+        self.assertEqual(wav.readframes(wav.getnframes()), b'\x00\x01' * 160)
+        wav.close()
+
+        session_xml = os.path.join(sess_dir, 'session.xml')
+        with open(session_xml) as f:
+            self.assertNotIn('<turn', f.read())
+
+        sl.session_end()
+        sl._queue.append(sl.queue.get(timeout=1.0))
+        sl._dispatch_all()
+
+        with open(session_xml) as f:
+            xml = f.read()
+        self.assertIn('<hangup/>', xml)
+
+        # the recordings started after the end of the session are not written into its directory
+        sl.rec_start("user", "user2.wav")
+        sl.rec_write("user2.wav", b'\x00\x01' * 160)
+        sl.rec_end("user2.wav")
+        self.assertFalse(os.path.exists(os.path.join(sess_dir, 'user2.wav')))
+
+        os.remove(session_xml)
+        rebuild_session_xml(sess_dir)
+        with open(session_xml) as f:
+            self.assertEqual(f.read(), xml)
+
+        shutil.rmtree(sess_dir)
+
+    def test_interrupted_recording(self):
+        sess_dirs = ["./interrupted1", "./interrupted2"]
+        for sess_dir in sess_dirs:
+            if os.path.isdir(sess_dir):
+                shutil.rmtree(sess_dir)
+            os.mkdir(sess_dir)
+
+        sl = SessionLogger()
+        sl.set_cfg({'Audio': {'sample_rate': 16000}})
+
+        # the recording is flushed without rec_end(), it is closed when the next session starts
+        sl.session_start(sess_dirs[0])
+        sl.rec_start("user", "user1.wav")
+        sl.rec_write("user1.wav", b'\x00\x01' * 160)
+        sl.session_end()
+        sl.session_start(sess_dirs[1])
+        sl.rec_start("user", "user2.wav")
+
+        wav = wave.open(os.path.join(sess_dirs[0], 'user1.wav'))
+        self.assertEqual(wav.getnframes(), 160)
+        self.assertEqual(wav.readframes(wav.getnframes()), b'\x00\x01' * 160)
+        wav.close()
+
+        # a recording of the ended session is not continued
+        sl.rec_write("user1.wav", b'\x00\x01' * 160)
+        sl.rec_write("user2.wav", b'\x00\x02' * 160)
+        sl.rec_end("user2.wav")
+        self.assertEqual(os.path.getsize(os.path.join(sess_dirs[0], 'user1.wav')), 44 + 320)
+
+        wav = wave.open(os.path.join(sess_dirs[1], 'user2.wav'))
+        self.assertEqual(wav.readframes(wav.getnframes()), b'\x00\x02' * 160)
+        wav.close()
+
+        for sess_dir in sess_dirs:
+            shutil.rmtree(sess_dir)
+
 if __name__ == '__main__':
     unittest.main()
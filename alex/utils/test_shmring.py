@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.utils.mproc import wait
+from alex.utils.shmring import SharedRingBuffer
+
+
+def produce(ring, frames):
+    for frame in frames:
+        ring.write(frame)
+
+
+class TestSharedRingBuffer(unittest.TestCase):
+    def test_consumers(self):
+        ring = SharedRingBuffer(10, n_consumers=2)
+        first = ring.reader(0)
+        second = ring.reader(1, limit=0)
+
+        ring.write(b'abcdef')
+        self.assertEqual(first.available(), 6)
+        self.assertEqual(second.available(), 0)
+
+        position, data = first.read(4)
+        self.assertEqual((position, data.tostring()), (0, b'abcd'))
+        first.consume(4)
+        self.assertEqual(second.available(), 4)
+
+        # the data wrap around the end of the buffer
+        ring.write(b'ghijkl')
+        position, data = first.read(100)
+        self.assertEqual((position, data.tostring()), (4, b'efghijkl'))
+        first.consume(len(data))
+
+        # the first two bytes were overwritten
+        position, data = second.read(100)
+        self.assertEqual((position, data.tostring()), (2, b'cdefghijkl'))
+        self.assertEqual(second.lost, 2)
+
+        self.assertEqual(ring.get(0, 2), None)
+        self.assertEqual(ring.get(10, 2).tostring(), b'kl')
+        self.assertEqual(ring.get(11, 2), None)
+
+    def test_processes(self):
+        frames = [chr(ord('a') + i) * 160 for i in range(20)]
+        ring = SharedRingBuffer(4000, n_consumers=1)
+        reader = ring.reader(0)
+
+        producer = multiprocessing.Process(target=produce, args=(ring, frames))
+        producer.start()
+
+        received = []
+        while len(received) < len(frames) * 160:
+            wait([reader], 1.0)
+            reader.clear_notifications()
+            position, data = reader.read(1000)
+            received.extend(data.tostring())
+            reader.consume(len(data))
+        producer.join()
+
+        self.assertEqual(''.join(received), ''.join(frames))
+        self.assertEqual(reader.lost, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()